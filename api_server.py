@@ -4,24 +4,162 @@ Payroll Auditor Web API
 Flask-based REST API for payroll file auditing
 """
 
-from flask import Flask, request, jsonify, send_file, render_template_string
+from flask import Flask, Request, request, g, jsonify, send_file, render_template_string
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
 from universal_payroll_auditor import UniversalPayrollAuditor
+from audit_result import AuditResult
+from audit_jobs import AuditJobQueue, QueueFull
+from content_store import BlobStore, ResultCache, with_file_names
+from file_source import FileSource, HashingSpooledFile
+from report_writers import dumps
+import audit_metrics
+from audit_metrics import Gauge, Counter
 import os
 import tempfile
 import json
+import time
 from datetime import datetime
 from pathlib import Path
 
+# Uploads up to this size stay in memory; larger ones spill to a temporary file
+UPLOAD_SPOOL_SIZE = int(float(os.environ.get('PAYROLL_AUDITOR_UPLOAD_SPOOL_MB', 16)) * 1024 * 1024)
+
+class AuditRequest(Request):
+    """
+    Request whose uploads are spooled in memory (Werkzeug writes anything
+    over 500KB to disk) and hashed while they stream in
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return HashingSpooledFile(max_size=UPLOAD_SPOOL_SIZE)
+
+class AuditJSONProvider(DefaultJSONProvider):
+    """JSON provider serializing lazy audit results with every section computed"""
+    def dumps(self, obj, **kwargs):
+        if isinstance(obj, AuditResult):
+            obj = obj.to_dict()
+        return super().dumps(obj, **kwargs)
+
 app = Flask(__name__)
+app.request_class = AuditRequest
+app.json = AuditJSONProvider(app)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
 
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls', 'pdf'}
 
+# Auditor configuration of API audits (part of every result cache key)
+AUDIT_CONFIG = {}
+
+# Results keyed by (sha256 file1, sha256 file2, config); PAYROLL_AUDITOR_RESULT_CACHE=0 disables
+result_cache = None
+if os.environ.get('PAYROLL_AUDITOR_RESULT_CACHE', '1') != '0':
+    result_cache = ResultCache(
+        os.environ.get('PAYROLL_AUDITOR_RESULT_CACHE_DIR'),
+        max_size_mb=float(os.environ.get('PAYROLL_AUDITOR_RESULT_CACHE_MB', 256)),
+        ttl=float(os.environ.get('PAYROLL_AUDITOR_RESULT_TTL', 3600))
+    )
+
+# Uploads of queued audits, stored once per content
+blobs = BlobStore(os.environ.get('PAYROLL_AUDITOR_BLOB_DIR'),
+                  max_size_mb=float(os.environ.get('PAYROLL_AUDITOR_BLOB_STORE_MB', 1024)))
+
+# Asynchronous audits (POST /api/audits); configured by PAYROLL_AUDITOR_JOB_* variables
+jobs = AuditJobQueue.from_env(result_cache)
+
+# Stage timings of the auditor feed GET /metrics
+audit_metrics.install()
+
+def queue_metrics():
+    """Job queue and result cache state, collected when /metrics is scraped"""
+    stats = jobs.stats()
+    queue = Gauge('payroll_audit_jobs', 'Audit jobs waiting or running (shared queue)', ('status',))
+    queue.set(stats['queued'], status='queued')
+    queue.set(stats['running'], status='running')
+    running = Gauge('payroll_audit_jobs_running_here', 'Queued audits this process is running')
+    running.set(jobs.active())
+    metrics = [queue, running]
+    if result_cache is not None:
+        cache = result_cache.stats()
+        lookups = Counter('payroll_result_cache_lookups_total',
+                          'Result cache lookups of this process', ('result',))
+        lookups.inc(cache['hits'], result='hit')
+        lookups.inc(cache['misses'], result='miss')
+        metrics.append(lookups)
+    return metrics
+
+audit_metrics.REGISTRY.add_collector(queue_metrics)
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def count_request(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    audit_metrics.REQUESTS.inc(endpoint=endpoint, method=request.method,
+                               status=response.status_code)
+    if 'request_start' in g:
+        audit_metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.request_start,
+                                              endpoint=endpoint)
+    return response
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def validate_uploads():
+    """Error response for missing or unsupported uploads, or None when both are usable"""
+    if 'file1' not in request.files or 'file2' not in request.files:
+        return jsonify({'error': 'Both file1 and file2 are required'}), 400
+    file1 = request.files['file1']
+    file2 = request.files['file2']
+    if file1.filename == '' or file2.filename == '':
+        return jsonify({'error': 'Both files must have filenames'}), 400
+    if not (allowed_file(file1.filename) and allowed_file(file2.filename)):
+        return jsonify({
+            'error': f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'
+        }), 400
+    return None
+
+def upload_source(upload):
+    """FileSource of an upload, with the digest computed while it streamed in"""
+    digest = upload.stream.hexdigest() if isinstance(upload.stream, HashingSpooledFile) else None
+    return FileSource(upload.stream, secure_filename(upload.filename), digest=digest)
+
+def count_input_bytes(*sources):
+    for field, source in zip(('file1', 'file2'), sources):
+        stream = source.open()
+        audit_metrics.INPUT_BYTES.inc(stream.seek(0, os.SEEK_END), file=field)
+        stream.seek(0)
+
+def cache_key(source1, source2):
+    return ResultCache.key(source1.digest(), source2.digest(), AUDIT_CONFIG)
+
+def job_status(job):
+    """Public view of a job record"""
+    status = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'progress': job['progress'],
+        'file1_name': job['names'].get('file1'),
+        'file2_name': job['names'].get('file2'),
+        'submitted_at': _isoformat(job['submitted_at']),
+        'started_at': _isoformat(job['started_at']),
+        'finished_at': _isoformat(job['finished_at']),
+        'timeout': job['timeout'],
+        'status_url': f"/api/audits/{job['id']}"
+    }
+    if job['error']:
+        status['error'] = job['error']
+    if job['result'] is not None:
+        status['result'] = job['result']
+    return status
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
 # HTML template for web interface
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -143,6 +281,10 @@ HTML_TEMPLATE = '''
                 <li><code>GET /</code> - This web interface</li>
                 <li><code>GET /health</code> - Health check</li>
                 <li><code>POST /api/audit</code> - Audit two files (multipart/form-data)</li>
+                <li><code>POST /api/audits</code> - Queue an audit, returns a job id</li>
+                <li><code>GET /api/audits/&lt;id&gt;</code> - Job status, progress and result</li>
+                <li><code>DELETE /api/audits/&lt;id&gt;</code> - Cancel a job</li>
+                <li><code>GET /metrics</code> - Prometheus metrics</li>
                 <li><code>GET /api/docs</code> - API documentation</li>
             </ul>
             
@@ -228,7 +370,9 @@ def health():
         'status': 'healthy',
         'service': 'payroll-auditor-api',
         'version': '1.0.0',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'jobs': jobs.stats(),
+        'result_cache': result_cache.stats() if result_cache is not None else None
     })
 
 @app.route('/api/docs')
@@ -241,6 +385,10 @@ def api_docs():
             'GET /': 'Web interface',
             'GET /health': 'Health check',
             'POST /api/audit': 'Audit two payroll files',
+            'POST /api/audits': 'Queue an audit of two payroll files',
+            'GET /api/audits/<job_id>': 'Status, progress and result of a queued audit',
+            'DELETE /api/audits/<job_id>': 'Cancel a queued or running audit',
+            'GET /metrics': 'Prometheus metrics (per server process)',
             'GET /api/docs': 'This documentation'
         },
         'usage': {
@@ -253,6 +401,21 @@ def api_docs():
                     'file2': 'Second payroll file (CSV, Excel, or PDF)'
                 },
                 'example': 'curl -X POST http://localhost:5000/api/audit -F "file1=@file1.csv" -F "file2=@file2.csv"'
+            },
+            'queued_audit': {
+                'method': 'POST',
+                'endpoint': '/api/audits',
+                'content_type': 'multipart/form-data',
+                'parameters': {
+                    'file1': 'First payroll file (CSV, Excel, or PDF)',
+                    'file2': 'Second payroll file (CSV, Excel, or PDF)',
+                    'timeout': f'Optional seconds the audit may run (at most {jobs.timeout:g})'
+                },
+                'responses': {
+                    '202': 'Queued; poll status_url until status is succeeded, failed, cancelled or timed_out',
+                    '429': 'Queue full; retry later'
+                },
+                'example': 'curl -X POST http://localhost:5000/api/audits -F "file1=@file1.csv" -F "file2=@file2.csv"'
             }
         },
         'supported_formats': ['csv', 'xlsx', 'xls', 'pdf']
@@ -269,55 +432,124 @@ def audit_files():
     
     Returns JSON with audit results
     """
-    # Check if files are present
-    if 'file1' not in request.files or 'file2' not in request.files:
-        return jsonify({'error': 'Both file1 and file2 are required'}), 400
-    
+    # The multipart body is read and spooled on the first access to request.files
+    with audit_metrics.stage('upload'):
+        invalid = validate_uploads()
+    if invalid:
+        return invalid
     file1 = request.files['file1']
     file2 = request.files['file2']
     
-    # Check if files have names
-    if file1.filename == '' or file2.filename == '':
-        return jsonify({'error': 'Both files must have filenames'}), 400
-    
-    # Check file types
-    if not (allowed_file(file1.filename) and allowed_file(file2.filename)):
-        return jsonify({
-            'error': f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'
-        }), 400
-    
     try:
-        # Create temporary directory for this request
-        with tempfile.TemporaryDirectory() as tmpdir:
-            # Save uploaded files
-            filename1 = secure_filename(file1.filename)
-            filename2 = secure_filename(file2.filename)
-            path1 = os.path.join(tmpdir, filename1)
-            path2 = os.path.join(tmpdir, filename2)
-            
-            file1.save(path1)
-            file2.save(path2)
-            
-            # Perform audit
-            auditor = UniversalPayrollAuditor()
-            result = auditor.audit(path1, path2)
-            
-            # Add metadata
-            result['api_metadata'] = {
-                'file1_name': filename1,
-                'file2_name': filename2,
-                'timestamp': datetime.now().isoformat(),
-                'api_version': '1.0.0'
-            }
-            
-            return jsonify(result), 200
-            
+        # Parse the uploads straight from their spooled streams, no temporary copies
+        source1 = upload_source(file1)
+        source2 = upload_source(file2)
+        count_input_bytes(source1, source2)
+        
+        # The same pair of contents was audited recently: reuse its result
+        key = cache_key(source1, source2)
+        payload = result_cache.get(key) if result_cache is not None else None
+        cached = payload is not None
+        if cached:
+            # Stored with the names of the first upload of these contents
+            payload = with_file_names(payload, {'file1': source1.name, 'file2': source2.name})
+        if not cached:
+            auditor = UniversalPayrollAuditor(dict(AUDIT_CONFIG))
+            with audit_metrics.track_audit():
+                results = auditor.audit(source1, source2)
+            for field in ('file1', 'file2'):
+                audit_metrics.INPUT_ROWS.inc(results['metadata'][field]['rows'], file=field)
+            with audit_metrics.stage('serialize'):
+                payload = dumps(results)
+            if result_cache is not None:
+                result_cache.put(key, payload)
+        audit_metrics.AUDITS.inc(outcome='cached' if cached else 'ok')
+        
+        # Add metadata (per request, so it is appended to the cached document)
+        api_metadata = {
+            'file1_name': source1.name,
+            'file2_name': source2.name,
+            'timestamp': datetime.now().isoformat(),
+            'api_version': '1.0.0',
+            'cache': 'hit' if cached else 'miss'
+        }
+        body = payload[:-1] + b',"api_metadata":' + dumps(api_metadata) + b'}'
+        return app.response_class(body, status=200, mimetype='application/json')
+        
     except Exception as e:
+        audit_metrics.AUDITS.inc(outcome='error')
         return jsonify({
             'error': str(e),
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/audits', methods=['POST'])
+def submit_audit():
+    """
+    Queue an audit of two payroll files
+    
+    Expects the same multipart/form-data as /api/audit, plus an optional
+    timeout (seconds). Returns 202 with the job id and its status URL, or
+    429 when the queue is full.
+    """
+    with audit_metrics.stage('upload'):
+        invalid = validate_uploads()
+    if invalid:
+        return invalid
+    file1 = request.files['file1']
+    file2 = request.files['file2']
+    
+    try:
+        timeout = float(request.form.get('timeout', jobs.timeout))
+    except ValueError:
+        return jsonify({'error': 'timeout must be a number of seconds'}), 400
+    if timeout <= 0:
+        return jsonify({'error': 'timeout must be positive'}), 400
+    
+    # The worker process reads the uploads from the content-addressed blob store,
+    # so re-uploaded files are stored (and, via the parsed-file cache, parsed) once
+    source1 = upload_source(file1)
+    source2 = upload_source(file2)
+    count_input_bytes(source1, source2)
+    key = cache_key(source1, source2)
+    path1 = blobs.put(source1.open(), source1.digest())
+    path2 = blobs.put(source2.open(), source2.digest())
+    
+    try:
+        job = jobs.submit(path1, path2, config=dict(AUDIT_CONFIG),
+                          timeout=min(timeout, jobs.timeout),
+                          names={'file1': source1.name, 'file2': source2.name}, cache_key=key)
+    except QueueFull as e:
+        response = jsonify({'error': f'Audit queue is full: {e}'})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+    
+    response = jsonify(job_status(job))
+    response.headers['Location'] = f"/api/audits/{job['id']}"
+    return response, 202
+
+@app.route('/api/audits/<job_id>', methods=['GET'])
+def audit_status(job_id):
+    """Status, progress and (once succeeded) result of a queued audit"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown audit job: {job_id}'}), 404
+    return jsonify(job_status(job)), 200
+
+@app.route('/api/audits/<job_id>', methods=['DELETE'])
+def cancel_audit(job_id):
+    """Cancel a queued or running audit"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown audit job: {job_id}'}), 404
+    return jsonify(job_status(job)), 202 if job['status'] == 'cancelling' else 200
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics of this process"""
+    return app.response_class(audit_metrics.render(), status=200,
+                              content_type=audit_metrics.CONTENT_TYPE)
+
 @app.errorhandler(413)
 def too_large(e):
     return jsonify({'error': 'File too large. Maximum size is 16MB'}), 413
@@ -330,6 +562,9 @@ if __name__ == '__main__':
     print("🚀 Starting Payroll Auditor API...")
     print("📍 Access web interface: http://localhost:5000")
     print("📍 API endpoint: http://localhost:5000/api/audit")
+    print("📍 Queued audits: http://localhost:5000/api/audits")
     print("📍 Health check: http://localhost:5000/health")
+    print("📍 Metrics: http://localhost:5000/metrics")
     print("📍 API docs: http://localhost:5000/api/docs")
-    app.run(host='0.0.0.0', port=9000, debug=False)
+    # Development server; use production_server.py for deployments
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=False)
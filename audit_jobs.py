@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+Audit Job Queue
+Runs audits asynchronously: submitting returns a job id right away, a
+bounded pool of worker processes executes the queued audits, and the job
+record reports status, progress and finally the result. Queue depth is
+limited, every job has a timeout, and queued or running jobs can be
+cancelled. Jobs are kept in memory or, to share one queue between server
+processes, in a SQLite database.
+"""
+
+import atexit
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from multiprocessing.connection import wait
+from typing import Dict, List, Any, Optional, Iterable
+
+import audit_metrics
+from content_store import with_file_names
+from report_writers import dumps
+
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_MAX_QUEUED = 32
+DEFAULT_JOB_TIMEOUT = 600
+DEFAULT_RETENTION = 3600
+
+QUEUED, RUNNING, CANCELLING = 'queued', 'running', 'cancelling'
+SUCCEEDED, FAILED, CANCELLED, TIMED_OUT = 'succeeded', 'failed', 'cancelled', 'timed_out'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+# audit_metrics.AUDITS outcome of every final status
+JOB_OUTCOMES = {SUCCEEDED: 'ok', FAILED: 'error', CANCELLED: 'cancelled', TIMED_OUT: 'timed_out'}
+
+# How often the dispatcher checks deadlines and cancellations (seconds)
+POLL_INTERVAL = 0.2
+
+
+class QueueFull(Exception):
+    """Raised when the queue already holds max_queued waiting jobs"""
+
+
+class MemoryJobStore:
+    """Job records in a dict, for a single server process and for tests"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, job: Dict[str, Any]):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, only_if: Optional[Iterable[str]] = None, **fields) -> bool:
+        """Update fields; with only_if, only while the job has one of those statuses"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (only_if is not None and job['status'] not in only_if):
+                return False
+            job.update(fields)
+            return True
+
+    def claim_next(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Oldest queued job, marked running for owner"""
+        with self._lock:
+            queued = [job for job in self._jobs.values() if job['status'] == QUEUED]
+            if not queued:
+                return None
+            job = min(queued, key=lambda item: item['submitted_at'])
+            job.update(status=RUNNING, started_at=time.time(), owner=owner, stage='starting')
+            return dict(job)
+
+    def count(self, statuses: Iterable[str]) -> int:
+        statuses = set(statuses)
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] in statuses)
+
+    def purge(self, finished_before: float) -> List[Dict[str, Any]]:
+        """Remove and return finished jobs older than finished_before"""
+        with self._lock:
+            old = [job for job in self._jobs.values()
+                   if job['status'] in FINISHED and (job['finished_at'] or 0) < finished_before]
+            for job in old:
+                del self._jobs[job['id']]
+            return old
+
+
+class SQLiteJobStore:
+    """
+    Job records in a SQLite database
+
+    Every server process using the same database file shares one queue: any
+    of them can accept, run, report on or cancel a job.
+    """
+
+    _COLUMNS = ('id', 'status', 'stage', 'progress', 'submitted_at', 'started_at', 'finished_at',
+                'timeout', 'file1', 'file2', 'names', 'config', 'workdir', 'owner', 'error',
+                'result', 'cache_key')
+    _JSON = ('names', 'config')
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, stage TEXT, "
+                "progress REAL, submitted_at REAL, started_at REAL, finished_at REAL, "
+                "timeout REAL, file1 TEXT, file2 TEXT, names TEXT, config TEXT, workdir TEXT, "
+                "owner TEXT, error TEXT, result BLOB, cache_key TEXT)"
+            )
+            # Databases created before result caching
+            columns = {row['name'] for row in db.execute("PRAGMA table_info(jobs)")}
+            if 'cache_key' not in columns:
+                db.execute("ALTER TABLE jobs ADD COLUMN cache_key TEXT")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _record(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        for key in self._JSON:
+            job[key] = json.loads(job[key]) if job[key] is not None else None
+        return job
+
+    def add(self, job: Dict[str, Any]):
+        values = [json.dumps(job.get(col)) if col in self._JSON else job.get(col)
+                  for col in self._COLUMNS]
+        with self._connect() as db:
+            db.execute(f"INSERT INTO jobs ({', '.join(self._COLUMNS)}) "
+                       f"VALUES ({', '.join('?' * len(self._COLUMNS))})", values)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            return self._record(db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def update(self, job_id: str, only_if: Optional[Iterable[str]] = None, **fields) -> bool:
+        """Update fields; with only_if, only while the job has one of those statuses"""
+        assignments = ', '.join(f"{key} = ?" for key in fields)
+        values = [json.dumps(value) if key in self._JSON else value for key, value in fields.items()]
+        query = f"UPDATE jobs SET {assignments} WHERE id = ?"
+        values.append(job_id)
+        if only_if is not None:
+            only_if = list(only_if)
+            query += f" AND status IN ({', '.join('?' * len(only_if))})"
+            values.extend(only_if)
+        with self._connect() as db:
+            return db.execute(query, values).rowcount > 0
+
+    def claim_next(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Oldest queued job, marked running for owner (atomic across processes)"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT id FROM jobs WHERE status = ? ORDER BY submitted_at "
+                                 "LIMIT 1", (QUEUED,)).fetchone()
+                if row is None:
+                    return None
+                db.execute("UPDATE jobs SET status = ?, started_at = ?, owner = ?, stage = ? "
+                           "WHERE id = ?", (RUNNING, time.time(), owner, 'starting', row['id']))
+                job = db.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+            finally:
+                db.execute("COMMIT")
+            return self._record(job)
+
+    def count(self, statuses: Iterable[str]) -> int:
+        statuses = list(statuses)
+        with self._connect() as db:
+            return db.execute(f"SELECT COUNT(*) FROM jobs WHERE status IN "
+                              f"({', '.join('?' * len(statuses))})", statuses).fetchone()[0]
+
+    def purge(self, finished_before: float) -> List[Dict[str, Any]]:
+        """Remove and return finished jobs older than finished_before"""
+        marks = ', '.join('?' * len(FINISHED))
+        with self._connect() as db:
+            rows = db.execute(f"SELECT * FROM jobs WHERE status IN ({marks}) AND finished_at < ?",
+                              (*FINISHED, finished_before)).fetchall()
+            db.execute(f"DELETE FROM jobs WHERE status IN ({marks}) AND finished_at < ?",
+                       (*FINISHED, finished_before))
+        return [self._record(row) for row in rows]
+
+
+class AuditJobQueue:
+    """
+    Bounded pool of worker processes executing queued audits
+
+    Each running job gets its own process (forked from the server, so the
+    auditor modules are already imported), which lets timeouts and
+    cancellation stop it outright.
+
+    Args:
+        workers: Audits running at the same time
+        max_queued: Jobs allowed to wait; submit raises QueueFull beyond it
+        timeout: Default seconds a job may run before it is stopped
+        store: MemoryJobStore (default) or SQLiteJobStore
+        retention: Seconds finished jobs are kept for status requests
+        result_cache: Optional content_store.ResultCache; jobs submitted with
+            a cache_key are answered from it and their results stored in it
+    """
+
+    def __init__(self, workers: int = DEFAULT_JOB_WORKERS, max_queued: int = DEFAULT_MAX_QUEUED,
+                 timeout: float = DEFAULT_JOB_TIMEOUT, store=None,
+                 retention: float = DEFAULT_RETENTION, result_cache=None):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.store = store if store is not None else MemoryJobStore()
+        self.retention = retention
+        self.result_cache = result_cache
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._running: Dict[str, Dict[str, Any]] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._exit_hook_pid: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, result_cache=None) -> 'AuditJobQueue':
+        """Queue configured by PAYROLL_AUDITOR_JOB_* environment variables"""
+        db = os.environ.get('PAYROLL_AUDITOR_JOB_DB')
+        return cls(
+            workers=int(os.environ.get('PAYROLL_AUDITOR_JOB_WORKERS', DEFAULT_JOB_WORKERS)),
+            max_queued=int(os.environ.get('PAYROLL_AUDITOR_JOB_MAX_QUEUED', DEFAULT_MAX_QUEUED)),
+            timeout=float(os.environ.get('PAYROLL_AUDITOR_JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT)),
+            store=SQLiteJobStore(db) if db else None,
+            retention=float(os.environ.get('PAYROLL_AUDITOR_JOB_RETENTION', DEFAULT_RETENTION)),
+            result_cache=result_cache
+        )
+
+    def submit(self, file1: str, file2: str, config: Optional[Dict] = None,
+               timeout: Optional[float] = None, names: Optional[Dict[str, str]] = None,
+               workdir: Optional[str] = None, cache_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue an audit of two files
+
+        Args:
+            file1, file2: Paths readable by the worker processes
+            config: UniversalPayrollAuditor configuration
+            timeout: Seconds the job may run (default: the queue's timeout)
+            names: Original file names ('file1', 'file2'), reported with the
+                job and in the result's metadata
+            workdir: Directory removed once the job has finished
+            cache_key: Result cache key of the two contents and config; a
+                cached result finishes the job right away
+
+        Returns:
+            The job record
+
+        Raises:
+            QueueFull: max_queued jobs are already waiting
+        """
+        cached = None
+        if cache_key and self.result_cache is not None:
+            cached = self.result_cache.get(cache_key)
+        if cached is None and self.store.count((QUEUED,)) >= self.max_queued:
+            raise QueueFull(f"limit of {self.max_queued} waiting audits reached")
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': QUEUED,
+            'stage': 'queued',
+            'progress': 0.0,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'timeout': timeout or self.timeout,
+            'file1': file1,
+            'file2': file2,
+            'names': names or {},
+            'config': config or {},
+            'workdir': workdir,
+            'owner': None,
+            'error': None,
+            'result': None,
+            'cache_key': cache_key
+        }
+        if cached is not None:
+            # Cached under the names of the first upload of these contents
+            cached = with_file_names(cached, job['names'])
+            now = time.time()
+            job.update(status=SUCCEEDED, stage='cached', progress=1.0, started_at=now,
+                       finished_at=now, result=cached)
+            self.store.add(job)
+            audit_metrics.AUDITS.inc(outcome='cached')
+            _remove_workdir(job)
+            return self.get(job['id'])
+        self.store.add(job)
+        self.start()
+        self._wake.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job record with the result parsed, or None for unknown (or purged) jobs"""
+        job = self.store.get(job_id)
+        if job and job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job; finished jobs are returned unchanged"""
+        if self.store.update(job_id, only_if=(QUEUED,), status=CANCELLED, stage=CANCELLED,
+                             finished_at=time.time()):
+            job = self.get(job_id)
+            audit_metrics.AUDITS.inc(outcome=JOB_OUTCOMES[CANCELLED])
+            _remove_workdir(job)
+            return job
+        # Running: its dispatcher (possibly in another server process) stops it
+        self.store.update(job_id, only_if=(RUNNING,), status=CANCELLING)
+        self._wake.set()
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and running audits, for health checks"""
+        return {
+            'workers': self.workers,
+            'queued': self.store.count((QUEUED,)),
+            'running': self.store.count((RUNNING, CANCELLING)),
+            'max_queued': self.max_queued
+        }
+
+    def active(self) -> int:
+        """Audits this process is running right now"""
+        return len(self._running)
+
+    def start(self):
+        """
+        Start this process's dispatcher (submit does so on first use)
+
+        Server processes sharing a SQLite store call it at startup so that
+        each of them takes part in running the queue.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._dispatch, name='audit-jobs',
+                                                daemon=True)
+                self._thread.start()
+                if self._exit_hook_pid != os.getpid():
+                    # Job processes are not daemonic (audits start process pools of their
+                    # own), so the interpreter would wait for them at exit: stop them first
+                    atexit.register(self.shutdown, requeue=True)
+                    self._exit_hook_pid = os.getpid()
+
+    def shutdown(self, cancel_queued: bool = False, requeue: bool = False):
+        """
+        Stop the dispatcher and every audit this process is running
+
+        Args:
+            cancel_queued: Also cancel waiting jobs (leave them for other
+                processes sharing a SQLite store)
+            requeue: Put running audits back in the queue for another
+                process to restart, instead of cancelling them
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            for job_id in list(self._running):
+                if requeue:
+                    self._requeue(job_id)
+                else:
+                    self._finish(job_id, CANCELLED, error='Server shutting down')
+        while cancel_queued:
+            job = self.store.claim_next(self.owner)
+            if job is None:
+                break
+            self.store.update(job['id'], status=CANCELLED, stage=CANCELLED,
+                              finished_at=time.time(), error='Server shutting down')
+            _remove_workdir(job)
+
+    def _dispatch(self):
+        purged_at = 0.0
+        while not self._stop.is_set():
+            with self._lock:
+                self._collect()
+                self._enforce_limits()
+                while len(self._running) < self.workers:
+                    job = self.store.claim_next(self.owner)
+                    if job is None:
+                        break
+                    self._start(job)
+                connections = [running['conn'] for running in self._running.values()]
+            if time.time() - purged_at > 60:
+                for job in self.store.purge(time.time() - self.retention):
+                    _remove_workdir(job)
+                purged_at = time.time()
+            # Wake on worker messages, new submissions or the next deadline check
+            if connections:
+                wait(connections, timeout=POLL_INTERVAL)
+            else:
+                self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+
+    def _start(self, job: Dict[str, Any]):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        # Not daemonic: PDF page extraction and workers > 1 start child processes
+        process = multiprocessing.Process(target=_run_job, name=f"audit-{job['id'][:8]}",
+                                          args=(sender, job['file1'], job['file2'], job['config'],
+                                                job['names']))
+        process.start()
+        sender.close()
+        self._running[job['id']] = {
+            'process': process,
+            'conn': receiver,
+            'deadline': time.time() + job['timeout'],
+            'job': job
+        }
+
+    def _collect(self):
+        """Apply progress, results and errors sent by the worker processes"""
+        for job_id, running in list(self._running.items()):
+            conn = running['conn']
+            try:
+                while conn.poll():
+                    kind, *payload = conn.recv()
+                    if kind == 'progress':
+                        stage, progress = payload
+                        self.store.update(job_id, only_if=(RUNNING,), stage=stage,
+                                          progress=progress)
+                    elif kind == 'metrics':
+                        audit_metrics.observe_report(payload[0])
+                    elif kind == 'result':
+                        self._finish(job_id, SUCCEEDED, result=payload[0])
+                        break
+                    else:
+                        self._finish(job_id, FAILED, error=payload[0])
+                        break
+            except (EOFError, OSError):
+                if job_id in self._running:
+                    code = running['process'].exitcode
+                    self._finish(job_id, FAILED, error=f"Audit process exited unexpectedly "
+                                                       f"(exit code {code})")
+
+    def _enforce_limits(self):
+        now = time.time()
+        for job_id, running in list(self._running.items()):
+            job = self.store.get(job_id)
+            if job is not None and job['status'] == CANCELLING:
+                self._finish(job_id, CANCELLED, error='Cancelled')
+            elif now > running['deadline']:
+                self._finish(job_id, TIMED_OUT,
+                             error=f"Audit timed out after {running['job']['timeout']:g}s")
+
+    def _requeue(self, job_id: str):
+        running = self._running.pop(job_id)
+        running['process'].terminate()
+        running['process'].join(5)
+        running['conn'].close()
+        # The uploads are kept for the next attempt, unless the job was being cancelled
+        if not self.store.update(job_id, only_if=(RUNNING,), status=QUEUED, stage='queued',
+                                 progress=0.0, started_at=None, owner=None):
+            self.store.update(job_id, status=CANCELLED, stage=CANCELLED,
+                              finished_at=time.time(), error='Cancelled')
+            _remove_workdir(running['job'])
+
+    def _finish(self, job_id: str, status: str, result: Optional[bytes] = None,
+                error: Optional[str] = None):
+        running = self._running.pop(job_id)
+        process = running['process']
+        if process.is_alive():
+            process.terminate()
+        process.join(5)
+        running['conn'].close()
+        fields = {'status': status, 'stage': status, 'finished_at': time.time(), 'error': error}
+        if status == SUCCEEDED:
+            fields.update(progress=1.0, result=result)
+            if running['job'].get('cache_key') and self.result_cache is not None:
+                self.result_cache.put(running['job']['cache_key'], result)
+        self.store.update(job_id, **fields)
+        audit_metrics.AUDITS.inc(outcome=JOB_OUTCOMES[status])
+        _remove_workdir(running['job'])
+
+
+def _run_job(conn, file1: str, file2: str, config: Dict[str, Any],
+             names: Optional[Dict[str, str]] = None):
+    """Worker process: audit, reporting progress and measurements through conn"""
+    try:
+        from universal_payroll_auditor import UniversalPayrollAuditor
+        from file_source import FileSource
+        # The forked process starts with the server's memory high-water mark
+        audit_metrics.reset_peak_rss()
+        conn.send(('progress', 'loading', 0.1))
+        names = names or {}
+        sources = []
+        for key, path in (('file1', file1), ('file2', file2)):
+            # Content-addressed blobs are named by hash: report the uploaded name
+            sources.append(FileSource(open(path, 'rb'), names[key]) if names.get(key) else path)
+        auditor = UniversalPayrollAuditor(config)
+        result = auditor.audit(*sources, lazy=True)
+        result['metadata']
+        conn.send(('progress', 'comparing', 0.5))
+        result['summary']
+        conn.send(('progress', 'serializing', 0.9))
+        start = time.perf_counter()
+        payload = dumps(result.to_dict())
+        auditor.stage_timings['serialize'] = time.perf_counter() - start
+        conn.send(('metrics', audit_metrics.audit_report(auditor.stage_timings, result['metadata'])))
+        conn.send(('result', payload))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+
+def _remove_workdir(job: Optional[Dict[str, Any]]):
+    if job and job.get('workdir'):
+        shutil.rmtree(job['workdir'], ignore_errors=True)
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Audit Metrics
+Counters, gauges and histograms of the API rendered in the Prometheus text
+exposition format (served by GET /metrics), with no client library or
+external service. Stage histograms are fed by the auditor's STAGE_HOOKS;
+the API adds request counts, in-flight audits, input sizes and the peak
+resident memory of every audit.
+
+Metrics are kept per process: with several gunicorn workers each one
+reports its own, so scrape them as separate targets or sum in the query.
+
+Usage (measures the instrumentation overhead on two files):
+    python audit_metrics.py payroll1.csv payroll2.csv --runs 20
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import statistics
+import threading
+import time
+from typing import Dict, List, Tuple, Any, Optional, Callable, Iterable
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; audits range from milliseconds (cached) to minutes (large PDFs)
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+MB = 1024 * 1024
+MEMORY_BUCKETS = tuple(size * MB for size in (64, 128, 256, 512, 1024, 2048, 4096, 8192))
+
+# Sample lines (name suffix, labels, value) produced by a collector
+Samples = Iterable[Tuple[str, Dict[str, str], float]]
+
+
+class Metric:
+    """
+    A named metric with one value per combination of label values
+
+    Args:
+        name: Metric name, e.g. payroll_api_requests_total
+        help: One-line description
+        labels: Label names (values are given as keywords when updating)
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> Samples:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield '', dict(zip(self.labels, key)), value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing total"""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in cumulative buckets, with their sum and count
+
+    Args:
+        buckets: Upper bounds in increasing order (+Inf is added)
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = TIME_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Per-bucket counts, then sum; made cumulative when rendered
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            counts[-1] += value
+
+    def samples(self) -> Samples:
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in values:
+            labels = dict(zip(self.labels, key))
+            total = 0
+            for bound, count in zip(self.buckets, counts):
+                total += count
+                yield '_bucket', {**labels, 'le': _format_value(bound)}, total
+            yield '_sum', labels, counts[-1]
+            yield '_count', labels, total
+
+
+class Registry:
+    """Metrics and collectors rendered together by render()"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], List[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[Metric]]):
+        """Add a callable returning metrics computed at scrape time"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        metrics = list(self.metrics)
+        for collector in self.collectors:
+            metrics.extend(collector())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    'payroll_api_requests_total', 'HTTP requests served', ('endpoint', 'method', 'status')))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'payroll_api_request_duration_seconds', 'HTTP request latency', ('endpoint',)))
+AUDITS = REGISTRY.register(Counter(
+    'payroll_audits_total', 'Audits by outcome (ok, cached, error, timed_out, cancelled)',
+    ('outcome',)))
+AUDITS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'payroll_audits_in_flight', 'Audits running in this process'))
+INPUT_ROWS = REGISTRY.register(Counter(
+    'payroll_audit_input_rows_total', 'Rows read from audited files', ('file',)))
+INPUT_BYTES = REGISTRY.register(Counter(
+    'payroll_audit_input_bytes_total', 'Bytes of uploaded files', ('file',)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'payroll_audit_stage_duration_seconds',
+    'Time per audit spent in each pipeline stage (upload, load, normalize, compare, '
+    'summarize, serialize)', ('stage',)))
+PEAK_RSS = REGISTRY.register(Histogram(
+    'payroll_audit_peak_rss_bytes', 'Peak resident memory of the process during an audit',
+    buckets=MEMORY_BUCKETS))
+
+
+def observe_stages(timings: Dict[str, float]):
+    """Record one audit's stage timings (a STAGE_HOOKS callable)"""
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def observe_report(report: Dict[str, Any]):
+    """
+    Record an audit measured in another process (a queued audit's worker)
+
+    Args:
+        report: 'stages' ({stage: seconds}), 'peak_rss' (bytes) and 'rows'
+            ({'file1': n, 'file2': n}), as built by audit_report
+    """
+    observe_stages(report.get('stages', {}))
+    if report.get('peak_rss'):
+        PEAK_RSS.observe(report['peak_rss'])
+    for field, rows in report.get('rows', {}).items():
+        INPUT_ROWS.inc(rows, file=field)
+
+
+def audit_report(stage_timings: Dict[str, float], metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Measurements of an audit in this process, to send to observe_report elsewhere"""
+    return {
+        'stages': dict(stage_timings),
+        'peak_rss': peak_rss(),
+        'rows': {field: metadata[field]['rows'] for field in ('file1', 'file2')
+                 if 'rows' in metadata.get(field, {})}
+    }
+
+
+def install():
+    """Feed the auditor's stage timings into STAGE_SECONDS"""
+    from universal_payroll_auditor import STAGE_HOOKS
+    if observe_stages not in STAGE_HOOKS:
+        STAGE_HOOKS.append(observe_stages)
+
+
+def uninstall():
+    from universal_payroll_auditor import STAGE_HOOKS
+    if observe_stages in STAGE_HOOKS:
+        STAGE_HOOKS.remove(observe_stages)
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time a block as a stage of the API's part of an audit (upload, serialize)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def track_audit():
+    """
+    Count an audit as in flight and observe the peak RSS while it runs
+
+    The kernel's high-water mark is reset when the first concurrent audit
+    starts, so with overlapping audits each observes the peak of the whole
+    overlapping period. Where it cannot be reset (not Linux) the process
+    lifetime peak is observed instead.
+    """
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+        if _in_flight == 1:
+            reset_peak_rss()
+    AUDITS_IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        AUDITS_IN_FLIGHT.dec()
+        PEAK_RSS.observe(peak_rss())
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+def reset_peak_rss() -> bool:
+    """Reset this process's peak RSS to its current RSS (Linux); False when unsupported"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    """Peak resident memory of this process in bytes (since the last reset on Linux)"""
+    value = _proc_status('VmHWM')
+    if value is not None:
+        return value
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return 0
+
+
+def current_rss() -> int:
+    """Resident memory of this process in bytes (0 when unknown)"""
+    return _proc_status('VmRSS') or 0
+
+
+def _proc_status(field: str) -> Optional[int]:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def process_metrics() -> List[Metric]:
+    """Collector of this process's memory"""
+    rss = Gauge('process_resident_memory_bytes', 'Resident memory size in bytes')
+    rss.set(current_rss())
+    return [rss]
+
+
+REGISTRY.add_collector(process_metrics)
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    return REGISTRY.render()
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def measure_overhead(file1: str, file2: str, runs: int = 10) -> Dict[str, Any]:
+    """
+    Time audits of two files with and without the stage hooks installed
+
+    Runs alternate between the two so drift (caches, CPU frequency) affects
+    both alike. The parsed-file cache is disabled so every run parses.
+
+    Returns:
+        Median seconds per audit of each, the overhead, and the cost of
+        one observation and one render of the registry
+    """
+    from universal_payroll_auditor import UniversalPayrollAuditor
+
+    def audit():
+        start = time.perf_counter()
+        UniversalPayrollAuditor({'cache': False}).audit(file1, file2)
+        return time.perf_counter() - start
+
+    audit()  # warm up imports and page cache
+    plain, instrumented = [], []
+    for _ in range(runs):
+        uninstall()
+        plain.append(audit())
+        install()
+        with track_audit():
+            instrumented.append(audit())
+    uninstall()
+
+    count = 100000
+    histogram = Histogram('overhead_probe_seconds', 'probe', ('stage',))
+    start = time.perf_counter()
+    for index in range(count):
+        histogram.observe(index * 1e-6, stage='compare')
+    observe = (time.perf_counter() - start) / count
+
+    start = time.perf_counter()
+    with track_audit():
+        pass
+    track = time.perf_counter() - start
+
+    start = time.perf_counter()
+    render()
+    scrape = time.perf_counter() - start
+
+    base = statistics.median(plain)
+    hooked = statistics.median(instrumented)
+    return {
+        'runs': runs,
+        'plain': base,
+        'instrumented': hooked,
+        'overhead': hooked - base,
+        'overhead_pct': (hooked - base) / base * 100 if base else 0.0,
+        'observe': observe,
+        'track_audit': track,
+        'render': scrape
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the audit instrumentation overhead')
+    parser.add_argument('file1')
+    parser.add_argument('file2')
+    parser.add_argument('--runs', type=int, default=10, help='Audits of each kind (default: 10)')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = measure_overhead(args.file1, args.file2, args.runs)
+    print(f"{stats['runs']} audits of {os.path.basename(args.file1)} / {os.path.basename(args.file2)} each")
+    print(f"  without hooks   {stats['plain'] * 1000:10.2f} ms (median)")
+    print(f"  with hooks      {stats['instrumented'] * 1000:10.2f} ms (median)")
+    print(f"  overhead        {stats['overhead'] * 1000:10.2f} ms ({stats['overhead_pct']:+.2f}%)")
+    print(f"  one observation {stats['observe'] * 1e6:10.2f} us")
+    print(f"  track_audit     {stats['track_audit'] * 1e6:10.2f} us (peak RSS reset and read)")
+    print(f"  /metrics render {stats['render'] * 1000:10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Audit Result
+Results of an audit whose sections are computed on first access. Callers that
+only read the match rate pay for loading and comparing, not for the
+structure report, the unmatched records or materialized differences.
+"""
+
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+import pandas as pd
+
+from comparison_engine import unmatched_records
+from difference_table import DifferenceTable
+
+
+class AuditResult(dict):
+    """
+    Results dict with lazily computed, memoized sections
+
+    Works wherever the results dict of compare_files did: result['summary'],
+    result.get('metadata'), result['api_metadata'] = ..., iterating (which
+    computes every section). To serialize, use to_dict(): the json module's
+    C encoder and orjson read the dict storage directly and would only see
+    the sections computed so far. report_writers.dumps and the API's
+    jsonify call to_dict() themselves.
+
+    Args:
+        sections: Section name -> function computing it, in report order
+        differences: Function returning the DifferenceTable of kept differences
+        unmatched: Function returning (rows only in file 1, rows only in file 2, key columns)
+    """
+
+    def __init__(self, sections: Dict[str, Callable[[], Any]],
+                 differences: Optional[Callable[[], DifferenceTable]] = None,
+                 unmatched: Optional[Callable[[], Tuple[pd.DataFrame, pd.DataFrame, List[str]]]] = None):
+        super().__init__()
+        self._sections = dict(sections)
+        self._differences = differences
+        self._unmatched = unmatched
+
+    def __missing__(self, key: str) -> Any:
+        if key not in self._sections:
+            raise KeyError(key)
+        value = self._sections[key]()
+        dict.__setitem__(self, key, value)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return dict.__contains__(self, key) or key in self._sections
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def keys(self) -> List[str]:
+        return [key for key, _ in self.items()]
+
+    def values(self) -> List[Any]:
+        return [value for _, value in self.items()]
+
+    def items(self) -> List[tuple]:
+        # Sections in report order, then keys added by callers
+        return [(key, self[key]) for key in self._keys()]
+
+    @property
+    def computed(self) -> List[str]:
+        """Sections computed so far"""
+        return [key for key in self._sections if dict.__contains__(self, key)]
+
+    def materialize(self) -> 'AuditResult':
+        """Compute every section now"""
+        self.items()
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict with every section"""
+        return dict(self.items())
+
+    def differences(self, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """First limit kept differences as report dictionaries (all when None)"""
+        return self.difference_table().records(limit)
+
+    def difference_table(self) -> DifferenceTable:
+        """Every kept difference, as stored by the comparison"""
+        table = self._differences() if self._differences else None
+        return table if table is not None else DifferenceTable()
+
+    def differences_frame(self) -> pd.DataFrame:
+        """Every kept difference as one row per differing cell"""
+        return self.difference_table().to_frame()
+
+    def unmatched(self, limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        """First limit records found in only one of the files, per file"""
+        rows = self.unmatched_rows()
+        if rows is None:
+            return {'file1': [], 'file2': []}
+        only_file1, only_file2, key_columns = rows
+        return {'file1': unmatched_records(only_file1, key_columns, limit),
+                'file2': unmatched_records(only_file2, key_columns, limit)}
+
+    def unmatched_rows(self) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, List[str]]]:
+        """(rows only in file 1, rows only in file 2, key columns), or None when not kept"""
+        return self._unmatched() if self._unmatched else None
+
+    def _keys(self) -> List[str]:
+        return list(self._sections) + [key for key in dict.keys(self) if key not in self._sections]
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+API Server Benchmark
+Measures audit throughput of the Flask development server against the
+production server (production_server.py) on this machine: both are
+started on a free port, sent the same pair of generated payroll files
+from concurrent clients, and compared on first-request latency,
+requests per second and latency percentiles.
+
+Usage:
+    python benchmark_server.py --requests 60 --concurrency 4 --workers 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from typing import Dict, List, Any
+
+from generate_sample_data import generate_sample_payroll, generate_modified_version
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def multipart_body(paths: Dict[str, str]):
+    """(body, content type) of a multipart/form-data upload of the given files"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, path in paths.items():
+        with open(path, 'rb') as f:
+            content = f.read()
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                     f'filename="{os.path.basename(path)}"\r\n'
+                     f'Content-Type: text/csv\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def post_audit(url: str, body: bytes, content_type: str) -> float:
+    """Seconds one synchronous audit request took"""
+    request = urllib.request.Request(url + '/api/audit', data=body, method='POST',
+                                     headers={'Content-Type': content_type})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=600) as response:
+        json.loads(response.read())
+    return time.perf_counter() - start
+
+
+def start_server(command: List[str], port: int) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port), PYTHONUNBUFFERED='1')
+    process = subprocess.Popen(command, cwd=HERE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Server did not start: {' '.join(command)}")
+
+
+def run_load(url: str, body: bytes, content_type: str, requests: int,
+             concurrency: int) -> Dict[str, Any]:
+    """Send requests audits from concurrency client threads"""
+    latencies: List[float] = []
+    errors = []
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            try:
+                elapsed = post_audit(url, body, content_type)
+                with lock:
+                    latencies.append(elapsed)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+    return {
+        'completed': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50': pick(0.50),
+        'p95': pick(0.95)
+    }
+
+
+def benchmark(name: str, command: List[str], files: Dict[str, str], requests: int,
+              concurrency: int) -> Dict[str, Any]:
+    port = _free_port()
+    url = f'http://127.0.0.1:{port}'
+    body, content_type = multipart_body(files)
+    process = start_server(command, port)
+    try:
+        # The first audit pays for whatever the server did not import up front
+        first = post_audit(url, body, content_type)
+        stats = run_load(url, body, content_type, requests, concurrency)
+    finally:
+        process.terminate()
+        process.wait(60)
+    stats.update(name=name, first=first)
+    return stats
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare dev and production API server throughput')
+    parser.add_argument('--requests', type=int, default=40, help='Audits per server (default: 40)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Client threads (default: 4)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Production server workers (default: CPU count)')
+    parser.add_argument('--employees', type=int, default=2000,
+                        help='Rows per generated payroll file (default: 2000)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = {'file1': os.path.join(tmpdir, 'payroll_original.csv'),
+                 'file2': os.path.join(tmpdir, 'payroll_corrected.csv')}
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_sample_payroll(args.employees, files['file1'])
+            generate_modified_version(files['file1'], files['file2'],
+                                      num_changes=max(1, args.employees // 20))
+
+        servers = [
+            ('flask dev server', [sys.executable, 'api_server.py']),
+            (f'production ({args.workers} workers)',
+             [sys.executable, 'production_server.py', '--workers', str(args.workers)])
+        ]
+        results = []
+        for name, command in servers:
+            print(f"Benchmarking {name}...")
+            results.append(benchmark(name, command, files, args.requests, args.concurrency))
+
+    print(f"\n{args.requests} audits of {args.employees} rows, {args.concurrency} concurrent clients, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'Server':<28}{'First audit':>12}{'Audits/s':>10}{'p50':>9}{'p95':>9}{'Errors':>8}")
+    for stats in results:
+        print(f"{stats['name']:<28}{stats['first']:>11.3f}s{stats['throughput']:>10.2f}"
+              f"{stats['p50']:>8.3f}s{stats['p95']:>8.3f}s{stats['errors']:>8}")
+    if len(results) == 2 and results[0]['throughput']:
+        print(f"\nThroughput gain: {results[1]['throughput'] / results[0]['throughput']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
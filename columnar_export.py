@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Columnar Export
+Write the complete difference table, plus the rows found in only one file,
+as typed Parquet or Arrow IPC files. One row per differing cell; values are
+written straight from the table's arrays in batches, so no report
+dictionaries are built and numbers and dates keep their types.
+"""
+
+from typing import List, Optional, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from difference_table import DifferenceTable, report_value
+
+# Try to import optional dependencies
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    ARROW_SUPPORT = True
+except ImportError:
+    ARROW_SUPPORT = False
+
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+# Cells per record batch (and Parquet row group write)
+BATCH_SIZE = 65536
+
+# kind column: a changed cell of a matched row, or a cell of an unmatched row
+KINDS = ('changed', 'only_file1', 'only_file2')
+
+if ARROW_SUPPORT:
+    # Each side's value lands in the column of its type; the others are null
+    DIFFERENCE_SCHEMA = pa.schema([
+        ('rank', pa.int64()),
+        ('identifier', pa.string()),
+        ('field', pa.string()),
+        ('kind', pa.string()),
+        ('file1', pa.float64()),
+        ('file2', pa.float64()),
+        ('file1_date', pa.timestamp('ns')),
+        ('file2_date', pa.timestamp('ns')),
+        ('file1_text', pa.string()),
+        ('file2_text', pa.string()),
+        ('difference', pa.float64()),
+        ('days', pa.float64())
+    ])
+
+# (rows only in file 1, rows only in file 2, key columns)
+UnmatchedRows = Tuple[pd.DataFrame, pd.DataFrame, List[str]]
+
+
+def write_columnar(table: DifferenceTable, path: str, format: str = 'parquet',
+                   unmatched: Optional[UnmatchedRows] = None,
+                   batch_size: int = BATCH_SIZE) -> int:
+    """
+    Write differences and unmatched rows to a Parquet or Arrow IPC file
+
+    Load back with pd.read_parquet(path) or
+    pa.ipc.open_file(path).read_pandas().
+
+    Args:
+        table: Every kept difference
+        path: Output file
+        format: 'parquet' or 'arrow'
+        unmatched: Rows found in only one file (money columns in dollars)
+        batch_size: Cells per record batch
+
+    Returns:
+        Number of differing cells written (unmatched cells not included)
+    """
+    if not ARROW_SUPPORT:
+        raise ImportError("Parquet/Arrow export requires pyarrow. Install with: pip install pyarrow")
+    if format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unsupported columnar format: {format}")
+
+    if format == 'parquet':
+        writer = pq.ParquetWriter(path, DIFFERENCE_SCHEMA)
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_file(path, DIFFERENCE_SCHEMA)
+        write = writer.write_batch
+    try:
+        for batch in difference_batches(table, unmatched, batch_size):
+            write(batch)
+    finally:
+        writer.close()
+    return table.cell_count
+
+
+def difference_batches(table: DifferenceTable, unmatched: Optional[UnmatchedRows] = None,
+                       batch_size: int = BATCH_SIZE) -> Iterator['pa.RecordBatch']:
+    """Record batches of DIFFERENCE_SCHEMA: changed cells field by field, then unmatched rows"""
+    identifiers = _text(table.identifiers)
+    for field, cells in table.fields.items():
+        for first in range(0, len(cells), batch_size):
+            last = first + batch_size
+            rows = cells.rows[first:last]
+            yield _batch(rows, identifiers[rows], field, 'changed',
+                         _side(cells.file1[first:last], cells.scales[0]),
+                         _side(cells.file2[first:last], cells.scales[1]),
+                         cells.delta[first:last], cells.days[first:last])
+
+    if unmatched is None:
+        return
+    only_file1, only_file2, key_columns = unmatched
+    for kind, rows in (('only_file1', only_file1), ('only_file2', only_file2)):
+        if rows.empty:
+            continue
+        missing = np.full(min(len(rows), batch_size), np.nan)
+        for first in range(0, len(rows), batch_size):
+            chunk = rows.iloc[first:first + batch_size]
+            keys = _row_identifiers(chunk, key_columns)
+            empty = _side(np.full(len(chunk), None, dtype=object), 1)
+            for col in chunk.columns:
+                if col in key_columns:
+                    continue
+                values = _side(_values(chunk[col]), 1)
+                sides = (values, empty) if kind == 'only_file1' else (empty, values)
+                yield _batch(None, keys, str(col), kind, *sides,
+                             missing[:len(chunk)], missing[:len(chunk)])
+
+
+def _batch(rows: Optional[np.ndarray], identifiers: np.ndarray, field: str, kind: str,
+           side1: tuple, side2: tuple, delta: np.ndarray, days: np.ndarray) -> 'pa.RecordBatch':
+    count = len(identifiers)
+    return pa.RecordBatch.from_arrays([
+        pa.array(rows, type=pa.int64()) if rows is not None else pa.nulls(count, pa.int64()),
+        pa.array(identifiers, type=pa.string()),
+        pa.array(np.full(count, field, dtype=object), type=pa.string()),
+        pa.array(np.full(count, kind, dtype=object), type=pa.string()),
+        side1[0], side2[0], side1[1], side2[1], side1[2], side2[2],
+        pa.array(delta, type=pa.float64(), from_pandas=True),
+        pa.array(days, type=pa.float64(), from_pandas=True)
+    ], schema=DIFFERENCE_SCHEMA)
+
+
+def _side(values: np.ndarray, scale: int) -> tuple:
+    """(number, date, text) Arrow arrays for one side's values; each value fills one"""
+    count = len(values)
+    kind = values.dtype.kind
+    if kind in 'iufb':
+        numbers = values.astype('float64') / scale if scale != 1 else values.astype('float64')
+        return (pa.array(numbers, type=pa.float64(), from_pandas=True),
+                pa.nulls(count, pa.timestamp('ns')), pa.nulls(count, pa.string()))
+    if kind == 'M':
+        return (pa.nulls(count, pa.float64()),
+                pa.array(values.astype('datetime64[ns]'), type=pa.timestamp('ns'), from_pandas=True),
+                pa.nulls(count, pa.string()))
+
+    # Object cells (text, or mixed values from the row-by-row engine): route by type
+    numbers = np.full(count, np.nan)
+    dates = np.full(count, np.datetime64('NaT'), dtype='datetime64[ns]')
+    text = np.full(count, None, dtype=object)
+    for index, value in enumerate(values):
+        if value is None or value is pd.NA or value is pd.NaT:
+            continue
+        if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+            numbers[index] = value / scale if scale != 1 and isinstance(value, (int, np.integer)) else value
+        elif isinstance(value, (pd.Timestamp, np.datetime64)):
+            dates[index] = np.datetime64(pd.Timestamp(value).as_unit('ns').to_datetime64())
+        else:
+            text[index] = str(value)
+    return (pa.array(numbers, type=pa.float64(), from_pandas=True),
+            pa.array(dates, type=pa.timestamp('ns'), from_pandas=True),
+            pa.array(text, type=pa.string(), from_pandas=True))
+
+
+def _values(column: pd.Series) -> np.ndarray:
+    """Column values as a NumPy array of the matching kind (NaN/NaT for missing)"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype(object)
+    if pd.api.types.is_datetime64_any_dtype(column.dtype):
+        return column.to_numpy(dtype='datetime64[ns]')
+    if pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype):
+        return column.to_numpy(dtype='float64', na_value=np.nan)
+    return column.to_numpy(dtype=object, na_value=None)
+
+
+def _row_identifiers(rows: pd.DataFrame, key_columns: List[str]) -> np.ndarray:
+    """Key of every row as text, composite keys joined like unmatched_records"""
+    if not key_columns:
+        return np.array([str(row) for row in range(len(rows))], dtype=object)
+    joined = None
+    for col in key_columns:
+        # Format each distinct key once
+        codes, uniques = pd.factorize(rows[col])
+        texts = np.array([str(report_value(value)) for value in uniques] + ['None'], dtype=object)
+        key = texts[codes]
+        joined = key if joined is None else joined + ' | ' + key
+    return joined
+
+
+def _text(values: np.ndarray) -> np.ndarray:
+    return np.array([None if value is None else str(value) for value in values], dtype=object)
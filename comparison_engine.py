@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""
+Vectorized Comparison Engine
+Aligns two payroll frames once by identifier and compares them column-at-a-time
+with NumPy difference masks instead of a Python loop over every row
+"""
+
+import heapq
+import itertools
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+from value_normalizers import CENTS
+from field_statistics import FieldStats, day_shifts, merge_day_shifts, merge_field_stats
+from difference_table import DifferenceTable, FieldCells, report_value
+
+ENGINES = ('vectorized', 'rowwise')
+DEFAULT_ENGINE = 'vectorized'
+DEFAULT_KEY_COLUMNS = ['employee', 'employee_id', 'id']
+
+# How kept differences are chosen and ordered: file order, or most material first
+RANKINGS = ('row', 'abs_delta', 'rel_delta', 'field_priority')
+DEFAULT_RANKING = 'row'
+
+
+class Alignment:
+    """
+    Row-for-row pairing of two frames produced by a single join
+
+    left and right hold the paired rows at the same positions. Duplicate keys
+    are disambiguated by occurrence number, so the second "Jane Smith" row in
+    file 1 pairs with the second "Jane Smith" row in file 2. rows1 holds the
+    original file 1 row number of every pair, which keeps output order stable
+    when partitions or shards are merged.
+    """
+    
+    def __init__(self, left: pd.DataFrame, right: pd.DataFrame,
+                 key_columns: Optional[List[str]] = None,
+                 occurrence: Optional[np.ndarray] = None,
+                 duplicated: Optional[np.ndarray] = None,
+                 only_file1: Optional[pd.DataFrame] = None,
+                 only_file2: Optional[pd.DataFrame] = None,
+                 duplicate_keys: Optional[Dict[str, Any]] = None,
+                 rows1: Optional[np.ndarray] = None):
+        self.left = left
+        self.right = right
+        self.key_columns = key_columns or []
+        self.occurrence = occurrence
+        self.duplicated = duplicated
+        self.only_file1 = only_file1 if only_file1 is not None else left.iloc[:0]
+        self.only_file2 = only_file2 if only_file2 is not None else right.iloc[:0]
+        self.duplicate_keys = duplicate_keys or {}
+        self.rows1 = rows1 if rows1 is not None else np.arange(len(left))
+    
+    def __len__(self) -> int:
+        return len(self.left)
+    
+    def label(self, pos: int) -> Any:
+        """Identifier shown in reports for the aligned row at pos"""
+        if not self.key_columns:
+            return f"Row {self.rows1[pos]}"
+        return _key_label(self.left, self.key_columns, pos,
+                          self.occurrence[pos], self.duplicated[pos])
+    
+    def labels(self, positions: np.ndarray) -> np.ndarray:
+        """Identifiers of many aligned rows at once (same values as label)"""
+        if not self.key_columns:
+            return _objects([f"Row {row}" for row in self.rows1[positions]])
+        # Report values are computed once per distinct key value
+        parts = []
+        for col in self.key_columns:
+            codes, uniques = pd.factorize(self.left[col].iloc[positions], use_na_sentinel=False)
+            parts.append(_objects([report_value(value) for value in uniques])[codes])
+        if len(parts) == 1:
+            labels = parts[0]
+        else:
+            labels = _objects([' | '.join(str(value) for value in values) for values in zip(*parts)])
+        duplicated = np.flatnonzero(self.duplicated[positions])
+        for i in duplicated:
+            labels[i] = f"{labels[i]} #{int(self.occurrence[positions[i]]) + 1}"
+        return labels
+    
+    def report(self) -> Dict[str, Any]:
+        """Counts of unmatched rows and duplicate keys for the results"""
+        return {
+            'unmatched_in_file1': len(self.only_file1),
+            'unmatched_in_file2': len(self.only_file2),
+            'duplicate_keys': self.duplicate_keys
+        }
+
+
+def resolve_key_columns(common_cols: List[str], key_columns: Any = None) -> List[str]:
+    """
+    Pick the join key for two files
+
+    Explicit key_columns (a name or list of names) must exist in both files.
+    Otherwise the first of employee/employee_id/id is used, or [] to fall
+    back to positional comparison.
+    """
+    if key_columns:
+        if isinstance(key_columns, str):
+            key_columns = [key_columns]
+        missing = [col for col in key_columns if col not in common_cols]
+        if missing:
+            raise ValueError(f"Key column(s) not found in both files: {', '.join(missing)}")
+        return list(key_columns)
+    
+    for col in DEFAULT_KEY_COLUMNS:
+        if col in common_cols:
+            return [col]
+    return []
+
+
+def compare_frames(df1: pd.DataFrame, df2: pd.DataFrame, columns: List[str],
+                   key_columns: Optional[List[str]] = None, tolerance: float = 0.01,
+                   limit: int = 100, rank_by: str = DEFAULT_RANKING,
+                   field_priority: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Align and compare two frames, returning the same structure as the row-wise path
+
+    Args:
+        df1: Normalized data from the first file
+        df2: Normalized data from the second file
+        columns: Common columns to compare (key columns are skipped)
+        key_columns: Columns to join on, or None/[] to align by position
+        tolerance: Numeric differences at or below this value are ignored
+        limit: Maximum number of row differences to materialize
+        rank_by: Which differences to keep, see compare_aligned
+        field_priority: Fields in priority order for rank_by='field_priority'
+
+    Returns:
+        Dictionary with total_differences, matched_rows, differences (a
+        DifferenceTable) and the unmatched/duplicate key counts
+    """
+    alignment = align_frames(df1, df2, key_columns)
+    comparison = compare_aligned(alignment, columns, tolerance, limit,
+                                 rank_by=rank_by, field_priority=field_priority)
+    return {**comparison, **alignment.report()}
+
+
+def compare_aligned(alignment: Alignment, columns: List[str], tolerance: float = 0.01,
+                    limit: int = 100, money_columns: Iterable[str] = (),
+                    rank_by: str = DEFAULT_RANKING,
+                    field_priority: Optional[List[str]] = None,
+                    fingerprint: bool = True) -> Dict[str, Any]:
+    """
+    Compare aligned rows column-at-a-time
+
+    Integer columns listed in money_columns hold cents and are compared exactly
+    as int64; their values and deltas are reported in dollars. The kept
+    differences are returned as a DifferenceTable (cells gathered column-wise;
+    report dictionaries are built only by its records()). '_field_stats'
+    holds FieldStats over every difference, not just the first limit rows,
+    and '_date_shifts' the rows per day shift of every date column.
+
+    rank_by picks the limit differences that are kept: 'row' keeps the first
+    ones in file 1 order, 'abs_delta' the largest total dollar delta,
+    'rel_delta' the largest relative delta of any field and 'field_priority'
+    the rows differing in the highest priority field (then by dollar delta).
+    '_order' holds the rank key of every kept difference, ties broken by file
+    1 row, so results merge to the same top differences however rows are split.
+
+    With fingerprint, rows whose row fingerprints match on both sides count
+    as matched without a field comparison; only the rest are compared.
+    """
+    left, right = alignment.left, alignment.right
+    money_columns = set(money_columns)
+    columns = [col for col in left.columns
+               if col in columns and col in right.columns and col not in alignment.key_columns]
+    
+    # Aligned positions still to compare, and their file 1 row numbers
+    candidates = np.arange(len(left))
+    if fingerprint and len(left):
+        candidates = np.flatnonzero(
+            row_fingerprints(left, columns, money_columns, tolerance)
+            != row_fingerprints(right, columns, money_columns, tolerance))
+        if len(candidates) < len(left):
+            left = left.iloc[candidates].reset_index(drop=True)
+            right = right.iloc[candidates].reset_index(drop=True)
+    rows1 = alignment.rows1[candidates]
+    
+    row_mask = np.zeros(len(left), dtype=bool)
+    column_results = []
+    field_stats = {}
+    date_shifts = {}
+    for col in columns:
+        diff = column_diff(left[col], right[col], tolerance, money=col in money_columns)
+        row_mask |= diff.mask
+        column_results.append((col, diff))
+        field_stats[col] = diff.stats()
+        if diff.days is not None:
+            date_shifts[col] = diff.shifts()
+    
+    positions = np.flatnonzero(row_mask)
+    order, kept = _rank_positions(rows1, left, right, column_results, positions,
+                                  limit, rank_by, field_priority)
+    # Kept rows as a sparse table: per column only the cells that differ
+    identifiers = alignment.labels(candidates[kept])
+    fields = {}
+    for col, diff in column_results:
+        rows = np.flatnonzero(diff.mask[kept])
+        if len(rows):
+            fields[col] = diff.cells(rows, kept[rows], left[col], right[col])
+    
+    return {
+        'total_differences': int(len(positions)),
+        'matched_rows': int(len(alignment) - len(positions)),
+        'differences': DifferenceTable(identifiers, fields),
+        '_order': order,
+        '_field_stats': field_stats,
+        '_date_shifts': date_shifts
+    }
+
+
+def merge_comparisons(parts: List[Dict[str, Any]], limit: int = 100) -> Dict[str, Any]:
+    """
+    Merge partial comparison results (partitions or shards)
+
+    Counts are summed, and duplicate key reports, field statistics and date
+    shifts are combined. Differences are
+    merged by rank key ('_order', the original file 1 row by default) when
+    every part carries it, so the result does not depend on how rows were
+    split; otherwise parts are concatenated in the given order. At most limit
+    differences are kept.
+    """
+    merged = {
+        'total_differences': 0,
+        'matched_rows': 0,
+        'differences': DifferenceTable(),
+        'unmatched_in_file1': 0,
+        'unmatched_in_file2': 0,
+        'duplicate_keys': {},
+        '_order': [],
+        '_field_stats': merge_field_stats(part.get('_field_stats', {}) for part in parts),
+        '_date_shifts': merge_day_shifts(part.get('_date_shifts', {}) for part in parts)
+    }
+    for part in parts:
+        for count in ('total_differences', 'matched_rows', 'unmatched_in_file1', 'unmatched_in_file2'):
+            merged[count] += part.get(count, 0)
+        for label, dupes in part.get('duplicate_keys', {}).items():
+            into = merged['duplicate_keys'].setdefault(label, {'keys': 0, 'rows': 0, 'examples': []})
+            into['keys'] += dupes['keys']
+            into['rows'] += dupes['rows']
+            into['examples'].extend(dupes['examples'][:max(0, 10 - len(into['examples']))])
+    
+    table = DifferenceTable.concat(part['differences'] for part in parts)
+    if all('_order' in part for part in parts):
+        # Rows of the concatenated table, numbered in part order
+        offsets = np.cumsum([0] + [len(part['differences']) for part in parts])
+        ordered = heapq.merge(*(zip(part['_order'], range(offset, offset + len(part['_order'])))
+                                for part, offset in zip(parts, offsets)),
+                              key=lambda pair: pair[0])
+        kept = list(itertools.islice(ordered, limit))
+        merged['_order'] = [key for key, _ in kept]
+        merged['differences'] = table.take([row for _, row in kept])
+    else:
+        del merged['_order']
+        merged['differences'] = table.head(limit)
+    return merged
+
+
+def row_fingerprints(df: pd.DataFrame, columns: List[str], money_columns: Iterable[str] = (),
+                     tolerance: float = 0.01) -> np.ndarray:
+    """
+    64-bit fingerprint of every row over the compared columns
+    
+    Cent columns hash as cents and, when the tolerance is at least a cent,
+    other numbers are rounded to cents first, so equal fingerprints on both
+    sides mean the rows compare equal within the tolerance. Unequal
+    fingerprints only mean the row needs a field comparison.
+    """
+    money_columns = set(money_columns)
+    quantize = tolerance >= 1 / CENTS
+    hashable = {}
+    for i, col in enumerate(columns):
+        series = df[col]
+        if col in money_columns and _is_integer(series):
+            hashable[i] = series.to_numpy(dtype='float64', na_value=np.nan)
+        elif quantize and _is_numeric(series) and not pd.api.types.is_bool_dtype(series.dtype):
+            hashable[i] = np.rint(series.to_numpy(dtype='float64', na_value=np.nan) * CENTS)
+        else:
+            hashable[i] = series
+    if not hashable:
+        return np.zeros(len(df), dtype=np.uint64)
+    frame = pd.DataFrame(hashable, index=df.index)
+    # Factorizing first only pays off for low-cardinality text
+    return pd.util.hash_pandas_object(frame, index=False, categorize=False).to_numpy()
+
+
+def rank_key(fields: Dict[str, Dict[str, Any]], row: int, rank_by: str = DEFAULT_RANKING,
+             field_priority: Optional[List[str]] = None) -> Any:
+    """
+    Rank key of one row's differences (smaller is kept first)
+    
+    Used by the row-at-a-time engines; matches the keys compare_aligned
+    computes column-at-a-time.
+    """
+    if rank_by == 'row':
+        return row
+    
+    absolute = 0.0
+    relative = 0.0
+    for values in fields.values():
+        delta, magnitude = _cell_delta(values.get('file1'), values.get('file2'))
+        absolute += delta
+        relative = max(relative, _relative(delta, magnitude))
+    
+    if rank_by == 'abs_delta':
+        return (-absolute, row)
+    if rank_by == 'rel_delta':
+        return (-relative, row)
+    weights = _priority_weights(field_priority)
+    return (-max((weights.get(field, 0) for field in fields), default=0), -absolute, row)
+
+
+def _rank_positions(rows1: np.ndarray, left: pd.DataFrame, right: pd.DataFrame,
+                    column_results: List[Tuple[str, 'ColumnDiff']], positions: np.ndarray,
+                    limit: int, rank_by: str,
+                    field_priority: Optional[List[str]]) -> Tuple[List[Any], np.ndarray]:
+    """Rank keys and aligned positions of the limit differences to keep"""
+    if rank_by not in RANKINGS:
+        raise ValueError(f"Unsupported ranking: {rank_by}")
+    rows = rows1[positions]
+    if rank_by == 'row':
+        return rows[:limit].tolist(), positions[:limit]
+    
+    absolute = np.zeros(len(positions))
+    relative = np.zeros(len(positions))
+    priority = np.zeros(len(positions))
+    weights = _priority_weights(field_priority)
+    for col, diff in column_results:
+        differs = diff.mask[positions]
+        if weights.get(col):
+            priority = np.maximum(priority, np.where(differs, weights[col], 0))
+        if diff.delta is None:
+            continue
+        values1 = left[col].to_numpy(dtype='float64', na_value=np.nan)[positions] / diff.scales[0]
+        values2 = right[col].to_numpy(dtype='float64', na_value=np.nan)[positions] / diff.scales[1]
+        # A missing amount counts as the whole of the present one
+        delta = np.nan_to_num(np.abs(values2 - values1), nan=0.0)
+        missing = np.isnan(values1) ^ np.isnan(values2)
+        delta[missing] = np.nan_to_num(np.fmax(np.abs(values1), np.abs(values2)))[missing]
+        delta[~differs] = 0.0
+        magnitude = np.nan_to_num(np.fmax(np.abs(values1), np.abs(values2)), nan=0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(magnitude > 0, delta / magnitude, np.where(delta > 0, 1.0, 0.0))
+        absolute += delta
+        relative = np.maximum(relative, ratio)
+    
+    if rank_by == 'abs_delta':
+        keys = [-absolute]
+    elif rank_by == 'rel_delta':
+        keys = [-relative]
+    else:
+        keys = [-priority, -absolute]
+    
+    # Only rows that can reach the top limit on the primary key need a full sort
+    candidates = np.arange(len(positions))
+    if len(positions) > limit > 0:
+        cutoff = np.partition(keys[0], limit - 1)[limit - 1]
+        candidates = np.flatnonzero(keys[0] <= cutoff)
+    ranked = candidates[np.lexsort([rows[candidates]] + [key[candidates] for key in reversed(keys)])]
+    ranked = ranked[:limit]
+    
+    order = [tuple(float(key[i]) for key in keys) + (int(rows[i]),) for i in ranked]
+    return order, positions[ranked]
+
+
+def _priority_weights(field_priority: Optional[List[str]]) -> Dict[str, int]:
+    """Weight per field, highest for the first field in the priority list"""
+    field_priority = field_priority or []
+    return {field: len(field_priority) - i for i, field in enumerate(field_priority)}
+
+
+def _cell_delta(value1: Any, value2: Any) -> Tuple[float, float]:
+    """Absolute delta and magnitude of a reported cell pair (0 for text)"""
+    number1, number2 = _as_number(value1), _as_number(value2)
+    if number1 is not None and number2 is not None:
+        return abs(number2 - number1), max(abs(number1), abs(number2))
+    present = number1 if number1 is not None else number2
+    other = value2 if number1 is not None else value1
+    if present is None or not _is_missing(other):
+        return 0.0, 0.0
+    # A missing amount counts as the whole of the present one
+    return abs(present), abs(present)
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float, np.number)) and not _is_missing(value):
+        return float(value)
+    return None
+
+
+def _relative(delta: float, magnitude: float) -> float:
+    if magnitude > 0:
+        return delta / magnitude
+    return 1.0 if delta > 0 else 0.0
+
+
+def _is_missing(value: Any) -> bool:
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def align_frames(df1: pd.DataFrame, df2: pd.DataFrame,
+                 key_columns: Optional[List[str]] = None) -> Alignment:
+    """
+    Pair up the rows of both frames in one hash join
+
+    Rows are matched on (key_columns, occurrence number) so duplicate keys
+    pair in file order instead of colliding. Without key columns rows are
+    paired by position up to the shorter file.
+    """
+    if not key_columns:
+        rows = min(len(df1), len(df2))
+        return Alignment(
+            df1.iloc[:rows].reset_index(drop=True),
+            df2.iloc[:rows].reset_index(drop=True),
+            only_file1=df1.iloc[rows:],
+            only_file2=df2.iloc[rows:],
+            rows1=_row_numbers(df1)[:rows]
+        )
+    
+    keys1 = _key_frame(df1, key_columns, '_pos_file1')
+    keys2 = _key_frame(df2, key_columns, '_pos_file2')
+    for col in key_columns:
+        # Joining int to str keys raises in pandas; compare them as text instead
+        if keys1[col].dtype != keys2[col].dtype and not (
+                _is_numeric(keys1[col]) and _is_numeric(keys2[col])):
+            keys1[col] = keys1[col].astype(str)
+            keys2[col] = keys2[col].astype(str)
+    
+    join_on = key_columns + ['_occurrence']
+    pairs = keys1[join_on + ['_pos_file1']].merge(
+        keys2[join_on + ['_pos_file2']], on=join_on, how='inner', sort=False)
+    pos1 = pairs['_pos_file1'].to_numpy()
+    pos2 = pairs['_pos_file2'].to_numpy()
+    
+    dup1 = keys1['_duplicated'].to_numpy()
+    dup2 = keys2['_duplicated'].to_numpy()
+    unmatched1 = np.setdiff1d(np.arange(len(df1)), pos1, assume_unique=True)
+    unmatched2 = np.setdiff1d(np.arange(len(df2)), pos2, assume_unique=True)
+    
+    return Alignment(
+        df1.iloc[pos1].reset_index(drop=True),
+        df2.iloc[pos2].reset_index(drop=True),
+        key_columns=list(key_columns),
+        occurrence=pairs['_occurrence'].to_numpy(),
+        duplicated=dup1[pos1] | dup2[pos2],
+        only_file1=df1.iloc[unmatched1],
+        only_file2=df2.iloc[unmatched2],
+        duplicate_keys={
+            'file1': _duplicate_report(df1, keys1, key_columns),
+            'file2': _duplicate_report(df2, keys2, key_columns)
+        },
+        rows1=_row_numbers(df1)[pos1]
+    )
+
+
+def unmatched_records(rows: pd.DataFrame, key_columns: List[str],
+                      limit: int = 20) -> List[Dict[str, Any]]:
+    """First unmatched rows (Alignment.only_file1/only_file2) as {'id': key, 'data': other columns}"""
+    records = []
+    for record in rows.head(limit).to_dict('records'):
+        record = {col: report_value(value) for col, value in record.items()}
+        key = [record.pop(col) for col in key_columns]
+        records.append({'id': key[0] if len(key) == 1 else ' | '.join(map(str, key)),
+                        'data': record})
+    return records
+
+
+def _row_numbers(df: pd.DataFrame) -> np.ndarray:
+    """Original row numbers of a loaded frame or of a slice of one"""
+    if pd.api.types.is_integer_dtype(df.index.dtype):
+        return df.index.to_numpy()
+    return np.arange(len(df))
+
+
+def _key_frame(df: pd.DataFrame, key_columns: List[str], position_column: str) -> pd.DataFrame:
+    """Key columns plus occurrence number, duplicate flag and original position"""
+    keys = df[key_columns].reset_index(drop=True)
+    keys['_occurrence'] = keys.groupby(key_columns, sort=False, dropna=False).cumcount()
+    keys['_duplicated'] = keys.duplicated(key_columns, keep=False)
+    keys[position_column] = np.arange(len(keys))
+    return keys
+
+
+def _duplicate_report(df: pd.DataFrame, keys: pd.DataFrame,
+                      key_columns: List[str], examples: int = 10) -> Dict[str, Any]:
+    duplicated = keys['_duplicated'].to_numpy()
+    first_rows = np.flatnonzero(duplicated & (keys['_occurrence'].to_numpy() == 0))
+    return {
+        'keys': int(len(first_rows)),
+        'rows': int(duplicated.sum()),
+        'examples': [_key_label(df, key_columns, pos) for pos in first_rows[:examples]]
+    }
+
+
+def _objects(values: List[Any]) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _key_label(df: pd.DataFrame, key_columns: List[str], pos: int,
+               occurrence: int = 0, duplicated: bool = False) -> Any:
+    values = [report_value(df[col].iat[pos]) for col in key_columns]
+    label = values[0] if len(values) == 1 else ' | '.join(str(v) for v in values)
+    if duplicated:
+        label = f"{label} #{int(occurrence) + 1}"
+    return label
+
+
+class ColumnDiff:
+    """
+    Difference mask for one aligned column pair
+
+    delta holds file2 - file1 for numeric pairs (None for text), days the
+    same in days for date pairs, valid marks rows where both sides are
+    present and scale converts delta and cell values to report units (100
+    for integer cents).
+    """
+    
+    __slots__ = ('mask', 'delta', 'valid', 'scales', 'days')
+    
+    def __init__(self, mask: np.ndarray, delta: Optional[np.ndarray] = None,
+                 valid: Optional[np.ndarray] = None, scales: Tuple[int, int] = (1, 1),
+                 days: Optional[np.ndarray] = None):
+        self.mask = mask
+        self.delta = delta
+        self.valid = valid
+        self.scales = scales
+        self.days = days
+    
+    @property
+    def scale(self) -> int:
+        return self.scales[0] if self.scales[0] == self.scales[1] else 1
+    
+    def cells(self, rows: np.ndarray, positions: np.ndarray, col1: pd.Series,
+              col2: pd.Series) -> FieldCells:
+        """Differing cells at aligned positions, stored as table rows"""
+        delta = days = None
+        if self.delta is not None:
+            delta = np.where(self.valid[positions], self.delta[positions] / self.scale, np.nan)
+        if self.days is not None:
+            days = np.where(self.valid[positions], self.days[positions], np.nan)
+        return FieldCells(rows, col1.iloc[positions].to_numpy(), col2.iloc[positions].to_numpy(),
+                          delta, days, self.scales)
+    
+    def shifts(self) -> Dict[int, int]:
+        """Rows per whole-day shift over every differing row (date pairs only)"""
+        if self.days is None:
+            return {}
+        return day_shifts(self.days[self.mask & self.valid])
+    
+    def stats(self) -> FieldStats:
+        """FieldStats over every differing row of the column"""
+        stats = FieldStats()
+        if self.delta is None:
+            stats.add(np.empty(0), count=int(self.mask.sum()))
+        else:
+            stats.add(self.delta[self.mask & self.valid], count=int(self.mask.sum()),
+                      scale=self.scale)
+        return stats
+
+
+def column_diff(col1: pd.Series, col2: pd.Series, tolerance: float,
+                money: bool = False) -> ColumnDiff:
+    """
+    Build the difference mask for one aligned column pair
+
+    Numeric pairs use the tolerance and keep the signed delta (file2 - file1);
+    date pairs compare exactly and keep the shift in days; everything else
+    compares stripped string values. Two missing values are
+    equal, a missing value against a present one is a difference. For money
+    columns integer sides are cents: two cent columns compare as exact int64
+    with the tolerance rounded to cents, a single cent side is scaled back to
+    dollars first.
+    """
+    na1 = col1.isna().to_numpy()
+    na2 = col2.isna().to_numpy()
+    scales = (CENTS if money and _is_integer(col1) else 1,
+              CENTS if money and _is_integer(col2) else 1)
+    
+    if scales == (CENTS, CENTS):
+        cents1 = col1.to_numpy(dtype='int64', na_value=0)
+        cents2 = col2.to_numpy(dtype='int64', na_value=0)
+        delta = cents2 - cents1
+        valid = ~(na1 | na2)
+        mask = ((np.abs(delta) > int(round(tolerance * CENTS))) & valid) | (na1 ^ na2)
+        return ColumnDiff(mask, delta, valid, scales)
+    
+    if _is_numeric(col1) and _is_numeric(col2):
+        values1 = col1.to_numpy(dtype='float64', na_value=np.nan) / scales[0]
+        values2 = col2.to_numpy(dtype='float64', na_value=np.nan) / scales[1]
+        delta = values2 - values1
+        with np.errstate(invalid='ignore'):
+            mask = np.abs(delta) > tolerance
+        return ColumnDiff(mask | (na1 ^ na2), delta, ~(na1 | na2), scales)
+    
+    if _is_datetime(col1) and _is_datetime(col2):
+        dates1 = col1.to_numpy(dtype='datetime64[ns]')
+        dates2 = col2.to_numpy(dtype='datetime64[ns]')
+        valid = ~(na1 | na2)
+        days = np.where(valid, (dates2 - dates1) / np.timedelta64(1, 'D'), 0.0)
+        return ColumnDiff(((days != 0) & valid) | (na1 ^ na2), valid=valid, days=days)
+    
+    if scales != (1, 1):
+        # A cent column against text: compare the dollar amounts as text
+        col1 = col1 / scales[0] if scales[0] != 1 else col1
+        col2 = col2 / scales[1] if scales[1] != 1 else col2
+    
+    text1 = col1.astype(str).str.strip().to_numpy(dtype=object)
+    text2 = col2.astype(str).str.strip().to_numpy(dtype=object)
+    mask = (text1 != text2) & ~(na1 & na2)
+    return ColumnDiff(mask, scales=scales)
+
+
+def _is_numeric(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series.dtype)
+
+
+def _is_datetime(series: pd.Series) -> bool:
+    return pd.api.types.is_datetime64_any_dtype(series.dtype)
+
+
+def _is_integer(series: pd.Series) -> bool:
+    return pd.api.types.is_integer_dtype(series.dtype)
+
+
+def format_day_shift(days: float) -> str:
+    """Day shift for reports: '7 days later', '1 day earlier'"""
+    count = abs(days)
+    unit = 'day' if count == 1 else 'days'
+    return f"{count:g} {unit} {'later' if days > 0 else 'earlier'}"
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Stores
+Storage for the API server keyed by SHA-256 of the content: uploaded files
+(so an identical upload is stored once) and serialized audit results keyed
+by both files' hashes plus the configuration (so re-uploading the same pair
+returns the earlier result without re-auditing). Both live on disk, shared
+by every server process, and evict least recently used entries beyond
+their size limit.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, BinaryIO
+
+import pandas as pd
+
+from file_cache import ParsedFileCache, CACHE_VERSION, DEFAULT_CACHE_DIR
+from report_writers import dumps, loads
+
+DEFAULT_BLOB_SIZE_MB = 1024
+DEFAULT_RESULT_SIZE_MB = 256
+DEFAULT_RESULT_TTL = 3600
+
+# Blobs used this recently are never evicted (queued audits still need them)
+BLOB_MIN_AGE = 3600
+
+
+def with_file_names(payload: bytes, names: Dict[str, Optional[str]]) -> bytes:
+    """
+    A serialized result with metadata.file1/file2.name set to the given names
+
+    Results are cached by content, so a hit carries the names of whoever
+    uploaded the same contents first.
+
+    Args:
+        payload: Serialized audit result
+        names: {'file1': name, 'file2': name}; missing or empty names are left as stored
+    """
+    result = loads(payload)
+    metadata = result.get('metadata') or {}
+    for field, name in names.items():
+        if name and isinstance(metadata.get(field), dict):
+            metadata[field]['name'] = name
+    return dumps(result)
+
+
+def default_store_dir(name: str) -> Path:
+    """Subdirectory of the parsed-file cache directory"""
+    return Path(os.environ.get('PAYROLL_AUDITOR_CACHE_DIR') or DEFAULT_CACHE_DIR) / name
+
+
+class BlobStore:
+    """
+    Uploaded files stored once per content, as <dir>/<sha256[:2]>/<sha256>
+
+    Args:
+        blob_dir: Directory of the store (default: <cache dir>/blobs)
+        max_size_mb: Total size beyond which least recently used blobs are
+            evicted (blobs used within BLOB_MIN_AGE seconds are kept)
+    """
+
+    def __init__(self, blob_dir: Optional[str] = None,
+                 max_size_mb: float = DEFAULT_BLOB_SIZE_MB):
+        self.blob_dir = Path(blob_dir) if blob_dir else default_store_dir('blobs')
+        self.max_size = max_size_mb * 1024 * 1024
+
+    def path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+
+    def put(self, stream: BinaryIO, digest: str) -> str:
+        """
+        Store a file's content unless a blob with its digest exists
+
+        Args:
+            stream: Binary file object with the content (read from its start)
+            digest: SHA-256 of the content
+
+        Returns:
+            Path of the blob
+        """
+        path = self.path(digest)
+        if path.exists():
+            os.utime(path)
+            return str(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                stream.seek(0)
+                shutil.copyfileobj(stream, f, 1024 * 1024)
+            stream.seek(0)
+            # Atomic, so a concurrent upload of the same content never sees a partial blob
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+        return str(path)
+
+    def evict(self):
+        """Remove least recently used blobs until the store fits its size limit"""
+        entries = []
+        for path in self.blob_dir.glob('??/*'):
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        recent = time.time() - BLOB_MIN_AGE
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_size or mtime > recent:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class ResultCache:
+    """
+    Serialized audit results keyed by (file 1 hash, file 2 hash, config)
+
+    Entries expire ttl seconds after they were stored; the least recently
+    used are evicted beyond max_size_mb. Hit and miss counters are kept per
+    process.
+
+    Args:
+        cache_dir: Directory of the cache (default: <cache dir>/results)
+        max_size_mb: Total size of the stored results
+        ttl: Seconds a result is served after it was computed
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 max_size_mb: float = DEFAULT_RESULT_SIZE_MB, ttl: float = DEFAULT_RESULT_TTL):
+        self.store = ParsedFileCache(cache_dir or str(default_store_dir('results')), max_size_mb)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(digest1: str, digest2: str, config: Optional[Dict[str, Any]] = None) -> str:
+        """Cache key of an audit of two file contents under a configuration"""
+        identity = json.dumps([CACHE_VERSION, pd.__version__, digest1, digest2, config or {}],
+                              sort_keys=True, default=str)
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Stored result, or None when missing or expired"""
+        entry = self.store.get_object(key)
+        expired = entry is not None and time.time() - entry[0] > self.ttl
+        if expired:
+            self.store.discard_object(key)
+        with self._lock:
+            if entry is None or expired:
+                self.misses += 1
+                self.expired += expired
+                return None
+            self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, payload: bytes):
+        """Store a serialized result"""
+        self.store.put_object(key, (time.time(), payload))
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of this process, for health checks"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'ttl': self.ttl,
+                'pid': os.getpid()
+            }
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Difference Table
+Kept row differences stored column-wise as a sparse row x field matrix: one
+identifier per differing row and, per field, parallel arrays of the rows that
+differ in it with their file 1 value, file 2 value, delta and day shift.
+The nested {'identifier', 'fields'} dictionaries of the reports are only
+built for the entries that are actually shown or exported.
+"""
+
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class FieldCells:
+    """
+    Differing cells of one field, aligned with each other
+
+    rows index into the table's identifiers; delta and days are NaN where a
+    cell has none (text values, or one side missing). Numeric values are
+    divided by their scale (100 for cents) when reported; a cent column with
+    missing values arrives here as float64 cents.
+    """
+
+    __slots__ = ('rows', 'file1', 'file2', 'delta', 'days', 'scales')
+
+    def __init__(self, rows: np.ndarray, file1: np.ndarray, file2: np.ndarray,
+                 delta: Optional[np.ndarray] = None, days: Optional[np.ndarray] = None,
+                 scales: Sequence[int] = (1, 1)):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.file1 = file1
+        self.file2 = file2
+        self.delta = np.full(len(self.rows), np.nan) if delta is None else delta
+        self.days = np.full(len(self.rows), np.nan) if days is None else days
+        self.scales = tuple(scales)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def take(self, cells: np.ndarray, rows: np.ndarray) -> 'FieldCells':
+        """Subset of the cells, renumbered to new row positions"""
+        return FieldCells(rows, self.file1[cells], self.file2[cells], self.delta[cells],
+                          self.days[cells], self.scales)
+
+    def entry(self, cell: int) -> Dict[str, Any]:
+        """Report dictionary of one cell"""
+        return self.entries(cell, cell + 1)[0]
+
+    def entries(self, first: int, last: int) -> List[Dict[str, Any]]:
+        """Report dictionaries of cells first..last-1, converted column by column"""
+        file1 = _report_list(self.file1[first:last], self.scales[0])
+        file2 = _report_list(self.file2[first:last], self.scales[1])
+        delta = self.delta[first:last]
+        days = self.days[first:last]
+        entries = [{'file1': value1, 'file2': value2} for value1, value2 in zip(file1, file2)]
+        for cell in np.flatnonzero(~np.isnan(delta)).tolist():
+            entries[cell]['difference'] = float(delta[cell])
+        for cell in np.flatnonzero(~np.isnan(days)).tolist():
+            shift = float(days[cell])
+            entries[cell]['days'] = int(shift) if shift.is_integer() else shift
+        return entries
+
+
+class DifferenceTable:
+    """
+    Row differences in rank order, stored as struct-of-arrays
+
+    Args:
+        identifiers: Row identifier of every differing row, in rank order
+        fields: Field name -> FieldCells, in report column order
+    """
+
+    __slots__ = ('identifiers', 'fields')
+
+    def __init__(self, identifiers: Optional[Sequence[Any]] = None,
+                 fields: Optional[Dict[str, FieldCells]] = None):
+        self.identifiers = _objects([] if identifiers is None else identifiers)
+        self.fields = fields or {}
+
+    def __len__(self) -> int:
+        return len(self.identifiers)
+
+    @property
+    def cell_count(self) -> int:
+        """Number of differing cells (non-zero entries of the sparse matrix)"""
+        return sum(len(cells) for cells in self.fields.values())
+
+    def mask(self) -> Dict[str, np.ndarray]:
+        """Sparse difference mask: field -> rows that differ in it"""
+        return {field: cells.rows for field, cells in self.fields.items()}
+
+    def records(self, limit: Optional[int] = None, start: int = 0) -> List[Dict[str, Any]]:
+        """
+        Report dictionaries of limit rows from start (all remaining when None)
+
+        Returns:
+            [{'identifier': ..., 'fields': {field: {'file1', 'file2', 'difference'?, 'days'?}}}]
+        """
+        start = max(0, min(start, len(self)))
+        end = len(self) if limit is None else max(start, min(start + limit, len(self)))
+        records = [{'identifier': _plain(self.identifiers[row]), 'fields': {}}
+                   for row in range(start, end)]
+        for field, cells in self.fields.items():
+            # rows are ascending within a field, so the wanted ones are contiguous
+            first, last = np.searchsorted(cells.rows, [start, end])
+            rows = (cells.rows[first:last] - start).tolist()
+            for row, entry in zip(rows, cells.entries(first, last)):
+                records[row]['fields'][field] = entry
+        return records
+
+    def iter_records(self, batch_size: int = 10000) -> Iterator[List[Dict[str, Any]]]:
+        """Every row's report dictionary, in batches of batch_size rows"""
+        for start in range(0, len(self), batch_size):
+            yield self.records(batch_size, start)
+
+    def cell_lists(self, limit: Optional[int] = None, start: int = 0) -> List[list]:
+        """
+        Cells of limit rows from start as compact lists, in row then field order
+
+        Returns:
+            [[row, field index, file1, file2, difference, days]], missing values as None
+        """
+        start = max(0, min(start, len(self)))
+        end = len(self) if limit is None else max(start, min(start + limit, len(self)))
+        rows, fields, cells = [], [], []
+        for index, (field, column) in enumerate(self.fields.items()):
+            first, last = np.searchsorted(column.rows, [start, end])
+            if first == last:
+                continue
+            rows.append(column.rows[first:last])
+            fields.append(np.full(last - first, index))
+            cells.extend(zip(column.rows[first:last].tolist(), [index] * (last - first),
+                             _json_list(_report_list(column.file1[first:last], column.scales[0])),
+                             _json_list(_report_list(column.file2[first:last], column.scales[1])),
+                             _json_list(column.delta[first:last].tolist()),
+                             _json_list(column.days[first:last].tolist())))
+        if not cells:
+            return []
+        order = np.lexsort((np.concatenate(fields), np.concatenate(rows)))
+        return [list(cells[cell]) for cell in order.tolist()]
+
+    def head(self, limit: int) -> 'DifferenceTable':
+        """The first limit rows"""
+        return self.take(np.arange(min(limit, len(self))))
+
+    def take(self, rows: Sequence[int]) -> 'DifferenceTable':
+        """Table of the given rows, in the given order"""
+        rows = np.asarray(rows, dtype=np.int64)
+        position = np.full(len(self), -1, dtype=np.int64)
+        position[rows] = np.arange(len(rows))
+        fields = {}
+        for field, cells in self.fields.items():
+            new_rows = position[cells.rows]
+            keep = np.flatnonzero(new_rows >= 0)
+            order = keep[np.argsort(new_rows[keep], kind='stable')]
+            if len(order):
+                fields[field] = cells.take(order, new_rows[order])
+        return DifferenceTable(self.identifiers[rows], fields)
+
+    @classmethod
+    def concat(cls, tables: Iterable['DifferenceTable']) -> 'DifferenceTable':
+        """Rows of several tables one after another"""
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls()
+        if len(tables) == 1:
+            return tables[0]
+        parts: Dict[str, List[tuple]] = {}
+        offset = 0
+        for table in tables:
+            for field, cells in table.fields.items():
+                parts.setdefault(field, []).append((cells, offset))
+            offset += len(table)
+        fields = {}
+        for field, pieces in parts.items():
+            file1, scale1 = _concat_values([(cells.file1, cells.scales[0]) for cells, _ in pieces])
+            file2, scale2 = _concat_values([(cells.file2, cells.scales[1]) for cells, _ in pieces])
+            fields[field] = FieldCells(
+                np.concatenate([cells.rows + offset for cells, offset in pieces]),
+                file1,
+                file2,
+                np.concatenate([cells.delta for cells, _ in pieces]),
+                np.concatenate([cells.days for cells, _ in pieces]),
+                (scale1, scale2)
+            )
+        return cls(np.concatenate([table.identifiers for table in tables]), fields)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]]) -> 'DifferenceTable':
+        """Table from report dictionaries (as built by the row-by-row engines)"""
+        columns: Dict[str, Dict[str, list]] = {}
+        for row, record in enumerate(records):
+            for field, values in record['fields'].items():
+                column = columns.setdefault(field, {'rows': [], 'file1': [], 'file2': [],
+                                                    'delta': [], 'days': []})
+                column['rows'].append(row)
+                column['file1'].append(values.get('file1'))
+                column['file2'].append(values.get('file2'))
+                column['delta'].append(values.get('difference', np.nan))
+                column['days'].append(values.get('days', np.nan))
+        fields = {
+            field: FieldCells(np.array(column['rows']), _objects(column['file1']),
+                              _objects(column['file2']),
+                              np.array(column['delta'], dtype='float64'),
+                              np.array(column['days'], dtype='float64'))
+            for field, column in columns.items()
+        }
+        return cls([record['identifier'] for record in records], fields)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Long-format frame with one row per differing cell, in rank order
+
+        Columns: rank, identifier, field, file1, file2, difference, days
+        """
+        frames = []
+        for field, cells in self.fields.items():
+            frames.append(pd.DataFrame({
+                'rank': cells.rows,
+                'identifier': self.identifiers[cells.rows],
+                'field': field,
+                'file1': _report_values(cells.file1, cells.scales[0]),
+                'file2': _report_values(cells.file2, cells.scales[1]),
+                'difference': cells.delta,
+                'days': cells.days
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['rank', 'identifier', 'field', 'file1', 'file2',
+                                         'difference', 'days'])
+        return pd.concat(frames, ignore_index=True).sort_values('rank', kind='stable',
+                                                                ignore_index=True)
+
+
+def report_value(value: Any) -> Any:
+    """Convert NumPy scalars and dates to plain Python values for reports"""
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat() if value == value.normalize() else value.isoformat()
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def cell_value(value: Any, scale: int = 1) -> Any:
+    """Report value of a stored cell, cents scaled to dollars"""
+    value = report_value(value)
+    # Cents are floats when a cent column with missing values was converted to NumPy
+    if scale != 1 and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value / scale
+    return value
+
+
+def _report_list(values: np.ndarray, scale: int) -> List[Any]:
+    """Report values of a slice of stored cells as a list of plain Python values"""
+    if values.dtype.kind in 'iuf':
+        return (values / scale).tolist() if scale != 1 else values.tolist()
+    if values.dtype.kind == 'b':
+        return values.tolist()
+    return [cell_value(value, scale) for value in values]
+
+
+def _json_list(values: List[Any]) -> List[Any]:
+    """Missing (NaN) values as None, so the cells are valid JSON"""
+    return [None if value != value else value for value in values]
+
+
+def _report_values(values: np.ndarray, scale: int) -> np.ndarray:
+    if scale != 1 and values.dtype.kind in 'iuf':
+        return values / scale
+    if values.dtype.kind == 'O' and scale != 1:
+        return _objects([cell_value(value, scale) for value in values])
+    return values
+
+
+def _concat_values(pieces: List[tuple]) -> tuple:
+    """Concatenate (values, scale) pieces; mixed scales are converted to report units first"""
+    scales = {scale for _, scale in pieces}
+    if len(scales) == 1:
+        arrays, scale = [values for values, _ in pieces], scales.pop()
+    else:
+        arrays, scale = [_report_values(values, scale) for values, scale in pieces], 1
+    if len({values.dtype for values in arrays}) > 1:
+        # Integer cents and cents with missing values (float) stay numeric
+        numeric = all(values.dtype.kind in 'iuf' for values in arrays)
+        arrays = [values.astype('float64' if numeric else object) for values in arrays]
+    return np.concatenate(arrays), scale
+
+
+def _objects(values: Sequence[Any]) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values)
+    return array
+
+
+def _plain(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
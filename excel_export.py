@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Excel Export
+Shared write-only Excel exporter for audit results. Rows are streamed into
+openpyxl write-only sheets in batches, highlighting is done with
+conditional formatting rules instead of per-cell fills, and column widths
+are computed up front from the values' string lengths.
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import PatternFill, Font, Alignment
+from openpyxl.utils import get_column_letter
+
+from comparison_engine import format_day_shift
+from difference_table import DifferenceTable, report_value
+
+RED_FILL = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
+HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+BOLD_FONT = Font(bold=True, color="FFFFFF")
+BOLD_BLACK = Font(bold=True)
+
+# Data rows per sheet (Excel's limit is 1,048,576 rows including the header)
+MAX_SHEET_ROWS = 1048575
+
+# Rows converted and appended at a time
+BATCH_ROWS = 10000
+
+# Values per column measured for the column width
+WIDTH_SAMPLE = 100000
+MAX_WIDTH = 50
+
+DIFFERENCE_HEADERS = ['Rank', 'Employee', 'Field', 'File 1 Value', 'File 2 Value', 'Difference']
+
+# (rows only in file 1, rows only in file 2, key columns)
+UnmatchedRows = Tuple[pd.DataFrame, pd.DataFrame, List[str]]
+
+
+def write_excel_report(results: Dict[str, Any], path: str,
+                       differences: Optional[DifferenceTable] = None,
+                       unmatched: Optional[UnmatchedRows] = None,
+                       file1: Optional[str] = None, file2: Optional[str] = None,
+                       differences_sheet: str = 'Differences',
+                       highlight: bool = False) -> List[str]:
+    """
+    Write audit results to an Excel workbook in write-only mode
+
+    Sheets: Summary, Field Statistics (when there are differences), the
+    differences (one row per differing cell; continued on further sheets
+    past Excel's row limit) and Unmatched Records (when unmatched rows are
+    given).
+
+    Args:
+        results: Results of compare_files/audit
+        path: Output .xlsx file
+        differences: Full difference table (default: the results' own list)
+        unmatched: Rows found in only one file, as returned with the results
+        file1, file2: File names for the summary (default: from the metadata)
+        differences_sheet: Name of the differences sheet
+        highlight: Add a Status column and highlight differing values in red
+
+    Returns:
+        Names of the sheets written
+    """
+    table = differences
+    if table is None:
+        table = DifferenceTable.from_records(results.get('data', {}).get('differences', []))
+
+    wb = Workbook(write_only=True)
+    _write_summary(wb, results, file1, file2)
+
+    field_stats = results.get('summary', {}).get('field_statistics') or {}
+    if field_stats:
+        _write_field_stats(wb, field_stats)
+
+    if len(table):
+        _write_differences(wb, table, differences_sheet, highlight)
+
+    if unmatched is not None:
+        _write_unmatched(wb, *unmatched)
+
+    wb.save(path)
+    return wb.sheetnames
+
+
+def _write_summary(wb: Workbook, results: Dict[str, Any], file1: Optional[str],
+                   file2: Optional[str]):
+    summary = results.get('summary', {})
+    meta = results.get('metadata', {})
+    name1 = file1 or meta.get('file1', {}).get('name', '')
+    name2 = file2 or meta.get('file2', {}).get('name', '')
+    rows = [
+        ('Total Rows Compared', summary.get('total_rows_compared', 0)),
+        ('Matching Rows', summary.get('rows_matched', 0)),
+        ('Different Rows', summary.get('rows_with_differences', 0)),
+        ('Match Percentage', f"{summary.get('match_rate', 0.0):.2f}%"),
+        ('Only in File 1', summary.get('unmatched_in_file1', 0)),
+        ('Only in File 2', summary.get('unmatched_in_file2', 0)),
+        ('Comparison Date', datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+        ('File 1', Path(str(name1)).name),
+        ('File 2', Path(str(name2)).name)
+    ]
+    ws = wb.create_sheet('Summary')
+    ws.column_dimensions['A'].width = 25
+    ws.column_dimensions['B'].width = 50
+    ws.append(_header(ws, ['Metric', 'Value']))
+    for row in rows:
+        ws.append(row)
+
+
+def _write_field_stats(wb: Workbook, field_stats: Dict[str, Dict[str, Any]]):
+    ws = wb.create_sheet('Field Statistics')
+    headers = ['Field', 'Differences', 'Avg Difference', 'Total Difference', 'Max Difference']
+    _set_widths(ws, headers, [list(field_stats)])
+    ws.append(_header(ws, headers))
+    for field, stats in field_stats.items():
+        ws.append([field, stats.get('count', 0), stats.get('avg_difference'),
+                   stats.get('total_difference'), stats.get('max_difference')])
+
+
+def _write_differences(wb: Workbook, table: DifferenceTable, title: str, highlight: bool):
+    headers = DIFFERENCE_HEADERS + (['Status'] if highlight else [])
+    fields = list(table.fields)
+    widths = _difference_samples(table)
+
+    sheets = 0
+    ws = None
+    written = 0
+    for batch in _difference_rows(table, fields, highlight):
+        while batch:
+            if ws is None or written == MAX_SHEET_ROWS:
+                if ws is not None:
+                    _finish_differences(ws, written, highlight)
+                sheets += 1
+                ws = wb.create_sheet(title if sheets == 1 else f"{title} ({sheets})"[:31])
+                _set_widths(ws, headers, widths)
+                ws.freeze_panes = 'A2'
+                ws.append(_header(ws, headers))
+                written = 0
+            take = batch[:MAX_SHEET_ROWS - written]
+            batch = batch[len(take):]
+            for row in take:
+                ws.append(row)
+            written += len(take)
+    if ws is not None:
+        _finish_differences(ws, written, highlight)
+
+
+def _difference_rows(table: DifferenceTable, fields: List[str],
+                     highlight: bool) -> Iterator[List[list]]:
+    """Sheet rows, BATCH_ROWS table rows at a time"""
+    identifiers = [_excel_value(identifier) for identifier in table.identifiers]
+    for start in range(0, len(table), BATCH_ROWS):
+        rows = []
+        # Cell values are already plain report values, missing ones None
+        for row, field, value1, value2, delta, days in table.cell_lists(BATCH_ROWS, start):
+            if days is not None:
+                change = format_day_shift(days)
+            elif delta is not None:
+                change = delta
+            else:
+                change = 'Changed'
+            line = [row + 1, identifiers[row], fields[field], value1, value2, change]
+            if highlight:
+                line.append('DISCREPANCY')
+            rows.append(line)
+        yield rows
+
+
+def _finish_differences(ws, count: int, highlight: bool):
+    """Conditional formatting over the written rows: one rule per range, not per cell"""
+    if not highlight or not count:
+        return
+    last = count + 1
+    ws.conditional_formatting.add(f"D2:E{last}",
+                                  FormulaRule(formula=['$D2<>$E2'], fill=RED_FILL, font=BOLD_BLACK))
+    ws.conditional_formatting.add(f"G2:G{last}",
+                                  FormulaRule(formula=['$G2="DISCREPANCY"'], fill=RED_FILL,
+                                              font=BOLD_BLACK))
+
+
+def _write_unmatched(wb: Workbook, only_file1: pd.DataFrame, only_file2: pd.DataFrame,
+                     key_columns: List[str]):
+    columns = list(key_columns)
+    for frame in (only_file1, only_file2):
+        columns += [col for col in frame.columns if col not in columns]
+    headers = ['Found In'] + [str(col) for col in columns]
+
+    ws = wb.create_sheet('Unmatched Records')
+    samples = [['File 1', 'File 2']]
+    for col in columns:
+        values = [frame[col] for frame in (only_file1, only_file2) if col in frame.columns]
+        samples.append(pd.concat(values).iloc[:WIDTH_SAMPLE] if values else [])
+    _set_widths(ws, headers, samples)
+    ws.freeze_panes = 'B2'
+    ws.append(_header(ws, headers))
+
+    written = 0
+    for label, frame in (('File 1', only_file1), ('File 2', only_file2)):
+        frame = frame.reindex(columns=columns)
+        for start in range(0, len(frame), BATCH_ROWS):
+            if written >= MAX_SHEET_ROWS:
+                return
+            chunk = frame.iloc[start:start + min(BATCH_ROWS, MAX_SHEET_ROWS - written)]
+            for values in chunk.itertuples(index=False, name=None):
+                ws.append([label] + [_excel_value(value) for value in values])
+            written += len(chunk)
+
+
+def _difference_samples(table: DifferenceTable) -> List[Any]:
+    """Values measured for the width of each difference column"""
+    cells = table.head(WIDTH_SAMPLE).to_frame()
+    change = cells['difference'].round(2).astype(object).fillna('Changed')
+    shifts = cells['days'].dropna()
+    change[shifts.index] = shifts.map(format_day_shift)
+    return [cells['rank'] + 1, cells['identifier'], cells['field'], cells['file1'],
+            cells['file2'], change, ['DISCREPANCY']]
+
+
+def _set_widths(ws, headers: List[str], samples: List[Any]):
+    """Column widths from the longest header or sampled value, capped at MAX_WIDTH"""
+    for index, header in enumerate(headers):
+        longest = len(str(header))
+        if index < len(samples) and len(samples[index]):
+            lengths = pd.Series(samples[index], dtype=object).dropna().astype(str).str.len()
+            if len(lengths):
+                longest = max(longest, int(lengths.max()))
+        ws.column_dimensions[get_column_letter(index + 1)].width = min(longest + 2, MAX_WIDTH)
+
+
+def _header(ws, headers: List[str]) -> List[WriteOnlyCell]:
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = HEADER_FILL
+        cell.font = BOLD_FONT
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cells.append(cell)
+    return cells
+
+
+def _excel_value(value: Any) -> Any:
+    """Value openpyxl can write: plain numbers, text, dates; missing values left empty"""
+    value = report_value(value)
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (str, int, float, bool, datetime)):
+        return value
+    return str(value)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Field Statistics
+Per-field difference statistics accumulated while comparing, so the summary
+covers every difference while the detailed list stays bounded. Memory is
+O(fields): each field keeps running moments (Welford) and a small quantile
+sketch, and partial statistics from partitions or shards merge exactly.
+"""
+
+import math
+from typing import Dict, Any, Optional, Iterable
+
+import numpy as np
+
+from value_normalizers import CENTS
+
+# Quantiles reported for every numeric field
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error
+
+    Values are counted in logarithmic buckets (as in DDSketch), so any
+    reported quantile is within relative_accuracy of a true value and memory
+    grows with the log of the value range, not the number of values.
+    """
+
+    __slots__ = ('relative_accuracy', 'log_gamma', 'positive', 'negative', 'zeros')
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+
+    @property
+    def count(self) -> int:
+        return self.zeros + sum(self.positive.values()) + sum(self.negative.values())
+
+    def add(self, values: np.ndarray):
+        """Add an array of values"""
+        values = np.asarray(values, dtype='float64')
+        self.zeros += int(np.count_nonzero(values == 0))
+        self._add_buckets(self.positive, values[values > 0])
+        self._add_buckets(self.negative, -values[values < 0])
+
+    def merge(self, other: 'QuantileSketch'):
+        """Fold another sketch with the same accuracy into this one"""
+        self.zeros += other.zeros
+        for into, buckets in ((self.positive, other.positive), (self.negative, other.negative)):
+            for bucket, count in buckets.items():
+                into[bucket] = into.get(bucket, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile (0 <= q <= 1), or None when empty"""
+        total = self.count
+        if not total:
+            return None
+        # Nearest-rank definition: the ceil(q * total)-th smallest value
+        rank = max(0, math.ceil(q * total) - 1)
+        seen = 0
+        # Ascending order: most negative first, then zeros, then positives
+        for bucket in sorted(self.negative, reverse=True):
+            seen += self.negative[bucket]
+            if seen > rank:
+                return -self._bucket_value(bucket)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.positive):
+            seen += self.positive[bucket]
+            if seen > rank:
+                return self._bucket_value(bucket)
+        return self._bucket_value(max(self.positive)) if self.positive else 0.0
+
+    def _add_buckets(self, buckets: Dict[int, int], magnitudes: np.ndarray):
+        if not len(magnitudes):
+            return
+        indexes = np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64)
+        for bucket, count in zip(*np.unique(indexes, return_counts=True)):
+            bucket = int(bucket)
+            buckets[bucket] = buckets.get(bucket, 0) + int(count)
+
+    def _bucket_value(self, bucket: int) -> float:
+        # Midpoint of (gamma^(i-1), gamma^i] with relative error <= accuracy
+        return 2 * math.exp(bucket * self.log_gamma) / (1 + math.exp(self.log_gamma))
+
+
+class FieldStats:
+    """
+    Running statistics for the differences found in one field
+
+    count is the number of rows where the field differs; the moments,
+    extremes and sketch cover the numeric deltas (file2 - file1) in dollars.
+    Deltas added as integer cents also keep an exact cent total.
+    """
+
+    __slots__ = ('count', 'n', 'mean', 'm2', 'minimum', 'maximum', 'total', 'cents', 'sketch')
+
+    def __init__(self):
+        self.count = 0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.total = 0.0
+        self.cents = 0
+        self.sketch = QuantileSketch()
+
+    def add(self, deltas: np.ndarray, count: Optional[int] = None, scale: int = 1):
+        """
+        Add a batch of numeric deltas
+
+        Args:
+            deltas: Deltas in report units, or integer cents when scale is CENTS
+            count: Differing rows in the batch (default: one per delta)
+            scale: CENTS for integer cent deltas, 1 for dollars
+        """
+        self.count += len(deltas) if count is None else count
+        if not len(deltas):
+            return
+
+        if scale == CENTS:
+            self.cents = self._add_cents(int(np.sum(deltas, dtype=np.int64)))
+        else:
+            self.cents = None
+        values = np.asarray(deltas, dtype='float64') / scale
+
+        batch = FieldStats()
+        batch.n = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.minimum = float(values.min())
+        batch.maximum = float(values.max())
+        batch.total = float(values.sum())
+        batch.cents = None
+        self._merge_moments(batch)
+        self.sketch.add(values)
+
+    def add_value(self, delta: Optional[float], scale: int = 1):
+        """Add one differing row; delta is None for non-numeric differences"""
+        if delta is None:
+            self.count += 1
+            return
+        self.add(np.array([delta], dtype='int64' if scale == CENTS else 'float64'), scale=scale)
+
+    def merge(self, other: 'FieldStats'):
+        """Fold statistics from another partition or shard into this one"""
+        self.count += other.count
+        if not other.n:
+            return
+        self.cents = self._add_cents(other.cents)
+        self._merge_moments(other)
+        self.sketch.merge(other.sketch)
+
+    def to_dict(self, quantiles: Iterable[float] = QUANTILES) -> Dict[str, Any]:
+        """Plain summary values for results and reports"""
+        stats = {'count': self.count}
+        if self.n:
+            stats['numeric_count'] = self.n
+            stats['avg_difference'] = self.mean
+            stats['max_difference'] = self.maximum
+            stats['min_difference'] = self.minimum
+            stats['total_difference'] = self.cents / CENTS if self.cents is not None else self.total
+            stats['std_difference'] = math.sqrt(self.m2 / self.n)
+            stats['quantiles'] = {f"p{q * 100:g}": self.sketch.quantile(q) for q in quantiles}
+        return stats
+
+    def _add_cents(self, cents: Optional[int]) -> Optional[int]:
+        # The exact total only survives while every delta came in as cents
+        if cents is None or (self.cents is None and self.n):
+            return None
+        return (self.cents or 0) + cents
+
+    def _merge_moments(self, other: 'FieldStats'):
+        # Chan et al. pairwise update of Welford's running mean and M2
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.total += other.total
+
+
+def merge_field_stats(parts: Iterable[Dict[str, FieldStats]]) -> Dict[str, FieldStats]:
+    """Merge per-field statistics from several partial results"""
+    merged = {}
+    for part in parts:
+        for field, stats in part.items():
+            merged.setdefault(field, FieldStats()).merge(stats)
+    return merged
+
+
+def accumulate_row(field_stats: Dict[str, FieldStats], fields: Dict[str, Any],
+                   money_columns: Iterable[str] = ()):
+    """
+    Add one row's differences (the 'fields' of a difference entry)
+
+    Deltas of money columns are rounded to cents so their totals stay exact.
+    """
+    for field, values in fields.items():
+        delta = values.get('difference')
+        stats = field_stats.setdefault(field, FieldStats())
+        if delta is not None and field in money_columns:
+            stats.add_value(round(delta * CENTS), scale=CENTS)
+        else:
+            stats.add_value(delta)
+
+
+def day_shifts(days: np.ndarray) -> Dict[int, int]:
+    """Rows per whole-day shift (file2 - file1) of a date field"""
+    days = np.rint(np.asarray(days, dtype='float64')).astype(np.int64)
+    return {int(shift): int(count) for shift, count in zip(*np.unique(days, return_counts=True))}
+
+
+def merge_day_shifts(parts: Iterable[Dict[str, Dict[int, int]]]) -> Dict[str, Dict[int, int]]:
+    """Merge per-field day shift counts from several partial results"""
+    merged = {}
+    for part in parts:
+        for field, shifts in part.items():
+            into = merged.setdefault(field, {})
+            for shift, count in shifts.items():
+                into[shift] = into.get(shift, 0) + count
+    return merged
+
+
+def accumulate_day_shifts(shifts: Dict[str, Dict[int, int]], fields: Dict[str, Any]):
+    """Add one row's date shifts (the 'days' of a difference entry)"""
+    for field, values in fields.items():
+        if values.get('days') is not None:
+            into = shifts.setdefault(field, {})
+            shift = int(round(values['days']))
+            into[shift] = into.get(shift, 0) + 1
+
+
+def summarize_day_shifts(shifts: Dict[str, Dict[int, int]]) -> Dict[str, Dict[int, int]]:
+    """Rows per day shift for every date field, ordered by shift"""
+    return {field: dict(sorted(counts.items())) for field, counts in shifts.items() if counts}
+
+
+def summarize_field_stats(field_stats: Dict[str, FieldStats]) -> Dict[str, Dict[str, Any]]:
+    """Summary dictionaries for the fields that had differences"""
+    return {field: stats.to_dict() for field, stats in field_stats.items() if stats.count}
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Parsed File Cache
+Content-addressed on-disk cache of loaded and normalized payroll frames, so
+re-auditing the same baseline file skips CSV/Excel/PDF parsing. Entries are
+keyed by a SHA-256 of the file content plus the loader/normalizer namespace
+and evicted least-recently-used once the cache grows past its size limit.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from file_source import FileSource
+
+# Try to import optional dependencies
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_SUPPORT = True
+except ImportError:
+    PARQUET_SUPPORT = False
+
+# Bump when loading or normalization changes so stale entries are never served
+CACHE_VERSION = 6
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'payroll_auditor'
+DEFAULT_CACHE_SIZE_MB = 512
+
+_FORMATS = ('.parquet', '.pkl')
+
+
+class ParsedFileCache:
+    """
+    LRU, size-bounded cache of DataFrames keyed by file content
+
+    Args:
+        cache_dir: Directory for cache entries (default: PAYROLL_AUDITOR_CACHE_DIR
+            or ~/.cache/payroll_auditor)
+        max_size_mb: Total size at which least recently used entries are evicted
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 max_size_mb: float = DEFAULT_CACHE_SIZE_MB):
+        self.cache_dir = Path(cache_dir or os.environ.get('PAYROLL_AUDITOR_CACHE_DIR')
+                              or DEFAULT_CACHE_DIR)
+        self.max_size = max_size_mb * 1024 * 1024
+        # (path, size, mtime) -> digest, so unchanged files are hashed once per process
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+
+    def key(self, filepath: str, namespace: str) -> str:
+        """Cache key for a file's content under a loader/normalizer namespace"""
+        return hashlib.sha256(
+            f"{CACHE_VERSION}:{pd.__version__}:{namespace}:{self.file_digest(filepath)}".encode()
+        ).hexdigest()
+
+    def file_digest(self, filepath) -> str:
+        """SHA-256 of the file content (a path or FileSource)"""
+        if isinstance(filepath, FileSource):
+            return filepath.digest()
+        stat = os.stat(filepath)
+        memo = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+        if memo not in self._digests:
+            digest = hashlib.sha256()
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            self._digests[memo] = digest.hexdigest()
+        return self._digests[memo]
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Cached frame for key, or None"""
+        for suffix in _FORMATS:
+            path = self.cache_dir / f"{key}{suffix}"
+            try:
+                df = pd.read_parquet(path) if suffix == '.parquet' else pd.read_pickle(path)
+            except FileNotFoundError:
+                continue
+            except Exception:
+                # Unreadable entry (partial write from a crash, library upgrade)
+                self._remove(path)
+                continue
+            self._touch(path)
+            return df
+        return None
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Store a frame, then evict old entries beyond the size limit"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            suffix = '.pkl'
+            if PARQUET_SUPPORT:
+                try:
+                    df.to_parquet(tmp)
+                    suffix = '.parquet'
+                except Exception:
+                    pass  # mixed-type or duplicate columns: fall back to pickle
+            if suffix == '.pkl':
+                df.to_pickle(tmp)
+            # Atomic, so concurrent readers never see a partial entry
+            os.replace(tmp, self.cache_dir / f"{key}{suffix}")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+
+    def get_object(self, key: str) -> Any:
+        """Cached picklable object for key (e.g. extracted PDF page tables), or None"""
+        path = self.cache_dir / f"{key}.pkl"
+        try:
+            with open(path, 'rb') as f:
+                obj = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._remove(path)
+            return None
+        self._touch(path)
+        return obj
+
+    def put_object(self, key: str, obj: Any, evict: bool = True):
+        """Store a picklable object; pass evict=False when storing many in a row"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.cache_dir / f"{key}.pkl")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        if evict:
+            self.evict()
+
+    def discard_object(self, key: str):
+        """Remove the object stored under key, if any"""
+        self._remove(self.cache_dir / f"{key}.pkl")
+
+    def load(self, filepath: str, loader: Callable[[], pd.DataFrame],
+             namespace: str) -> Tuple[pd.DataFrame, bool]:
+        """
+        Cached frame for a file, calling loader on a miss
+
+        Returns:
+            (frame, True if it came from the cache)
+        """
+        key = self.key(filepath, namespace)
+        df = self.get(key)
+        if df is not None:
+            return df, True
+        df = loader()
+        self.put(key, df)
+        return df, False
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its size limit"""
+        entries = []
+        for path in self.cache_dir.iterdir():
+            if path.suffix not in _FORMATS:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """Remove every cache entry"""
+        if self.cache_dir.exists():
+            for path in self.cache_dir.iterdir():
+                if path.suffix in _FORMATS:
+                    self._remove(path)
+
+    @staticmethod
+    def _touch(path: Path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+_default_cache = None
+
+
+def default_cache() -> ParsedFileCache:
+    """Process-wide cache shared by both auditors, the API server and batch audits"""
+    global _default_cache
+    if _default_cache is None:
+        size = float(os.environ.get('PAYROLL_AUDITOR_CACHE_MB', DEFAULT_CACHE_SIZE_MB))
+        _default_cache = ParsedFileCache(max_size_mb=size)
+    return _default_cache
+
+
+def cache_enabled() -> bool:
+    """Caching can be turned off with PAYROLL_AUDITOR_CACHE=0"""
+    return os.environ.get('PAYROLL_AUDITOR_CACHE', '1').lower() not in ('0', 'false', 'no', 'off')
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+In-Memory File Sources
+Lets the loaders read bytes or binary file objects (an upload's stream, a
+SpooledTemporaryFile) as well as paths. The format is declared, taken from
+the file name, or sniffed from the first bytes, so uploads are parsed
+straight from memory instead of being written to a temporary file first.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Union, BinaryIO, Iterator
+
+FORMATS = ('csv', 'xlsx', 'xls', 'pdf')
+
+# Leading bytes of the binary formats; anything else is read as CSV
+_MAGIC = (
+    (b'%PDF', 'pdf'),
+    (b'PK\x03\x04', 'xlsx'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'xls')
+)
+
+
+class FileSource:
+    """
+    A payroll file held in memory or in an open binary file object
+
+    Args:
+        data: bytes-like content, or a seekable binary file object positioned
+            at the start of the file (read from its start on every open)
+        name: Original file name, reported in the results
+        format: 'csv', 'xlsx', 'xls' or 'pdf' (default: from the name's
+            extension, else sniffed from the content)
+        digest: SHA-256 of the content when already known (e.g. hashed while
+            the upload streamed in)
+    """
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview, BinaryIO],
+                 name: Optional[str] = None, format: Optional[str] = None,
+                 digest: Optional[str] = None):
+        self.data = data
+        self.name = name or 'upload'
+        self.format = (format or _extension(self.name) or sniff_format(self.head())).lower()
+        if self.format not in FORMATS:
+            raise ValueError(f"Unsupported file type: {self.format}")
+        self._digest = digest
+
+    def open(self) -> BinaryIO:
+        """Readable binary file positioned at the start (bytes are shared, not copied)"""
+        if isinstance(self.data, (bytes, bytearray, memoryview)):
+            return io.BytesIO(self.data)
+        self.data.seek(0)
+        return self.data
+
+    def head(self, size: int = 8) -> bytes:
+        """First bytes of the content"""
+        if isinstance(self.data, (bytes, bytearray, memoryview)):
+            return bytes(self.data[:size])
+        self.data.seek(0)
+        head = self.data.read(size)
+        self.data.seek(0)
+        return head
+
+    def digest(self) -> str:
+        """SHA-256 of the content"""
+        if self._digest is None:
+            digest = hashlib.sha256()
+            if isinstance(self.data, (bytes, bytearray, memoryview)):
+                digest.update(self.data)
+            else:
+                f = self.open()
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+                f.seek(0)
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    @contextmanager
+    def as_path(self) -> Iterator[str]:
+        """The content in a temporary file, for readers that need a path"""
+        fd, path = tempfile.mkstemp(suffix=f".{self.format}")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                source = self.open()
+                for block in iter(lambda: source.read(1024 * 1024), b''):
+                    f.write(block)
+            yield path
+        finally:
+            os.remove(path)
+
+    def __repr__(self) -> str:
+        return f"FileSource({self.name!r}, format={self.format!r})"
+
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile computing the SHA-256 of everything written to it"""
+
+    def __init__(self, max_size: int = 0):
+        super().__init__(max_size=max_size)
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self._sha256.update(data)
+        return super().write(data)
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+
+def sniff_format(head: bytes) -> str:
+    """'pdf', 'xlsx' or 'xls' from a file's leading bytes; 'csv' otherwise"""
+    for magic, format in _MAGIC:
+        if head.startswith(magic):
+            return format
+    return 'csv'
+
+
+def source_format(source: Union[str, FileSource]) -> str:
+    """Format of a path (by extension) or FileSource"""
+    if isinstance(source, FileSource):
+        return source.format
+    return _extension(str(source))
+
+
+def source_name(source: Union[str, FileSource]) -> str:
+    """File name of a path or FileSource"""
+    if isinstance(source, FileSource):
+        return source.name
+    return Path(source).name
+
+
+def _extension(name: str) -> str:
+    return Path(name).suffix.lower().lstrip('.')
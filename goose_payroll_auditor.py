@@ -122,6 +122,8 @@ class GoosePayrollAuditor:
                 output.append(f"      File 2: {values['file2']}")
                 if 'difference' in values:
                     output.append(f"      Δ: {values['difference']:.2f}")
+                if 'days' in values:
+                    output.append(f"      Δ: {values['days']:+g} days")
         
         output.append("\n" + "="*60)
         return "\n".join(output)
@@ -179,7 +181,8 @@ class GoosePayrollAuditor:
             file2 = str(files[i + 1])
             
             try:
-                result = self.auditor.audit(file1, file2)
+                # Only the summary is read, so nothing else is computed
+                result = self.auditor.audit(file1, file2, lazy=True)
                 match_rate = result['summary']['match_rate']
                 diffs = result['summary']['rows_with_differences']
                 
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Virtualized HTML Report
+Self-contained HTML report for audits of any size. The page shell (file
+information, summary and field statistics) is written first, then every
+kept difference follows as compact JSON segments that the page parses as
+they arrive. A virtualized table renders only the rows in view and filters
+by field and employee on the client.
+"""
+
+import html
+from datetime import datetime
+from typing import Dict, Any, Optional, Iterator
+
+from difference_table import DifferenceTable
+from report_writers import dumps, open_writer
+
+# Difference rows per embedded JSON segment
+SEGMENT_ROWS = 5000
+
+_STYLE = """
+        body { font-family: Arial, sans-serif; margin: 20px; background: #f5f5f5; }
+        .container { max-width: 1200px; margin: 0 auto; background: white; padding: 30px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }
+        h1 { color: #333; border-bottom: 3px solid #4CAF50; padding-bottom: 10px; }
+        h2 { color: #555; margin-top: 30px; border-bottom: 2px solid #ddd; padding-bottom: 5px; }
+        .metadata { background: #f9f9f9; padding: 15px; border-radius: 5px; margin: 20px 0; }
+        .summary { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px; margin: 20px 0; }
+        .stat-box { background: #e3f2fd; padding: 15px; border-radius: 5px; text-align: center; }
+        .stat-value { font-size: 24px; font-weight: bold; color: #1976d2; }
+        .stat-label { color: #666; margin-top: 5px; }
+        table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+        th { background: #4CAF50; color: white; padding: 12px; text-align: left; }
+        td { padding: 10px; border-bottom: 1px solid #ddd; }
+        .controls { margin: 15px 0; display: flex; gap: 10px; align-items: center; }
+        .controls input, .controls select { padding: 6px; font-size: 14px; }
+        .controls input { flex: 1; }
+        #pa-status { color: #666; }
+        .pa-row { display: flex; position: absolute; left: 0; right: 0; height: 26px; line-height: 26px; border-bottom: 1px solid #eee; }
+        .pa-row span, .pa-head span { flex: 1; padding: 0 8px; overflow: hidden; white-space: nowrap; text-overflow: ellipsis; }
+        .pa-row span:first-child, .pa-head span:first-child { flex: 0 0 70px; color: #999; }
+        .pa-head { display: flex; background: #4CAF50; color: white; font-weight: bold; line-height: 36px; }
+        #pa-viewport { position: relative; height: 600px; overflow-y: auto; border: 1px solid #ddd; }
+        #pa-viewport .pa-row:hover { background: #fff3cd; }
+"""
+
+# Renders only the rows in view; spacer heights past browser limits are scaled
+_SCRIPT = """
+var PA = (function () {
+    var ROW = 26, OVERSCAN = 10, MAX_HEIGHT = 8000000;
+    var fields = %(fields)s;
+    var ids = [], cells = [], view = null, parsed = 0, pending = false, timer = null;
+    var segments = document.getElementsByClassName('pa-segment');
+    var el = function (id) { return document.getElementById(id); };
+    var viewport = el('pa-viewport'), spacer = el('pa-spacer'), rows = el('pa-rows');
+    var status = el('pa-status'), fieldFilter = el('pa-field'), search = el('pa-search');
+
+    function esc(value) {
+        if (value === null || value === undefined) return '';
+        return String(value).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+    }
+    function change(cell) {
+        if (cell[5] !== null) {
+            var days = Math.abs(cell[5]);
+            return days + (days === 1 ? ' day ' : ' days ') + (cell[5] > 0 ? 'later' : 'earlier');
+        }
+        return cell[4] === null ? '' : cell[4].toFixed(2);
+    }
+    function matcher() {
+        var field = fieldFilter.value === '' ? -1 : +fieldFilter.value;
+        var text = search.value.trim().toLowerCase();
+        if (field < 0 && !text) return null;
+        return function (cell) {
+            return (field < 0 || cell[1] === field) &&
+                (!text || String(ids[cell[0]]).toLowerCase().indexOf(text) >= 0);
+        };
+    }
+    function extend(match, from) {
+        for (var i = from; i < cells.length; i++) if (match(cells[i])) view.push(i);
+    }
+    function filter() {
+        var match = matcher();
+        view = match ? [] : null;
+        if (match) extend(match, 0);
+        viewport.scrollTop = 0;
+        schedule();
+    }
+    function schedule() {
+        if (!pending) { pending = true; requestAnimationFrame(render); }
+    }
+    function render() {
+        pending = false;
+        var count = view ? view.length : cells.length;
+        var total = count * ROW, height = Math.min(total, MAX_HEIGHT);
+        spacer.style.height = height + 'px';
+        var visible = viewport.clientHeight, top = viewport.scrollTop;
+        var virtualTop = height > visible ? top * (total - visible) / (height - visible) : 0;
+        var first = Math.max(0, Math.floor(virtualTop / ROW) - OVERSCAN);
+        var last = Math.min(count, Math.ceil((virtualTop + visible) / ROW) + OVERSCAN);
+        var out = [];
+        for (var i = first; i < last; i++) {
+            var cell = cells[view ? view[i] : i];
+            out.push('<div class="pa-row" style="top:' + (top + i * ROW - virtualTop) + 'px"><span>' +
+                (cell[0] + 1) + '</span><span>' + esc(ids[cell[0]]) + '</span><span>' +
+                esc(fields[cell[1]]) + '</span><span>' + esc(cell[2]) + '</span><span>' +
+                esc(cell[3]) + '</span><span>' + change(cell) + '</span></div>');
+        }
+        rows.innerHTML = out.join('');
+        status.textContent = (view ? view.length + ' of ' : '') + cells.length + ' differing cells';
+    }
+
+    viewport.addEventListener('scroll', schedule);
+    fieldFilter.addEventListener('change', filter);
+    search.addEventListener('input', function () { clearTimeout(timer); timer = setTimeout(filter, 150); });
+
+    return {
+        next: function () {
+            var match = matcher(), from = cells.length;
+            for (; parsed < segments.length; parsed++) {
+                var segment = JSON.parse(segments[parsed].textContent);
+                segments[parsed].textContent = '';
+                for (var i = 0; i < segment.ids.length; i++) ids.push(segment.ids[i]);
+                for (var j = 0; j < segment.cells.length; j++) cells.push(segment.cells[j]);
+            }
+            if (match && view) extend(match, from);
+            schedule();
+        }
+    };
+})();
+"""
+
+
+def write_html_report(results: Dict[str, Any], destination,
+                      differences: Optional[DifferenceTable] = None,
+                      segment_rows: int = SEGMENT_ROWS) -> int:
+    """
+    Write the virtualized HTML report to a path, file object or socket
+
+    Args:
+        results: Results of compare_files/audit
+        destination: Path, binary or text file object, or connected socket
+        differences: Full difference table (default: the results' own list)
+        segment_rows: Difference rows per embedded JSON segment
+
+    Returns:
+        Number of differences written
+    """
+    table = _table(results, differences)
+    with open_writer(destination) as write:
+        for chunk in html_report_chunks(results, table, segment_rows):
+            write(chunk)
+    return len(table)
+
+
+def html_report_chunks(results: Dict[str, Any], differences: Optional[DifferenceTable] = None,
+                       segment_rows: int = SEGMENT_ROWS) -> Iterator[bytes]:
+    """
+    The report as a stream of byte chunks (e.g. for a streamed HTTP response)
+
+    The first chunk is the complete page shell; each following chunk is one
+    segment of differences, so the page is usable before the last arrives.
+    """
+    table = _table(results, differences)
+    fields = list(table.fields)
+    options = ''.join(f'<option value="{index}">{html.escape(str(field))}</option>'
+                      for index, field in enumerate(fields))
+    yield f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Payroll Audit Report</title>
+    <style>{_STYLE}    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Payroll Audit Report</h1>
+        <p>Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+        {_html_metadata(results)}
+        {_html_summary(results)}
+        {_html_field_stats(results)}
+        <h2>Differences</h2>
+        <div class="controls">
+            <select id="pa-field"><option value="">All fields</option>{options}</select>
+            <input id="pa-search" type="search" placeholder="Filter by employee">
+            <span id="pa-status">Loading...</span>
+        </div>
+        <div class="pa-head"><span>#</span><span>Employee</span><span>Field</span><span>File 1</span><span>File 2</span><span>Difference</span></div>
+        <div id="pa-viewport"><div id="pa-spacer"></div><div id="pa-rows"></div></div>
+    </div>
+    <script>{_SCRIPT % {'fields': _script_json(fields).decode()}}</script>
+""".encode()
+
+    for start in range(0, len(table), segment_rows):
+        segment = {
+            'ids': table.identifiers[start:start + segment_rows].tolist(),
+            'cells': table.cell_lists(segment_rows, start)
+        }
+        yield (b'<script type="application/json" class="pa-segment">' + _script_json(segment)
+               + b'</script><script>PA.next()</script>\n')
+    yield b'<script>PA.next()</script>\n</body>\n</html>\n'
+
+
+def _table(results: Dict[str, Any], differences: Optional[DifferenceTable]) -> DifferenceTable:
+    if differences is not None:
+        return differences
+    return DifferenceTable.from_records(results.get('data', {}).get('differences', []))
+
+
+def _script_json(value: Any) -> bytes:
+    # '<' only occurs inside JSON strings; escaping it keeps </script> and <!-- inert
+    return dumps(value).replace(b'<', b'\\u003c')
+
+
+def _html_metadata(results: Dict[str, Any]) -> str:
+    meta = results.get('metadata', {})
+    lines = []
+    for label, key in (('File 1', 'file1'), ('File 2', 'file2')):
+        info = meta.get(key)
+        if info:
+            lines.append(f"<p><strong>{label}:</strong> {html.escape(str(info.get('name', '')))} "
+                         f"({info.get('rows', 0)} rows, {info.get('columns', 0)} columns)</p>")
+    if not lines:
+        return ""
+    return f"""
+        <h2>File Information</h2>
+        <div class="metadata">
+            {''.join(lines)}
+        </div>
+        """
+
+
+def _html_summary(results: Dict[str, Any]) -> str:
+    summary = results.get('summary', {})
+    stats = (
+        (summary.get('total_rows_compared', 0), 'Total Rows'),
+        (summary.get('rows_matched', 0), 'Matched'),
+        (summary.get('rows_with_differences', 0), 'Differences'),
+        (f"{summary.get('match_rate', 0):.1f}%", 'Match Rate')
+    )
+    boxes = ''.join(f"""
+            <div class="stat-box">
+                <div class="stat-value">{value}</div>
+                <div class="stat-label">{label}</div>
+            </div>""" for value, label in stats)
+    return f"""
+        <h2>Summary Statistics</h2>
+        <div class="summary">{boxes}
+        </div>
+        """
+
+
+def _html_field_stats(results: Dict[str, Any]) -> str:
+    field_stats = results.get('summary', {}).get('field_statistics')
+    if not field_stats:
+        return ""
+
+    rows = []
+    for field, stats in field_stats.items():
+        row = f"<tr><td>{html.escape(str(field))}</td><td>{stats['count']}</td>"
+        if 'avg_difference' in stats:
+            row += f"<td>{stats['avg_difference']:.2f}</td><td>{stats['total_difference']:.2f}</td>"
+        else:
+            row += "<td>N/A</td><td>N/A</td>"
+        row += "</tr>"
+        rows.append(row)
+
+    return f"""
+        <h2>Field-Level Statistics</h2>
+        <table>
+            <tr>
+                <th>Field</th>
+                <th>Differences</th>
+                <th>Avg Difference</th>
+                <th>Total Difference</th>
+            </tr>
+            {''.join(rows)}
+        </table>
+        """
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Parallel Comparison
+Shards both frames by key hash and compares the shards in a process pool.
+Every row of a key lands in the same shard, so each worker can join and
+compare its shard independently; partial results are merged in row order.
+"""
+
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+import numpy as np
+import pandas as pd
+
+from comparison_engine import align_frames, compare_aligned, merge_comparisons, DEFAULT_RANKING
+from streaming_compare import partition_ids
+
+# Below this many rows per worker the process overhead outweighs the speedup
+MIN_SHARD_ROWS = 20000
+
+# Frames inherited by forked workers, so only shard row numbers are pickled
+_SHARED_FRAMES = None
+
+
+def compare_parallel(df1: pd.DataFrame, df2: pd.DataFrame, columns: List[str],
+                     key_columns: Optional[List[str]], workers: int,
+                     tolerance: float = 0.01, limit: int = 100,
+                     money_columns: Iterable[str] = (), rank_by: str = DEFAULT_RANKING,
+                     field_priority: Optional[List[str]] = None,
+                     fingerprint: bool = True) -> Dict[str, Any]:
+    """
+    Compare two frames with up to `workers` processes
+
+    Args:
+        df1: Normalized data from the first file
+        df2: Normalized data from the second file
+        columns: Common columns to compare
+        key_columns: Join key, or None/[] to pair rows by position
+        workers: Maximum number of worker processes
+        tolerance: Numeric differences at or below this value are ignored
+        limit: Maximum number of row differences to keep
+        money_columns: Columns that may hold integer cents
+        rank_by: Which differences to keep (see comparison_engine.compare_aligned)
+        field_priority: Fields in priority order for rank_by='field_priority'
+        fingerprint: Skip rows with equal row fingerprints before comparing fields
+
+    Returns:
+        Same structure as comparison_engine.compare_frames (plus '_order'),
+        independent of the number of workers
+    """
+    global _SHARED_FRAMES
+
+    options = (columns, key_columns, tolerance, limit, list(money_columns),
+               rank_by, field_priority, fingerprint)
+    shards = shard_count(max(len(df1), len(df2)), workers)
+    if shards == 1:
+        return _compare_shard((df1, df2) + options)
+
+    rows = _shard_rows(df1, df2, key_columns, shards)
+    context = _fork_context()
+    if context is not None:
+        # Workers see the parent's frames copy-on-write
+        _SHARED_FRAMES = (df1, df2)
+        tasks = [(rows1, rows2) + options for rows1, rows2 in rows]
+        try:
+            with ProcessPoolExecutor(max_workers=shards, mp_context=context) as executor:
+                parts = list(executor.map(_compare_shared_shard, tasks))
+        finally:
+            _SHARED_FRAMES = None
+    else:
+        tasks = [(df1.iloc[rows1], df2.iloc[rows2]) + options for rows1, rows2 in rows]
+        with ProcessPoolExecutor(max_workers=shards) as executor:
+            parts = list(executor.map(_compare_shard, tasks))
+
+    return merge_comparisons(parts, limit)
+
+
+def shard_count(rows: int, workers: int) -> int:
+    """Number of shards worth using for a frame of this size"""
+    return max(1, min(workers, math.ceil(rows / MIN_SHARD_ROWS)))
+
+
+def _shard_rows(df1: pd.DataFrame, df2: pd.DataFrame, key_columns: Optional[List[str]],
+                shards: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Row positions of every shard, by key hash or by contiguous ranges without a key"""
+    if key_columns:
+        ids1 = partition_ids(df1[key_columns], shards).to_numpy()
+        ids2 = partition_ids(df2[key_columns], shards).to_numpy()
+        return [(np.flatnonzero(ids1 == shard), np.flatnonzero(ids2 == shard))
+                for shard in range(shards)]
+
+    # Positional pairing: the last shard also carries the unpaired tail rows
+    paired = min(len(df1), len(df2))
+    bounds = [paired * shard // shards for shard in range(shards)]
+    ends1 = bounds[1:] + [len(df1)]
+    ends2 = bounds[1:] + [len(df2)]
+    return [(np.arange(bounds[i], ends1[i]), np.arange(bounds[i], ends2[i]))
+            for i in range(shards)]
+
+
+def _fork_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def _compare_shared_shard(task: tuple) -> Dict[str, Any]:
+    """Worker entry point for forked workers: slice the inherited frames"""
+    rows1, rows2 = task[:2]
+    df1, df2 = _SHARED_FRAMES
+    return _compare_shard((df1.iloc[rows1], df2.iloc[rows2]) + task[2:])
+
+
+def _compare_shard(task: tuple) -> Dict[str, Any]:
+    """Worker entry point: join and compare one shard"""
+    (df1, df2, columns, key_columns, tolerance, limit, money_columns,
+     rank_by, field_priority, fingerprint) = task
+    alignment = align_frames(df1, df2, key_columns)
+    comparison = compare_aligned(alignment, columns, tolerance, limit, money_columns,
+                                 rank_by, field_priority, fingerprint)
+    return {**comparison, **alignment.report()}
@@ -8,10 +8,26 @@ Generates detailed reports with differences, side-by-side comparison, and summar
 import pandas as pd
 import numpy as np
 from pathlib import Path
+import io
 import json
 from datetime import datetime
 from typing import Dict, List, Tuple, Any
 import sys
+import heapq
+
+from difference_table import DifferenceTable
+from comparison_engine import (
+    align_frames, compare_aligned, format_day_shift, rank_key, resolve_key_columns, unmatched_records,
+    Alignment, ENGINES, DEFAULT_ENGINE, RANKINGS, DEFAULT_RANKING
+)
+from field_statistics import (
+    accumulate_day_shifts, accumulate_row, summarize_day_shifts, summarize_field_stats
+)
+from file_cache import cache_enabled, default_cache
+from html_report import write_html_report
+from pdf_ingest import load_pdf
+from schema_ingest import header_resolver, read_table
+from value_normalizers import coerce_date_columns, coerce_numeric_columns
 
 # Try to import optional dependencies
 try:
@@ -57,12 +73,26 @@ class PayrollAuditor:
         'pfml': ['pfml', 'paid_family_leave', 'family_leave', 'paid family leave']
     }
     
-    def __init__(self):
+    def __init__(self, engine: str = DEFAULT_ENGINE, key_columns: List[str] = None,
+                 rank_by: str = DEFAULT_RANKING, field_priority: List[str] = None,
+                 cache: bool = True):
+        if engine not in ENGINES:
+            raise ValueError(f"Unsupported engine: {engine}")
+        if rank_by not in RANKINGS:
+            raise ValueError(f"Unsupported ranking: {rank_by}")
+        self.engine = engine
+        self.key_columns = key_columns
+        self.rank_by = rank_by
+        self.field_priority = field_priority
+        self.cache = default_cache() if cache and cache_enabled() else None
+        # Compiled once per mapping set and shared, so batches resolve each header layout once
+        self.header_resolver = header_resolver(self.FIELD_MAPPINGS)
         self.file1_data = None
         self.file2_data = None
         self.file1_path = None
         self.file2_path = None
         self.comparison_results = {}
+        self.difference_table = None
         
     def load_file(self, filepath: str) -> pd.DataFrame:
         """Load a file (CSV, Excel, or PDF) into a DataFrame"""
@@ -85,7 +115,7 @@ class PayrollAuditor:
     def _load_csv(self, path: Path) -> pd.DataFrame:
         """Load CSV file"""
         try:
-            df = pd.read_csv(path)
+            df = read_table(path, self.header_resolver)
             print(f"✓ Loaded CSV: {path.name} ({len(df)} rows, {len(df.columns)} columns)")
             return df
         except Exception as e:
@@ -97,7 +127,7 @@ class PayrollAuditor:
             raise Exception("Excel support requires openpyxl. Install with: pip install openpyxl")
         
         try:
-            df = pd.read_excel(path, engine='openpyxl')
+            df = read_table(path, self.header_resolver)
             print(f"✓ Loaded Excel: {path.name} ({len(df)} rows, {len(df.columns)} columns)")
             return df
         except Exception as e:
@@ -109,41 +139,52 @@ class PayrollAuditor:
             raise Exception("PDF support requires pdfplumber. Install with: pip install pdfplumber")
         
         try:
-            with pdfplumber.open(path) as pdf:
-                all_tables = []
-                for page in pdf.pages:
-                    tables = page.extract_tables()
-                    all_tables.extend(tables)
-                
-                if not all_tables:
-                    raise Exception("No tables found in PDF")
-                
-                # Use the first table or combine tables
-                table = all_tables[0]
-                df = pd.DataFrame(table[1:], columns=table[0])
-                print(f"✓ Loaded PDF: {path.name} ({len(df)} rows, {len(df.columns)} columns)")
-                return df
+            # Every page's tables, stitched into one frame across page breaks
+            df = load_pdf(str(path), cache=self.cache)
+            print(f"✓ Loaded PDF: {path.name} ({len(df)} rows, {len(df.columns)} columns)")
+            return df
         except Exception as e:
             raise Exception(f"Error loading PDF: {e}")
     
     def normalize_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Normalize column names to standard format"""
-        df = df.copy()
-        column_mapping = {}
-        
-        for col in df.columns:
-            col_lower = str(col).lower().strip()
-            for standard_name, variations in self.FIELD_MAPPINGS.items():
-                if col_lower in variations:
-                    column_mapping[col] = standard_name
-                    break
+        column_mapping = self.header_resolver.resolve(df.columns)
+        df = df.rename(columns=column_mapping)
         
         if column_mapping:
-            df = df.rename(columns=column_mapping)
             print(f"  Normalized {len(column_mapping)} columns: {list(column_mapping.values())}")
         
         return df
     
+    def _load_normalized(self, filepath: str) -> pd.DataFrame:
+        """Load a file and normalize its columns, reusing the cached result for identical content"""
+        def load():
+            df = self.load_file(filepath)
+            print("  Normalizing column names...")
+            df = self.normalize_columns(df)
+            # Text amounts from PDFs and Excel exports ("$1,234.56", "(12.00)") become numbers,
+            # pay dates in any detected format become dates
+            failures = coerce_numeric_columns(df)
+            failures.update(coerce_date_columns(df))
+            for col, count in failures.items():
+                print(f"  ⚠ {count} value(s) in '{col}' could not be parsed")
+            if failures:
+                df.attrs['coercion_failures'] = failures
+            return df
+        
+        if self.cache is None:
+            return load()
+        if not Path(filepath).exists():
+            raise FileNotFoundError(f"File not found: {filepath}")
+        df, cached = self.cache.load(filepath, load, self._cache_namespace())
+        if cached:
+            print(f"✓ Loaded cached: {Path(filepath).name} ({len(df)} rows, {len(df.columns)} columns)")
+        return df
+    
+    def _cache_namespace(self) -> str:
+        # Everything that changes the normalized frame for the same file content
+        return json.dumps(['payroll', self.FIELD_MAPPINGS], sort_keys=True, default=str)
+    
     def compare_files(self, file1: str, file2: str) -> Dict[str, Any]:
         """Compare two payroll files"""
         print(f"\n{'='*80}")
@@ -154,13 +195,8 @@ class PayrollAuditor:
         print("\nLoading files...")
         self.file1_path = file1
         self.file2_path = file2
-        self.file1_data = self.load_file(file1)
-        self.file2_data = self.load_file(file2)
-        
-        # Normalize columns
-        print("\nNormalizing column names...")
-        self.file1_data = self.normalize_columns(self.file1_data)
-        self.file2_data = self.normalize_columns(self.file2_data)
+        self.file1_data = self._load_normalized(file1)
+        self.file2_data = self._load_normalized(file2)
         
         # Perform comparison
         print("\nPerforming comparison...")
@@ -183,12 +219,14 @@ class PayrollAuditor:
             'file1': {
                 'name': Path(self.file1_path).name,
                 'rows': len(self.file1_data),
-                'columns': len(self.file1_data.columns)
+                'columns': len(self.file1_data.columns),
+                'coercion_failures': self.file1_data.attrs.get('coercion_failures', {})
             },
             'file2': {
                 'name': Path(self.file2_path).name,
                 'rows': len(self.file2_data),
-                'columns': len(self.file2_data.columns)
+                'columns': len(self.file2_data.columns),
+                'coercion_failures': self.file2_data.attrs.get('coercion_failures', {})
             }
         }
     
@@ -207,67 +245,80 @@ class PayrollAuditor:
     
     def _compare_data(self) -> Dict[str, Any]:
         """Compare data line-by-line"""
+        self.difference_table = None
         common_cols = list(set(self.file1_data.columns) & set(self.file2_data.columns))
         
         if not common_cols:
             return {'error': 'No common columns found for comparison'}
         
-        # Try to find employee identifier
-        id_col = None
-        for col in ['employee', 'employee_id', 'id']:
-            if col in common_cols:
-                id_col = col
-                break
+        # Try to find employee identifier (or the configured composite key)
+        key_columns = resolve_key_columns(common_cols, self.key_columns)
+        compare_cols = [col for col in common_cols if col not in key_columns]
         
-        differences = []
-        matched_rows = 0
+        # Pair rows in a single join; duplicate keys match by occurrence number
+        alignment = align_frames(self.file1_data, self.file2_data, key_columns)
+        
+        if self.engine == 'vectorized':
+            # Compare column-at-a-time
+            comparison = compare_aligned(alignment, compare_cols, rank_by=self.rank_by,
+                                         field_priority=self.field_priority)
+        else:
+            comparison = self._compare_data_rowwise(alignment, compare_cols)
+        
+        self.difference_table = comparison['differences']
+        
+        # Records present in only one of the files
         unmatched_file1 = []
         unmatched_file2 = []
+        if key_columns:
+            unmatched_file1 = unmatched_records(alignment.only_file1, key_columns)
+            unmatched_file2 = unmatched_records(alignment.only_file2, key_columns)
         
-        if id_col:
-            # Match by employee ID
-            df1_indexed = self.file1_data.set_index(id_col)
-            df2_indexed = self.file2_data.set_index(id_col)
-            
-            common_ids = set(df1_indexed.index) & set(df2_indexed.index)
-            only_file1_ids = set(df1_indexed.index) - set(df2_indexed.index)
-            only_file2_ids = set(df2_indexed.index) - set(df1_indexed.index)
-            
-            # Compare common rows
-            for emp_id in common_ids:
-                row1 = df1_indexed.loc[emp_id]
-                row2 = df2_indexed.loc[emp_id]
-                
-                row_diffs = self._compare_rows(row1, row2, common_cols, emp_id)
-                if row_diffs:
-                    differences.append(row_diffs)
-                else:
-                    matched_rows += 1
-            
-            unmatched_file1 = [{'id': id, 'data': df1_indexed.loc[id].to_dict()} 
-                              for id in only_file1_ids]
-            unmatched_file2 = [{'id': id, 'data': df2_indexed.loc[id].to_dict()} 
-                              for id in only_file2_ids]
-        else:
-            # Compare by row index
-            max_rows = min(len(self.file1_data), len(self.file2_data))
-            for idx in range(max_rows):
-                row1 = self.file1_data.iloc[idx]
-                row2 = self.file2_data.iloc[idx]
+        return {
+            'identifier_column': ', '.join(key_columns) or None,
+            'key_columns': key_columns,
+            'total_differences': comparison['total_differences'],
+            'matched_rows': comparison['matched_rows'],
+            # Top 100 by rank for display; the table keeps its cells as arrays
+            'differences': comparison['differences'].records(100),
+            'unmatched_file1': unmatched_file1,
+            'unmatched_file2': unmatched_file2,
+            '_field_stats': comparison['_field_stats'],
+            '_date_shifts': comparison['_date_shifts'],
+            **alignment.report()
+        }
+    
+    def _compare_data_rowwise(self, alignment: Alignment, columns: List[str],
+                              limit: int = 100) -> Dict[str, Any]:
+        """Compare aligned data one row at a time (original engine), keeping the top limit"""
+        field_stats = {}
+        date_shifts = {}
+        counts = {'total_differences': 0, 'matched_rows': 0}
+        
+        def ranked_differences():
+            for pos in range(len(alignment)):
+                row1 = alignment.left.iloc[pos]
+                row2 = alignment.right.iloc[pos]
                 
-                row_diffs = self._compare_rows(row1, row2, common_cols, f"Row {idx}")
+                row_diffs = self._compare_rows(row1, row2, columns, alignment.label(pos))
                 if row_diffs:
-                    differences.append(row_diffs)
+                    counts['total_differences'] += 1
+                    accumulate_row(field_stats, row_diffs['fields'])
+                    accumulate_day_shifts(date_shifts, row_diffs['fields'])
+                    row = int(alignment.rows1[pos])
+                    yield rank_key(row_diffs['fields'], row, self.rank_by, self.field_priority), row_diffs
                 else:
-                    matched_rows += 1
+                    counts['matched_rows'] += 1
+        
+        # Bounded heap: O(K) memory however many rows differ
+        kept = heapq.nsmallest(limit, ranked_differences(), key=lambda pair: pair[0])
         
         return {
-            'identifier_column': id_col,
-            'total_differences': len(differences),
-            'matched_rows': matched_rows,
-            'differences': differences[:100],  # Limit to first 100 for display
-            'unmatched_file1': unmatched_file1[:20],
-            'unmatched_file2': unmatched_file2[:20]
+            **counts,
+            'differences': DifferenceTable.from_records([diff for _, diff in kept]),
+            '_order': [key for key, _ in kept],
+            '_field_stats': field_stats,
+            '_date_shifts': date_shifts
         }
     
     def _compare_rows(self, row1: pd.Series, row2: pd.Series, 
@@ -288,7 +339,15 @@ class PayrollAuditor:
             
             # Convert to comparable types
             try:
-                if isinstance(val1, (int, float)) and isinstance(val2, (int, float)):
+                if isinstance(val1, pd.Timestamp) and isinstance(val2, pd.Timestamp):
+                    if val1 != val2:
+                        days = (val2 - val1) / pd.Timedelta(days=1)
+                        diffs[col] = {
+                            'file1': val1,
+                            'file2': val2,
+                            'days': int(days) if days.is_integer() else days
+                        }
+                elif isinstance(val1, (int, float)) and isinstance(val2, (int, float)):
                     if abs(float(val1) - float(val2)) > 0.01:  # Tolerance for floating point
                         diffs[col] = {
                             'file1': val1,
@@ -319,25 +378,8 @@ class PayrollAuditor:
         """Generate summary statistics"""
         data_results = results['data']
         
-        # Calculate field-level statistics
-        field_stats = {}
-        if 'differences' in data_results:
-            for diff in data_results['differences']:
-                for field, values in diff.get('fields', {}).items():
-                    if field not in field_stats:
-                        field_stats[field] = {'count': 0, 'numeric_diffs': []}
-                    
-                    field_stats[field]['count'] += 1
-                    if 'difference' in values:
-                        field_stats[field]['numeric_diffs'].append(values['difference'])
-        
-        # Calculate statistics for numeric fields
-        for field, stats in field_stats.items():
-            if stats['numeric_diffs']:
-                stats['avg_difference'] = np.mean(stats['numeric_diffs'])
-                stats['max_difference'] = max(stats['numeric_diffs'])
-                stats['min_difference'] = min(stats['numeric_diffs'])
-                stats['total_difference'] = sum(stats['numeric_diffs'])
+        # Field-level statistics, accumulated over every difference during comparison
+        field_stats = summarize_field_stats(data_results.pop('_field_stats', {}))
         
         return {
             'total_rows_compared': data_results.get('matched_rows', 0) + data_results.get('total_differences', 0),
@@ -346,8 +388,9 @@ class PayrollAuditor:
             'match_rate': (data_results.get('matched_rows', 0) / 
                           max(1, data_results.get('matched_rows', 0) + data_results.get('total_differences', 0))) * 100,
             'field_statistics': field_stats,
-            'unmatched_in_file1': len(data_results.get('unmatched_file1', [])),
-            'unmatched_in_file2': len(data_results.get('unmatched_file2', []))
+            'date_shifts': summarize_day_shifts(data_results.pop('_date_shifts', {})),
+            'unmatched_in_file1': data_results.get('unmatched_in_file1', 0),
+            'unmatched_in_file2': data_results.get('unmatched_in_file2', 0)
         }
     
     def generate_report(self, output_file: str = None, format: str = 'text') -> str:
@@ -367,8 +410,7 @@ class PayrollAuditor:
         if output_file:
             with open(output_file, 'w') as f:
                 f.write(report)
-            print(f"
-✓ Report saved to: {output_file}")
+            print(f"\n✓ Report saved to: {output_file}")
         
         return report
     
@@ -392,6 +434,9 @@ class PayrollAuditor:
         lines.append(f"  Rows: {meta['file1']['rows']}, Columns: {meta['file1']['columns']}")
         lines.append(f"File 2: {meta['file2']['name']}")
         lines.append(f"  Rows: {meta['file2']['rows']}, Columns: {meta['file2']['columns']}")
+        for label in ('file1', 'file2'):
+            for col, count in meta[label].get('coercion_failures', {}).items():
+                lines.append(f"  ⚠ {meta[label]['name']}: {count} unparseable value(s) in '{col}'")
         lines.append("")
         
         # Structure comparison
@@ -418,6 +463,10 @@ class PayrollAuditor:
             lines.append(f"Unmatched in File 1: {summary['unmatched_in_file1']}")
         if summary.get('unmatched_in_file2', 0) > 0:
             lines.append(f"Unmatched in File 2: {summary['unmatched_in_file2']}")
+        for label, dupes in results['data'].get('duplicate_keys', {}).items():
+            if dupes['keys']:
+                lines.append(f"Duplicate keys in {label.replace('file', 'File ')}: "
+                             f"{dupes['keys']} ({dupes['rows']} rows, paired by occurrence)")
         lines.append("")
         
         # Field-level statistics
@@ -425,8 +474,7 @@ class PayrollAuditor:
             lines.append("FIELD-LEVEL DIFFERENCES")
             lines.append("-" * 80)
             for field, stats in summary['field_statistics'].items():
-                lines.append(f"
-{field.upper()}:")
+                lines.append(f"\n{field.upper()}:")
                 lines.append(f"  Differences found: {stats['count']}")
                 if 'avg_difference' in stats:
                     lines.append(f"  Average difference: {stats['avg_difference']:.2f}")
@@ -434,173 +482,54 @@ class PayrollAuditor:
                     lines.append(f"  Range: {stats['min_difference']:.2f} to {stats['max_difference']:.2f}")
             lines.append("")
         
+        # How many rows moved by how many days, per date field
+        for field, shifts in summary.get('date_shifts', {}).items():
+            lines.append(f"{field.upper()} SHIFTS")
+            lines.append("-" * 80)
+            for days, count in shifts.items():
+                lines.append(f"  {format_day_shift(days)}: {count} row(s)")
+            lines.append("")
+        
         # Detailed differences
         data = results['data']
         if data.get('differences'):
             lines.append("DETAILED DIFFERENCES (First 20)")
             lines.append("-" * 80)
             for i, diff in enumerate(data['differences'][:20], 1):
-                lines.append(f"
-{i}. {diff['identifier']}")
+                lines.append(f"\n{i}. {diff['identifier']}")
                 for field, values in diff['fields'].items():
                     lines.append(f"   {field}:")
                     lines.append(f"     File 1: {values['file1']}")
                     lines.append(f"     File 2: {values['file2']}")
                     if 'difference' in values:
                         lines.append(f"     Δ: {values['difference']:.2f}")
+                    if 'days' in values:
+                        lines.append(f"     Δ: {format_day_shift(values['days'])}")
         
         # Unmatched records
         if data.get('unmatched_file1'):
-            lines.append("
-
-UNMATCHED RECORDS IN FILE 1 (First 10)")
+            lines.append("\n\nUNMATCHED RECORDS IN FILE 1 (First 10)")
             lines.append("-" * 80)
             for item in data['unmatched_file1'][:10]:
                 lines.append(f"  {item['id']}: {item['data']}")
         
         if data.get('unmatched_file2'):
-            lines.append("
-
-UNMATCHED RECORDS IN FILE 2 (First 10)")
+            lines.append("\n\nUNMATCHED RECORDS IN FILE 2 (First 10)")
             lines.append("-" * 80)
             for item in data['unmatched_file2'][:10]:
                 lines.append(f"  {item['id']}: {item['data']}")
         
-        lines.append("
-" + "=" * 80)
+        lines.append("\n" + "=" * 80)
         lines.append("END OF REPORT")
         lines.append("=" * 80)
         
-        return "
-".join(lines)
+        return "\n".join(lines)
     
     def _generate_html_report(self) -> str:
-        """Generate HTML report"""
-        # Basic HTML template
-        html = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Payroll Audit Report</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; background: #f5f5f5; }}
-        .container {{ max-width: 1200px; margin: 0 auto; background: white; padding: 30px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }}
-        h1 {{ color: #333; border-bottom: 3px solid #4CAF50; padding-bottom: 10px; }}
-        h2 {{ color: #555; margin-top: 30px; border-bottom: 2px solid #ddd; padding-bottom: 5px; }}
-        .metadata {{ background: #f9f9f9; padding: 15px; border-radius: 5px; margin: 20px 0; }}
-        .summary {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px; margin: 20px 0; }}
-        .stat-box {{ background: #e3f2fd; padding: 15px; border-radius: 5px; text-align: center; }}
-        .stat-value {{ font-size: 24px; font-weight: bold; color: #1976d2; }}
-        .stat-label {{ color: #666; margin-top: 5px; }}
-        table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-        th {{ background: #4CAF50; color: white; padding: 12px; text-align: left; }}
-        td {{ padding: 10px; border-bottom: 1px solid #ddd; }}
-        tr:hover {{ background: #f5f5f5; }}
-        .difference {{ background: #fff3cd; padding: 10px; margin: 10px 0; border-left: 4px solid #ffc107; }}
-        .match {{ color: #4CAF50; }}
-        .mismatch {{ color: #f44336; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>Payroll Audit Report</h1>
-        <p>Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        
-        {self._html_metadata()}
-        {self._html_summary()}
-        {self._html_field_stats()}
-        {self._html_differences()}
-    </div>
-</body>
-</html>
-"""
-        return html
-    
-    def _html_metadata(self) -> str:
-        meta = self.comparison_results['metadata']
-        return f"""
-        <h2>File Information</h2>
-        <div class="metadata">
-            <p><strong>File 1:</strong> {meta['file1']['name']} ({meta['file1']['rows']} rows, {meta['file1']['columns']} columns)</p>
-            <p><strong>File 2:</strong> {meta['file2']['name']} ({meta['file2']['rows']} rows, {meta['file2']['columns']} columns)</p>
-        </div>
-        """
-    
-    def _html_summary(self) -> str:
-        summary = self.comparison_results['summary']
-        return f"""
-        <h2>Summary Statistics</h2>
-        <div class="summary">
-            <div class="stat-box">
-                <div class="stat-value">{summary['total_rows_compared']}</div>
-                <div class="stat-label">Total Rows</div>
-            </div>
-            <div class="stat-box">
-                <div class="stat-value">{summary['rows_matched']}</div>
-                <div class="stat-label">Matched</div>
-            </div>
-            <div class="stat-box">
-                <div class="stat-value">{summary['rows_with_differences']}</div>
-                <div class="stat-label">Differences</div>
-            </div>
-            <div class="stat-box">
-                <div class="stat-value">{summary['match_rate']:.1f}%</div>
-                <div class="stat-label">Match Rate</div>
-            </div>
-        </div>
-        """
-    
-    def _html_field_stats(self) -> str:
-        summary = self.comparison_results['summary']
-        if not summary['field_statistics']:
-            return ""
-        
-        rows = []
-        for field, stats in summary['field_statistics'].items():
-            row = f"<tr><td>{field}</td><td>{stats['count']}</td>"
-            if 'avg_difference' in stats:
-                row += f"<td>{stats['avg_difference']:.2f}</td><td>{stats['total_difference']:.2f}</td>"
-            else:
-                row += "<td>N/A</td><td>N/A</td>"
-            row += "</tr>"
-            rows.append(row)
-        
-        return f"""
-        <h2>Field-Level Statistics</h2>
-        <table>
-            <tr>
-                <th>Field</th>
-                <th>Differences</th>
-                <th>Avg Difference</th>
-                <th>Total Difference</th>
-            </tr>
-            {''.join(rows)}
-        </table>
-        """
-    
-    def _html_differences(self) -> str:
-        data = self.comparison_results['data']
-        if not data.get('differences'):
-            return "<h2>No Differences Found</h2>"
-        
-        diffs_html = []
-        for diff in data['differences'][:20]:
-            fields_html = []
-            for field, values in diff['fields'].items():
-                diff_str = f" (Δ: {values['difference']:.2f})" if 'difference' in values else ""
-                fields_html.append(f"<strong>{field}:</strong> {values['file1']} → {values['file2']}{diff_str}")
-            
-            diffs_html.append(f"""
-            <div class="difference">
-                <strong>{diff['identifier']}</strong><br>
-                {' | '.join(fields_html)}
-            </div>
-            """)
-        
-        return f"""
-        <h2>Detailed Differences (First 20)</h2>
-        {''.join(diffs_html)}
-        """
+        """Generate HTML report (virtualized, filterable table of the differences)"""
+        buffer = io.BytesIO()
+        write_html_report(self.comparison_results, buffer, self.difference_table)
+        return buffer.getvalue().decode()
 
 
 def main():
@@ -613,24 +542,34 @@ def main():
     parser.add_argument('-o', '--output', help='Output report file path')
     parser.add_argument('-f', '--format', choices=['text', 'html', 'json'], 
                        default='text', help='Report format (default: text)')
+    parser.add_argument('--engine', choices=list(ENGINES), default=DEFAULT_ENGINE,
+                       help='Comparison engine (default: vectorized)')
+    parser.add_argument('-k', '--key', action='append', dest='key_columns',
+                       help='Key column to match rows on (repeat for a composite key)')
+    parser.add_argument('--rank-by', choices=list(RANKINGS), default=DEFAULT_RANKING,
+                       help='Which differences to report first (default: file order)')
+    parser.add_argument('--field-priority', nargs='+',
+                       help='Fields in priority order for --rank-by field_priority')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always re-parse input files instead of using the parsed-file cache')
     
     args = parser.parse_args()
     
     try:
-        auditor = PayrollAuditor()
+        auditor = PayrollAuditor(engine=args.engine, key_columns=args.key_columns,
+                                 rank_by=args.rank_by, field_priority=args.field_priority,
+                                 cache=not args.no_cache)
         results = auditor.compare_files(args.file1, args.file2)
         
         # Generate and display report
         report = auditor.generate_report(args.output, args.format)
         
         if not args.output:
-            print("
-" + report)
+            print("\n" + report)
         
         # Print summary
         summary = results['summary']
-        print(f"
-{'='*80}")
+        print(f"\n{'='*80}")
         print(f"AUDIT COMPLETE")
         print(f"{'='*80}")
         print(f"Match Rate: {summary['match_rate']:.2f}%")
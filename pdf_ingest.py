@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+PDF Ingest
+Extracts the tables of every page of a PDF payroll register in a process pool,
+caches each page's tables by page content hash and stitches tables that
+continue across pages into a single frame
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Try to import optional dependencies
+try:
+    import pdfplumber
+    from pdfminer.pdftypes import resolve1
+    PDF_SUPPORT = True
+except ImportError:
+    PDF_SUPPORT = False
+
+# Bump when extraction or stitching changes so cached pages are re-extracted
+EXTRACTOR_VERSION = 1
+
+# Fewer pages than this per worker are not worth a process
+MIN_PAGES_PER_WORKER = 8
+
+Table = List[List[Optional[str]]]
+
+
+def load_pdf(path: str, workers: Optional[int] = None, cache=None) -> pd.DataFrame:
+    """
+    Load every table row of a PDF into one DataFrame
+
+    Args:
+        path: Path to the PDF file
+        workers: Maximum worker processes (default: CPU count)
+        cache: Optional ParsedFileCache for per-page tables
+
+    Returns:
+        DataFrame with the header of the first table and the rows of every
+        table with the same number of columns, in page order
+    """
+    if not PDF_SUPPORT:
+        raise ImportError("PDF support requires pdfplumber. Install with: pip install pdfplumber")
+    return stitch_tables(extract_page_tables(path, workers, cache))
+
+
+def extract_page_tables(path: str, workers: Optional[int] = None, cache=None) -> List[List[Table]]:
+    """Tables of every page in page order, extracting only pages not in the cache"""
+    with pdfplumber.open(path) as pdf:
+        keys = [_page_key(page) if cache is not None else None for page in pdf.pages]
+
+    pages = [cache.get_object(key) if key else None for key in keys]
+    missing = [number for number, tables in enumerate(pages) if tables is None]
+
+    extracted = _extract_pages(path, missing, workers)
+    for number, tables in extracted.items():
+        pages[number] = tables
+        if keys[number]:
+            cache.put_object(keys[number], tables, evict=False)
+    if extracted and cache is not None:
+        cache.evict()
+    return pages
+
+
+def stitch_tables(pages: List[List[Table]]) -> pd.DataFrame:
+    """
+    Join tables continued across pages into one frame
+
+    The first row of the first table is the header. Later tables with the same
+    width continue it; header rows repeated on later pages and empty rows are
+    dropped. Tables with a different width (totals boxes etc.) are skipped.
+    """
+    header = header_key = None
+    rows = []
+    for tables in pages:
+        for table in tables:
+            if not table:
+                continue
+            if header is None:
+                header, body = table[0], table[1:]
+                header_key = _row_key(header)
+            elif len(table[0]) != len(header):
+                continue
+            else:
+                body = table
+            rows.extend(row for row in body
+                        if _row_key(row) != header_key
+                        and any(cell not in (None, '') for cell in row))
+
+    if header is None:
+        raise ValueError("No tables found in PDF")
+    return pd.DataFrame(rows, columns=header)
+
+
+def _extract_pages(path: str, numbers: List[int], workers: Optional[int]) -> Dict[int, List[Table]]:
+    """Extract the given pages, split into contiguous runs across processes"""
+    if not numbers:
+        return {}
+    workers = workers or os.cpu_count() or 1
+    shards = max(1, min(workers, len(numbers) // MIN_PAGES_PER_WORKER))
+    if shards == 1:
+        return _extract_page_range((path, numbers))
+
+    # Every worker opens the file itself; pdfplumber objects do not pickle
+    tasks = [(path, [int(n) for n in chunk]) for chunk in np.array_split(numbers, shards)]
+    extracted = {}
+    with ProcessPoolExecutor(max_workers=shards) as executor:
+        for part in executor.map(_extract_page_range, tasks):
+            extracted.update(part)
+    return extracted
+
+
+def _extract_page_range(task: Tuple[str, List[int]]) -> Dict[int, List[Table]]:
+    """Worker entry point: extract the tables of some pages"""
+    path, numbers = task
+    extracted = {}
+    with pdfplumber.open(path) as pdf:
+        for number in numbers:
+            page = pdf.pages[number]
+            extracted[number] = page.extract_tables()
+            # Drop the parsed layout so memory does not grow with the page count
+            if hasattr(page, 'close'):
+                page.close()
+    return extracted
+
+
+def _page_key(page) -> Optional[str]:
+    """
+    Cache key from the page's own content and the resources it draws with
+
+    Returns None (no caching) when the page streams cannot be read.
+    """
+    try:
+        digest = hashlib.sha256(
+            f"pdf-tables:{EXTRACTOR_VERSION}:{pdfplumber.__version__}:{page.bbox}".encode())
+        for data in _page_streams(page.page_obj):
+            digest.update(data)
+    except Exception:
+        return None
+    return digest.hexdigest()
+
+
+def _page_streams(page_obj) -> List[bytes]:
+    """Raw content streams plus form XObjects and font ToUnicode maps"""
+    streams = list(page_obj.contents or [])
+    resources = resolve1(page_obj.resources) or {}
+    for xobject in (resolve1(resources.get('XObject')) or {}).values():
+        streams.append(xobject)
+    for font in (resolve1(resources.get('Font')) or {}).values():
+        font = resolve1(font)
+        if font.get('ToUnicode') is not None:
+            streams.append(font['ToUnicode'])
+        # Base font and encoding change the decoded text of identical streams
+        streams.append(repr((font.get('BaseFont'), font.get('Encoding'))).encode())
+
+    data = []
+    for stream in streams:
+        stream = resolve1(stream)
+        data.append(stream if isinstance(stream, bytes) else stream.get_data())
+    return data
+
+
+def _row_key(row: List[Any]) -> Tuple[str, ...]:
+    return tuple(str(cell).strip().lower() if cell is not None else '' for cell in row)
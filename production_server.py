@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Production API Server
+Serves api_server.app with gunicorn's prefork model. The master imports
+the auditor modules (pandas, openpyxl, pyarrow, pdfplumber...) once before
+forking, so workers start warm and share those pages copy-on-write. A
+worker is recycled gracefully after a number of audits to contain memory
+growth, and SIGHUP replaces every worker the same way.
+
+Usage:
+    python production_server.py --workers 4 --port 5000
+
+Signals (to the master process):
+    HUP   gracefully replace all workers (modules stay preloaded; restart
+          the server, or use USR2 then TERM on the old master, for new code)
+    TERM  graceful shutdown; INT/QUIT immediate shutdown
+    TTIN/TTOU  add/remove one worker
+"""
+
+import argparse
+import gc
+import importlib
+import os
+import random
+import tempfile
+from typing import Dict, Any, Optional
+
+# Try to import optional dependencies
+try:
+    from gunicorn.app.base import BaseApplication
+    GUNICORN_SUPPORT = True
+except ImportError:
+    BaseApplication = object
+    GUNICORN_SUPPORT = False
+
+DEFAULT_PORT = 5000
+DEFAULT_THREADS = 4
+DEFAULT_MAX_AUDITS = 200
+DEFAULT_TIMEOUT = 300
+
+# Requests counted towards recycling a worker
+AUDIT_ENDPOINTS = ('/api/audit', '/api/audits')
+
+# Imported in the master before forking; optional ones are skipped when missing
+PRELOAD_MODULES = ('pandas', 'numpy', 'openpyxl', 'lxml.etree', 'pyarrow', 'pyarrow.parquet',
+                   'orjson', 'pdfplumber', 'universal_payroll_auditor',
+                   'excel_export', 'html_report', 'columnar_export', 'pdf_ingest')
+
+
+def preload():
+    """
+    Import the API and auditor modules, run a warm-up audit, then freeze the heap
+
+    gc.freeze() moves everything imported so far out of the collector's
+    reach, so collections in the workers do not write to (and un-share) the
+    preloaded pages.
+
+    Returns:
+        The Flask app
+    """
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    import api_server
+    _warm_up()
+    gc.collect()
+    gc.freeze()
+    return api_server.app
+
+
+def _warm_up():
+    """Audit two tiny files so pandas' lazily imported code paths load before forking"""
+    from universal_payroll_auditor import UniversalPayrollAuditor
+    rows = "Employee Name,Pay Date,Gross Pay\nJane Smith,2024-01-15,1000.00\n"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        for index, text in enumerate((rows, rows.replace('1000.00', '1000.50'))):
+            paths.append(os.path.join(tmpdir, f"warm{index}.csv"))
+            with open(paths[-1], 'w') as f:
+                f.write(text)
+        UniversalPayrollAuditor({'cache': False}).audit(*paths)
+
+
+def server_options(workers: int, port: int, host: str = '0.0.0.0',
+                   threads: int = DEFAULT_THREADS, max_audits: int = DEFAULT_MAX_AUDITS,
+                   timeout: int = DEFAULT_TIMEOUT) -> Dict[str, Any]:
+    """
+    gunicorn settings for the API
+
+    Args:
+        workers: Worker processes
+        port, host: Listening address
+        threads: Request threads per worker (status polls are served while
+            an audit runs)
+        max_audits: Audits a worker serves before it is recycled (0: never);
+            each worker adds up to 10% jitter so they do not restart together
+        timeout: Seconds an unresponsive worker is given before it is
+            restarted, and that in-flight audits get to finish on a
+            graceful reload or shutdown
+    """
+    def post_fork(server, worker):
+        worker.audits = 0
+        worker.max_audits = max_audits + random.randint(0, max_audits // 10)
+        # Every worker takes part in running queued audits
+        import api_server
+        api_server.jobs.start()
+
+    def post_request(worker, req, environ, resp):
+        if req.method != 'POST' or req.path not in AUDIT_ENDPOINTS or not max_audits:
+            return
+        worker.audits += 1
+        _maybe_recycle(worker)
+
+    def pre_request(worker, req):
+        # A worker that reached its limit while running queued audits retires once they finish
+        if max_audits and worker.audits >= worker.max_audits:
+            _maybe_recycle(worker)
+
+    def worker_exit(server, worker):
+        # Running queued audits go back to the queue for the other workers
+        import api_server
+        api_server.jobs.shutdown(requeue=True)
+
+    return {
+        'bind': f"{host}:{port}",
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': threads,
+        'preload_app': True,
+        'timeout': timeout,
+        'graceful_timeout': timeout,
+        'post_fork': post_fork,
+        'post_request': post_request,
+        'pre_request': pre_request,
+        'worker_exit': worker_exit
+    }
+
+
+def _maybe_recycle(worker):
+    import api_server
+    if worker.audits >= worker.max_audits and not api_server.jobs.active() and worker.alive:
+        worker.log.info("Worker %s served %s audits, recycling", worker.pid, worker.audits)
+        worker.alive = False
+
+
+class AuditServer(BaseApplication):
+    """gunicorn application serving the preloaded API"""
+
+    def __init__(self, options: Dict[str, Any]):
+        self.options = options
+        self.application = None
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        if self.application is None:
+            self.application = preload()
+        return self.application
+
+
+def run(workers: Optional[int] = None, port: int = DEFAULT_PORT, host: str = '0.0.0.0',
+        threads: int = DEFAULT_THREADS, max_audits: int = DEFAULT_MAX_AUDITS,
+        timeout: int = DEFAULT_TIMEOUT):
+    """Serve the API until the master is stopped (see server_options for the arguments)"""
+    if not GUNICORN_SUPPORT:
+        raise ImportError("Production serving requires gunicorn. Install with: pip install gunicorn")
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and not os.environ.get('PAYROLL_AUDITOR_JOB_DB'):
+        # Workers must share the job queue for status requests to reach any of them
+        os.environ['PAYROLL_AUDITOR_JOB_DB'] = os.path.join(tempfile.gettempdir(),
+                                                            'payroll_auditor_jobs.db')
+    AuditServer(server_options(workers, port, host, threads, max_audits, timeout)).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the Payroll Auditor API with gunicorn')
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('PAYROLL_AUDITOR_WORKERS', 0)) or None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--threads', type=int,
+                        default=int(os.environ.get('PAYROLL_AUDITOR_THREADS', DEFAULT_THREADS)),
+                        help=f'Request threads per worker (default: {DEFAULT_THREADS})')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', DEFAULT_PORT)))
+    parser.add_argument('--max-audits', type=int,
+                        default=int(os.environ.get('PAYROLL_AUDITOR_MAX_AUDITS', DEFAULT_MAX_AUDITS)),
+                        help=f'Recycle a worker after this many audits, 0 to disable '
+                             f'(default: {DEFAULT_MAX_AUDITS})')
+    parser.add_argument('--timeout', type=int,
+                        default=int(os.environ.get('PAYROLL_AUDITOR_REQUEST_TIMEOUT', DEFAULT_TIMEOUT)),
+                        help=f'Seconds before a stuck worker is restarted (default: {DEFAULT_TIMEOUT})')
+    args = parser.parse_args()
+    run(args.workers, args.port, args.host, args.threads, args.max_audits, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Streaming Report Writers
+Write audit reports incrementally to a file or socket instead of building
+the whole document in memory: a JSON document whose differences array is
+streamed batch by batch, or NDJSON with one difference per line. Uses
+orjson when it is installed and the standard json module otherwise.
+"""
+
+import io
+import json
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Iterator, Union, BinaryIO
+
+from audit_result import AuditResult
+from difference_table import DifferenceTable
+
+# Try to import optional dependencies
+try:
+    import orjson
+    ORJSON_SUPPORT = True
+except ImportError:
+    ORJSON_SUPPORT = False
+
+STREAM_FORMATS = ('json', 'ndjson')
+
+# Differences converted to dictionaries and serialized at a time
+BATCH_SIZE = 10000
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes; values JSON has no type for are written as strings"""
+    if isinstance(obj, AuditResult):
+        # Its sections are not in the dict storage the encoders read until computed
+        obj = obj.to_dict()
+    if ORJSON_SUPPORT:
+        return orjson.dumps(obj, default=str,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=str, separators=(',', ':')).encode()
+
+
+def loads(data: bytes) -> Any:
+    """Parse JSON bytes written by dumps"""
+    if ORJSON_SUPPORT:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def write_json(results: Dict[str, Any], destination,
+               differences: Optional[DifferenceTable] = None,
+               batch_size: int = BATCH_SIZE) -> int:
+    """
+    Write the results as one JSON document, streaming the differences array
+
+    Every section is written as in the results dict, except that
+    data.differences (written last within data) holds every kept difference
+    of the table rather than the ones shown in the results.
+
+    Args:
+        results: Results of compare_files/audit
+        destination: Path, binary or text file object, or connected socket
+        differences: Full difference table (default: the results' own list)
+        batch_size: Differences serialized per write
+
+    Returns:
+        Number of differences written
+    """
+    written = 0
+    with open_writer(destination) as write:
+        write(b'{')
+        for position, (section, value) in enumerate(results.items()):
+            if position:
+                write(b',\n')
+            write(dumps(section) + b':')
+            if section != 'data' or not isinstance(value, dict):
+                write(dumps(value))
+                continue
+            rest = {key: item for key, item in value.items() if key != 'differences'}
+            head = dumps(rest)[:-1]  # reopen the object to append the differences
+            write(head + (b',' if rest else b'') + b'"differences":[')
+            for batch in _batches(value, differences, batch_size):
+                if written and batch:
+                    write(b',\n')
+                write(b',\n'.join(dumps(record) for record in batch))
+                written += len(batch)
+            write(b']}')
+        write(b'}\n')
+    return written
+
+
+def write_ndjson(results: Dict[str, Any], destination,
+                 differences: Optional[DifferenceTable] = None,
+                 batch_size: int = BATCH_SIZE) -> int:
+    """
+    Write every kept difference as one JSON object per line
+
+    Args:
+        results: Results of compare_files/audit
+        destination: Path, binary or text file object, or connected socket
+        differences: Full difference table (default: the results' own list)
+        batch_size: Differences serialized per write
+
+    Returns:
+        Number of differences written
+    """
+    written = 0
+    with open_writer(destination) as write:
+        for batch in _batches(results.get('data', {}), differences, batch_size):
+            if batch:
+                write(b'\n'.join(dumps(record) for record in batch) + b'\n')
+                written += len(batch)
+    return written
+
+
+def write_report(results: Dict[str, Any], destination, format: str = 'json',
+                 differences: Optional[DifferenceTable] = None,
+                 batch_size: int = BATCH_SIZE) -> int:
+    """Write a 'json' or 'ndjson' report; returns the number of differences written"""
+    if format == 'json':
+        return write_json(results, destination, differences, batch_size)
+    if format == 'ndjson':
+        return write_ndjson(results, destination, differences, batch_size)
+    raise ValueError(f"Unsupported streaming format: {format}")
+
+
+def _batches(data: Dict[str, Any], differences: Optional[DifferenceTable],
+             batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    if differences is not None:
+        yield from differences.iter_records(batch_size)
+        return
+    shown = data.get('differences', [])
+    for start in range(0, len(shown), batch_size):
+        yield shown[start:start + batch_size]
+
+
+@contextmanager
+def open_writer(destination: Union[str, BinaryIO, Any]):
+    """Context giving write(bytes) for a path, a binary or text file object, or a socket"""
+    if isinstance(destination, (str, bytes)) or hasattr(destination, '__fspath__'):
+        with open(destination, 'wb') as f:
+            yield f.write
+    elif hasattr(destination, 'sendall') and not hasattr(destination, 'write'):
+        yield destination.sendall
+    elif isinstance(destination, io.TextIOBase):
+        yield lambda data: destination.write(data.decode())
+    else:
+        yield destination.write
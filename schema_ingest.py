@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Schema-Pinned Ingest
+Reads the header of a CSV/Excel file first, resolves it against the field
+mappings and then parses with pinned dtypes (and optionally only the mapped
+columns) instead of inferring the type of every column. Field mappings are
+compiled once into a header resolver that caches the rename plan of every
+header layout it has seen.
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Iterable, Tuple
+
+import pandas as pd
+
+from file_source import FileSource, source_format
+
+# Try to import optional dependencies
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_CSV_SUPPORT = True
+except ImportError:
+    PYARROW_CSV_SUPPORT = False
+
+# Parse types of the standard fields; custom mapped fields are still inferred.
+# Dates stay text here: value_normalizers.parse_dates detects their format.
+FIELD_DTYPES = {
+    'employee': 'category',
+    'pay_date': 'str',
+    'hours': 'float64',
+    'overtime': 'float64',
+    'pto': 'float64',
+    'sick': 'float64',
+    'tips_cash': 'float64',
+    'tips_paycheck': 'float64',
+    'federal_tax': 'float64',
+    'social_security': 'float64',
+    'medicare': 'float64',
+    'state_tax': 'float64',
+    'local_tax': 'float64',
+    'pfml': 'float64'
+}
+
+
+# Distinct header layouts remembered per resolver
+MAX_CACHED_PLANS = 1024
+
+
+class HeaderResolver:
+    """
+    Field mappings compiled into synonym -> standard name indexes
+
+    Headers are looked up exactly (case and surrounding whitespace ignored)
+    and, failing that, by their tokens: punctuation, underscores, camelCase
+    and token order are ignored, so "Tax, Federal ($)" finds 'federal tax'.
+    Rename plans are cached by the exact header tuple, so every file with an
+    already seen layout is resolved with one dictionary lookup.
+
+    Args:
+        field_mappings: Standard name -> accepted header variations
+        fuzzy: Also match headers by their normalized tokens
+    """
+
+    def __init__(self, field_mappings: Dict[str, List[str]], fuzzy: bool = True):
+        self.fuzzy = fuzzy
+        # synonym -> (standard name, position in its list); the first mapping listing it wins
+        self._exact: Dict[str, Tuple[str, int]] = {}
+        self._tokens: Dict[str, Tuple[str, int]] = {}
+        for standard_name, variations in field_mappings.items():
+            for position, variation in enumerate(variations):
+                self._exact.setdefault(str(variation).lower().strip(), (standard_name, position))
+                self._tokens.setdefault(header_tokens(variation), (standard_name, position))
+        self._plans: Dict[tuple, Dict] = {}
+
+    def resolve(self, columns: Iterable) -> Dict:
+        """
+        Original column name -> standard name for every column the mappings recognize
+
+        When several columns resolve to the same standard name (an export with
+        both 'Name' and 'Employee'), the best match is renamed and the others
+        keep their names: exact before token matches, then the variation listed
+        first, then the leftmost column.
+        """
+        columns = tuple(columns)
+        plan = self._plans.get(columns)
+        if plan is None:
+            plan = self._plan(columns)
+            if len(self._plans) >= MAX_CACHED_PLANS:
+                self._plans.clear()
+            self._plans[columns] = plan
+        return plan
+
+    def _plan(self, columns: tuple) -> Dict:
+        best = {}  # standard name -> ((rank, position, index), column)
+        for index, col in enumerate(columns):
+            match = self._exact.get(str(col).lower().strip())
+            rank = 0
+            if match is None and self.fuzzy:
+                match = self._tokens.get(header_tokens(col))
+                rank = 1
+            if match is None:
+                continue
+            standard_name, position = match
+            order = (rank, position, index)
+            if standard_name not in best or order < best[standard_name][0]:
+                best[standard_name] = (order, col)
+
+        # Header order of the renamed columns
+        chosen = sorted(best.items(), key=lambda item: item[1][0][2])
+        return {col: standard_name for standard_name, (_, col) in chosen}
+
+
+def header_tokens(name) -> str:
+    """Order-insensitive token form of a header: 'Tax_Federal ($)' -> 'federal tax'"""
+    name = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', str(name))
+    return ' '.join(sorted(re.findall(r'[a-z0-9]+', name.lower())))
+
+
+@lru_cache(maxsize=64)
+def _compile(mappings_json: str, fuzzy: bool) -> HeaderResolver:
+    return HeaderResolver(json.loads(mappings_json), fuzzy)
+
+
+def header_resolver(field_mappings: Dict[str, List[str]], fuzzy: bool = True) -> HeaderResolver:
+    """
+    Shared compiled resolver for a set of field mappings
+
+    Auditors with equal mappings (every request of the API server, every pair
+    of a batch) reuse one resolver and its plan cache.
+    """
+    # Not sort_keys: the order of the mappings decides which one a shared synonym belongs to
+    return _compile(json.dumps(field_mappings, default=str), fuzzy)
+
+
+def map_columns(columns: Iterable, field_mappings: Dict[str, List[str]],
+                fuzzy: bool = True) -> Dict:
+    """Original column name -> standard name for every column the mappings recognize"""
+    return header_resolver(field_mappings, fuzzy).resolve(columns)
+
+
+def read_table(path, resolver: HeaderResolver, prune: bool = False,
+               extra_columns: Optional[List[str]] = None,
+               csv_engine: Optional[str] = None) -> pd.DataFrame:
+    """
+    Read a CSV or Excel file with dtypes pinned from its resolved header
+
+    Args:
+        path: CSV or Excel file, as a path or FileSource
+        resolver: Compiled field mappings (see header_resolver)
+        prune: Parse only mapped columns (plus extra_columns)
+        extra_columns: Unmapped columns to keep when pruning (case-insensitive)
+        csv_engine: 'pyarrow' to use the multithreaded pyarrow CSV parser
+
+    Returns:
+        DataFrame with the original column names (normalize_columns renames them)
+    """
+    excel = source_format(path) in ('xlsx', 'xls')
+    header = _read(path, excel, nrows=0).columns
+    mapping = resolver.resolve(header)
+
+    extras = {str(col).lower().strip() for col in extra_columns or []}
+    usecols = None
+    if prune:
+        usecols = [col for col in header
+                   if col in mapping or str(col).lower().strip() in extras]
+
+    dtypes = {col: FIELD_DTYPES[standard_name] for col, standard_name in mapping.items()
+              if standard_name in FIELD_DTYPES}
+
+    engine = 'pyarrow' if csv_engine == 'pyarrow' and PYARROW_CSV_SUPPORT and not excel else None
+    try:
+        return _read(path, excel, usecols=usecols, dtype=dtypes, engine=engine)
+    except (ValueError, TypeError):
+        # A pinned column holds values of another type ("N/A" hours, "$1,200" amounts):
+        # keep the pruning, infer dtypes as before
+        return _read(path, excel, usecols=usecols)
+
+
+def _read(path, excel: bool, engine: Optional[str] = None, **kwargs) -> pd.DataFrame:
+    if isinstance(path, FileSource):
+        # Rewound for every read: the header pass, then the parse
+        path = path.open()
+    if excel:
+        return pd.read_excel(path, engine='openpyxl', **kwargs)
+    if engine:
+        kwargs['engine'] = engine
+    return pd.read_csv(path, **kwargs)
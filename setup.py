@@ -5,7 +5,12 @@ setup(
     version="1.0.0",
     description="Universal tool for auditing payroll data files",
     author="Your Name",
-    py_modules=["universal_payroll_auditor"],
+    py_modules=["universal_payroll_auditor", "comparison_engine", "streaming_compare",
+                "parallel_compare", "value_normalizers", "field_statistics",
+                "file_cache", "pdf_ingest", "schema_ingest", "file_source",
+                "difference_table", "audit_result", "report_writers",
+                "columnar_export", "html_report", "excel_export", "audit_jobs", "content_store",
+                "audit_metrics", "production_server"],
     install_requires=[
         "pandas>=2.0.0",
         "numpy>=1.24.0",
@@ -13,7 +18,8 @@ setup(
     ],
     extras_require={
         "pdf": ["pdfplumber>=0.9.0"],
-        "api": ["flask>=2.0.0"],
+        "api": ["flask>=2.0.0", "gunicorn>=21.2.0"],
+        "cache": ["pyarrow>=12.0.0"],
     },
     entry_points={
         "console_scripts": [
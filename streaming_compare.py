@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Out-of-Core Streaming Comparison
+Compares CSV files larger than memory by hash-partitioning rows on the join key
+into on-disk spill files, then comparing one partition pair at a time
+"""
+
+import itertools
+import math
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Tuple, Union
+
+import pandas as pd
+
+from comparison_engine import Alignment, align_frames, merge_comparisons, resolve_key_columns
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Approximate size of a parsed frame relative to its CSV text, including the
+# copies made while aligning a partition pair
+MEMORY_EXPANSION = 6
+
+MIN_CHUNKSIZE = 1000
+
+
+def plan_streaming(file1: str, file2: str,
+                   memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB) -> Tuple[int, int]:
+    """
+    Size the chunked read and the partition count for a memory budget
+
+    Partitioning reads one chunk at a time and comparison loads one partition
+    pair at a time, so each phase gets the whole budget. A single key with a
+    very large number of rows can still overshoot it.
+
+    Returns:
+        (chunksize in rows, number of partitions)
+    """
+    budget = memory_budget_mb * 1024 * 1024
+    total_bytes = os.path.getsize(file1) + os.path.getsize(file2)
+    row_bytes = max(_estimate_row_bytes(file1), _estimate_row_bytes(file2))
+
+    chunksize = max(MIN_CHUNKSIZE, int(budget / (MEMORY_EXPANSION * row_bytes)))
+    partitions = max(1, math.ceil(total_bytes * MEMORY_EXPANSION / budget))
+    return chunksize, partitions
+
+
+def compare_csv_streaming(file1: str, file2: str,
+                          normalize: Union[Callable[[pd.DataFrame], pd.DataFrame],
+                                           Tuple[Callable[[pd.DataFrame], pd.DataFrame], ...]],
+                          compare: Callable[[Alignment, List[str]], Dict[str, Any]],
+                          key_columns: Any = None,
+                          memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+                          spill_dir: Optional[str] = None,
+                          limit: int = 100) -> Dict[str, Any]:
+    """
+    Compare two CSV files without loading either one fully into memory
+
+    Args:
+        file1: Path to first CSV file
+        file2: Path to second CSV file
+        normalize: Applied to every chunk (column renaming etc.), or a pair of
+            callables normalizing the chunks of file1 and file2 respectively
+        compare: Compares one Alignment over the given columns
+        key_columns: Configured join key, or None to auto-detect
+        memory_budget_mb: Approximate peak memory for parsed data
+        spill_dir: Directory for partition spill files (default: system temp)
+        limit: Maximum number of row differences to keep
+
+    Returns:
+        Dictionary with per-file row counts and columns, the merged comparison
+        data and the streaming plan
+    """
+    normalize1, normalize2 = normalize if isinstance(normalize, tuple) else (normalize, normalize)
+    columns1 = list(normalize1(pd.read_csv(file1, nrows=0)).columns)
+    columns2 = list(normalize2(pd.read_csv(file2, nrows=0)).columns)
+    common_cols = [col for col in columns1 if col in columns2]
+    chunksize, partitions = plan_streaming(file1, file2, memory_budget_mb)
+
+    result = {
+        'file1': {'rows': 0, 'columns': columns1},
+        'file2': {'rows': 0, 'columns': columns2},
+        'plan': {
+            'memory_budget_mb': memory_budget_mb,
+            'chunksize': chunksize,
+            'partitions': partitions
+        }
+    }
+
+    if not common_cols:
+        result['data'] = {'error': 'No common columns found for comparison'}
+        return result
+
+    keys = resolve_key_columns(common_cols, key_columns)
+    compare_cols = [col for col in common_cols if col not in keys]
+
+    if keys:
+        with tempfile.TemporaryDirectory(prefix='payroll_spill_', dir=spill_dir) as tmpdir:
+            pieces1, result['file1']['rows'] = _partition_csv(
+                file1, normalize1, keys, partitions, chunksize, Path(tmpdir) / 'file1')
+            pieces2, result['file2']['rows'] = _partition_csv(
+                file2, normalize2, keys, partitions, chunksize, Path(tmpdir) / 'file2')
+
+            merged = merge_comparisons([], limit)
+            for part in range(partitions):
+                df1 = _read_partition(pieces1.get(part, []), columns1, keys)
+                df2 = _read_partition(pieces2.get(part, []), columns2, keys)
+                if df1.empty and df2.empty:
+                    continue
+                alignment = align_frames(df1, df2, keys)
+                merged = merge_comparisons([merged, compare(alignment, compare_cols)], limit)
+                del df1, df2, alignment
+    else:
+        # No key: rows pair by position, so both files can be read in lockstep
+        merged = merge_comparisons([], limit)
+        readers = zip(
+            itertools.chain(pd.read_csv(file1, chunksize=chunksize), itertools.repeat(None)),
+            itertools.chain(pd.read_csv(file2, chunksize=chunksize), itertools.repeat(None))
+        )
+        for chunk1, chunk2 in readers:
+            if chunk1 is None and chunk2 is None:
+                break
+            chunk1 = normalize1(chunk1) if chunk1 is not None else pd.DataFrame(columns=columns1)
+            chunk2 = normalize2(chunk2) if chunk2 is not None else pd.DataFrame(columns=columns2)
+            result['file1']['rows'] += len(chunk1)
+            result['file2']['rows'] += len(chunk2)
+
+            alignment = align_frames(chunk1, chunk2)
+            merged = merge_comparisons([merged, compare(alignment, compare_cols)], limit)
+
+    merged.pop('_order', None)
+    result['data'] = {
+        'identifier_column': ', '.join(keys) or None,
+        'key_columns': keys,
+        **merged
+    }
+    return result
+
+
+def partition_ids(keys: pd.DataFrame, partitions: int) -> pd.Series:
+    """
+    Stable partition number for every row, hashed on its key columns
+
+    Keys hash as their key_text, so the same key lands in the same partition
+    whatever dtype pandas inferred for the chunk it was read in (1001, 1001.0
+    and "1001" alike).
+    """
+    hashable = pd.DataFrame({col: key_text(keys[col]) for col in keys.columns})
+    hashes = pd.util.hash_pandas_object(hashable, index=False).to_numpy()
+    return pd.Series(hashes % partitions, index=keys.index)
+
+
+def key_text(values: pd.Series) -> pd.Series:
+    """Key values as text, integral numbers without a decimal part (1001.0 -> "1001")"""
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values.astype(str)
+    numbers = values.astype('float64')
+    text = numbers.astype(str)
+    integral = (numbers % 1 == 0) & (numbers.abs() < 2 ** 53)
+    text[integral] = numbers[integral].astype('int64').astype(str)
+    return text
+
+
+def _partition_csv(path: str, normalize: Callable[[pd.DataFrame], pd.DataFrame],
+                   key_columns: List[str], partitions: int, chunksize: int,
+                   spill_dir: Path) -> Tuple[Dict[int, List[Path]], int]:
+    """Spill a CSV into per-partition pickle files, one piece per chunk"""
+    spill_dir.mkdir(parents=True, exist_ok=True)
+    pieces = {}
+    rows = 0
+
+    for chunk_no, chunk in enumerate(pd.read_csv(path, chunksize=chunksize)):
+        chunk = normalize(chunk)
+        rows += len(chunk)
+        for part, piece in chunk.groupby(partition_ids(chunk[key_columns], partitions), sort=False):
+            piece_path = spill_dir / f"p{part:05d}_c{chunk_no:06d}.pkl"
+            piece.to_pickle(piece_path)
+            pieces.setdefault(int(part), []).append(piece_path)
+
+    return pieces, rows
+
+
+def _read_partition(paths: List[Path], columns: List[str], key_columns: List[str]) -> pd.DataFrame:
+    """
+    Load one partition in file order, keeping original row numbers as the index
+
+    A key column read as numbers in some chunks and as text in others is
+    turned into text throughout, as pandas reads it from the whole file.
+    """
+    if not paths:
+        return pd.DataFrame(columns=columns)
+    pieces = [pd.read_pickle(path) for path in paths]
+    for col in key_columns:
+        if len({pd.api.types.is_numeric_dtype(piece[col]) for piece in pieces}) > 1:
+            for piece in pieces:
+                piece[col] = key_text(piece[col])
+    return pd.concat(pieces)
+
+
+def _estimate_row_bytes(path: str, sample_bytes: int = 1024 * 1024) -> float:
+    """Average CSV line length from the start of the file"""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    lines = max(1, sample.count(b'\n'))
+    return max(1.0, len(sample) / lines)
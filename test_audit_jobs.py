@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the asynchronous audit job queue
+Run with pytest, or directly: python test_audit_jobs.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+sys.path.append('.')
+
+import pandas as pd
+
+from audit_jobs import AuditJobQueue, FINISHED, SUCCEEDED
+from parallel_compare import MIN_SHARD_ROWS
+
+ROWS = 2 * MIN_SHARD_ROWS + 1
+
+
+def write_pair(tmpdir):
+    frame = pd.DataFrame({
+        'employee_id': range(1000, 1000 + ROWS),
+        'hours': [40 + i % 7 for i in range(ROWS)]
+    })
+    paths = [os.path.join(tmpdir, 'file1.csv'), os.path.join(tmpdir, 'file2.csv')]
+    frame.to_csv(paths[0], index=False)
+    frame.loc[5, 'hours'] = 99
+    frame.to_csv(paths[1], index=False)
+    return paths
+
+
+def wait_for(queue, job_id, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in FINISHED:
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_can_start_worker_processes():
+    # workers > 1 shards the comparison over a process pool inside the job process
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = write_pair(tmpdir)
+        queue = AuditJobQueue(workers=1)
+        try:
+            job = queue.submit(*paths, config={'cache': False, 'key_columns': 'employee_id',
+                                               'workers': 2})
+            job = wait_for(queue, job['id'])
+        finally:
+            queue.shutdown(cancel_queued=True)
+        assert job['status'] == SUCCEEDED, job['error']
+        assert job['result']['summary']['rows_with_differences'] == 1
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for lazily computed audit results
+Run with pytest, or directly: python test_audit_result.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+sys.path.append('.')
+
+import pandas as pd
+
+from report_writers import dumps
+from universal_payroll_auditor import UniversalPayrollAuditor
+
+
+def write_pair(tmpdir):
+    frame = pd.DataFrame({'employee_id': [1, 2, 3], 'hours': [40, 38, 40]})
+    paths = [os.path.join(tmpdir, 'file1.csv'), os.path.join(tmpdir, 'file2.csv')]
+    frame.to_csv(paths[0], index=False)
+    frame.assign(hours=[40, 39, 40]).to_csv(paths[1], index=False)
+    return paths
+
+
+def test_lazy_result_serializes_every_section():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = write_pair(tmpdir)
+        eager = json.loads(dumps(UniversalPayrollAuditor({'cache': False}).audit(*paths)))
+        lazy = UniversalPayrollAuditor({'cache': False}).audit(*paths, lazy=True)
+        assert json.loads(dumps(lazy)) == eager
+        assert list(json.loads(dumps(lazy))) == ['metadata', 'structure', 'data', 'summary']
+
+        from api_server import app
+        from flask import jsonify
+        lazy = UniversalPayrollAuditor({'cache': False}).audit(*paths, lazy=True)
+        with app.app_context():
+            assert json.loads(jsonify(lazy).get_data()) == eager
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
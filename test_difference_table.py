@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for difference reporting in difference_table
+Run with pytest, or directly: python test_difference_table.py
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append('.')
+
+import numpy as np
+import pandas as pd
+
+from difference_table import _concat_values, _report_list
+from universal_payroll_auditor import UniversalPayrollAuditor
+
+
+def write_pair(tmpdir):
+    """Medicare amounts with a missing value in each file"""
+    frame = pd.DataFrame({
+        'employee_id': [1, 2, 3, 4],
+        'medicare': [28.83, None, 45.84, 10.00],
+        'hours': [40, 40, 40, 40]
+    })
+    paths = [os.path.join(tmpdir, 'file1.csv'), os.path.join(tmpdir, 'file2.csv')]
+    frame.to_csv(paths[0], index=False)
+    frame.assign(medicare=[11.82, 5.00, None, 10.00]).to_csv(paths[1], index=False)
+    return paths
+
+
+def test_money_with_missing_values_reported_in_dollars():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        auditor = UniversalPayrollAuditor({'cache': False, 'key_columns': 'employee_id'})
+        result = auditor.audit(*write_pair(tmpdir))
+        cells = {d['identifier']: d['fields']['medicare'] for d in result['data']['differences']}
+        assert cells[1] == {'file1': 28.83, 'file2': 11.82, 'difference': -17.01}
+        assert pd.isna(cells[2]['file1']) and cells[2]['file2'] == 5.0
+        assert cells[3]['file1'] == 45.84 and pd.isna(cells[3]['file2'])
+        frame = auditor.get_differences_frame().set_index('identifier')
+        assert frame.loc[1, 'file1'] == 28.83
+        assert frame.loc[3, 'file1'] == 45.84
+
+
+def test_concat_of_integer_and_float_cents():
+    values, scale = _concat_values([(np.array([2883]), 100), (np.array([4584.0, np.nan]), 100)])
+    assert values.dtype == np.float64
+    assert _report_list(values, scale)[:2] == [28.83, 45.84]
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
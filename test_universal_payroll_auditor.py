@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for UniversalPayrollAuditor configuration handling
+Run with pytest, or directly: python test_universal_payroll_auditor.py
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append('.')
+
+import pandas as pd
+
+from universal_payroll_auditor import UniversalPayrollAuditor
+
+
+def write_pair(tmpdir):
+    frame = pd.DataFrame({
+        'employee_id': [101, 102, 103, 104],
+        'employee_name': ['Ann', 'Bob', 'Cy', 'Di'],
+        'department': ['A', 'B', 'A', 'B'],
+        'hours': [40, 38, 40, 12]
+    })
+    paths = [os.path.join(tmpdir, 'file1.csv'), os.path.join(tmpdir, 'file2.csv')]
+    frame.to_csv(paths[0], index=False)
+    frame.assign(hours=[40, 39, 40, 12]).to_csv(paths[1], index=False)
+    return paths
+
+
+def test_workers_argument_applies_to_one_call():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = write_pair(tmpdir)
+        auditor = UniversalPayrollAuditor({'cache': False})
+        parallel = auditor.audit(*paths, workers=2)
+        assert 'workers' not in auditor.config
+        auditor.audit(*paths, workers=2, lazy=True)['summary']
+        assert 'workers' not in auditor.config
+        assert auditor.audit(*paths)['summary'] == parallel['summary']
+
+
+def test_pruned_read_keeps_key_columns():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = write_pair(tmpdir)
+        for key_columns in (['employee_id'], 'employee_id'):
+            config = {'cache': False, 'prune_columns': True, 'key_columns': key_columns}
+            result = UniversalPayrollAuditor(config).audit(*paths)
+            assert result['data']['key_columns'] == ['employee_id']
+            assert result['summary']['rows_with_differences'] == 1
+        # Default key columns are kept too; other unmapped columns are still pruned
+        pruned = UniversalPayrollAuditor({'cache': False, 'prune_columns': True}).load_file(paths[0])
+        assert 'employee_id' in pruned.columns
+        assert 'department' not in pruned.columns
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for pay date parsing in value_normalizers
+Run with pytest, or directly: python test_value_normalizers.py
+"""
+
+import sys
+sys.path.append('.')
+
+import pandas as pd
+
+from value_normalizers import coerce_date_columns, parse_dates
+
+AMBIGUOUS = ['01/02/2024', '03/04/2024']
+
+
+def test_dates_do_not_depend_on_earlier_columns():
+    before, _ = parse_dates(pd.Series(AMBIGUOUS))
+    parse_dates(pd.Series(['25/01/2024']))  # day-first layout seen by an earlier file
+    after, _ = parse_dates(pd.Series(AMBIGUOUS))
+    assert list(after) == list(before)
+    assert list(after) == [pd.Timestamp('2024-01-02'), pd.Timestamp('2024-03-04')]
+
+
+def test_format_chosen_from_column_values():
+    dates, failed = parse_dates(pd.Series(['25/01/2024', '01/02/2024']))
+    assert failed == 0
+    assert list(dates) == [pd.Timestamp('2024-01-25'), pd.Timestamp('2024-02-01')]
+
+
+def test_formats_carried_across_chunks_of_one_file():
+    formats = {}
+    coerce_date_columns(pd.DataFrame({'pay_date': ['25/01/2024']}), formats=formats)
+    chunk = pd.DataFrame({'pay_date': AMBIGUOUS})
+    coerce_date_columns(chunk, formats=formats)
+    assert list(chunk['pay_date']) == [pd.Timestamp('2024-02-01'), pd.Timestamp('2024-04-03')]
+
+
+def test_mixed_layouts_in_one_column():
+    dates, failed = parse_dates(pd.Series(['01/15/2026', '2026-01-15', 'N/A', 'soon']))
+    assert failed == 1
+    assert list(dates[:2]) == [pd.Timestamp('2026-01-15')] * 2
+    assert dates[2:].isna().all()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -9,8 +9,45 @@ import numpy as np
 from pathlib import Path
 import json
 from datetime import datetime
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Dict, List, Tuple, Any, Optional, Callable
+from contextlib import contextmanager
+import io
 import sys
+import copy
+import heapq
+import time
+
+from audit_result import AuditResult
+from difference_table import DifferenceTable
+from comparison_engine import (
+    align_frames, compare_aligned, rank_key, resolve_key_columns, Alignment,
+    ENGINES, DEFAULT_ENGINE, RANKINGS, DEFAULT_RANKING, DEFAULT_KEY_COLUMNS
+)
+from streaming_compare import compare_csv_streaming, DEFAULT_MEMORY_BUDGET_MB
+from parallel_compare import compare_parallel
+from value_normalizers import (
+    coerce_date_columns, coerce_numeric_columns, convert_money_columns, dollar_view, money_columns,
+    NUMERIC_FIELDS
+)
+from field_statistics import (
+    accumulate_day_shifts, accumulate_row, summarize_day_shifts, summarize_field_stats
+)
+from file_cache import ParsedFileCache, cache_enabled, default_cache
+from pdf_ingest import load_pdf
+from report_writers import write_report
+from columnar_export import write_columnar, COLUMNAR_FORMATS
+from html_report import write_html_report
+from excel_export import write_excel_report
+from schema_ingest import header_resolver, read_table
+from file_source import FileSource, source_format, source_name
+
+# Differences materialized as dictionaries in the results
+DISPLAY_DIFFERENCES = 100
+
+# Called with {stage: seconds} after every completed compare_files (see audit_metrics).
+# Stages: 'load', 'normalize', 'compare' and 'summarize'; a streaming comparison
+# reads, normalizes and compares partition by partition and reports it all as 'compare'
+STAGE_HOOKS: List[Callable[[Dict[str, float]], None]] = []
 
 class UniversalPayrollAuditor:
     """
@@ -43,7 +80,16 @@ class UniversalPayrollAuditor:
         Initialize with optional configuration
         
         Args:
-            config: Optional configuration dict with custom field mappings, tolerance, etc.
+            config: Optional configuration dict with custom field mappings, tolerance,
+                comparison engine ('vectorized' or 'rowwise'), key columns,
+                streaming mode and memory budget, worker processes, monetary
+                field patterns ('money_fields'), difference ranking ('rank_by',
+                'field_priority'), the row fingerprint fast path ('fingerprint'),
+                the parsed-file cache ('cache', 'cache_dir'), PDF extraction
+                processes ('pdf_workers'), mapped-column-only ingest
+                ('prune_columns', 'extra_columns', 'csv_engine'), token-based
+                header matching ('fuzzy_headers'), the number of ranked
+                differences kept for export ('max_differences'), etc.
         """
         self.config = config or {}
         self.file1_data = None
@@ -51,56 +97,139 @@ class UniversalPayrollAuditor:
         self.file1_path = None
         self.file2_path = None
         self.comparison_results = {}
+        self.difference_table = None
+        self.stage_timings: Dict[str, float] = {}
         
-        # Allow custom field mappings
+        # Allow custom field mappings (per instance; the class defaults stay untouched)
         if 'field_mappings' in self.config:
-            self.FIELD_MAPPINGS.update(self.config['field_mappings'])
+            self.FIELD_MAPPINGS = {**self.FIELD_MAPPINGS, **self.config['field_mappings']}
+        self.header_resolver = header_resolver(self.FIELD_MAPPINGS,
+                                               self.config.get('fuzzy_headers', True))
+        
+        # Parsed-file cache, shared with other auditors unless a directory is given
+        self.cache = None
+        if self.config.get('cache', True) and cache_enabled():
+            cache_dir = self.config.get('cache_dir')
+            self.cache = ParsedFileCache(cache_dir) if cache_dir else default_cache()
     
-    def load_file(self, filepath: str) -> pd.DataFrame:
-        """Load CSV, Excel, or PDF file"""
-        path = Path(filepath)
-        if not path.exists():
+    def load_file(self, filepath) -> pd.DataFrame:
+        """Load CSV, Excel, or PDF file from a path or a FileSource (bytes or a file object)"""
+        path = filepath if isinstance(filepath, FileSource) else Path(filepath)
+        if not isinstance(path, FileSource) and not path.exists():
             raise FileNotFoundError(f"File not found: {filepath}")
         
-        ext = path.suffix.lower()
-        if ext == '.csv':
-            return pd.read_csv(path)
-        elif ext in ['.xlsx', '.xls']:
-            return pd.read_excel(path, engine='openpyxl')
-        elif ext == '.pdf':
-            import pdfplumber
-            with pdfplumber.open(path) as pdf:
-                tables = []
-                for page in pdf.pages:
-                    tables.extend(page.extract_tables())
-                if tables:
-                    return pd.DataFrame(tables[0][1:], columns=tables[0][0])
-        raise ValueError(f"Unsupported file type: {ext}")
+        ext = source_format(path)
+        if ext in ['csv', 'xlsx', 'xls']:
+            # Header first, then parse with pinned dtypes (only mapped columns when pruning)
+            return read_table(
+                path,
+                self.header_resolver,
+                prune=self.config.get('prune_columns', False),
+                extra_columns=self._kept_columns(),
+                csv_engine=self.config.get('csv_engine')
+            )
+        elif ext == 'pdf':
+            # Pages extracted in parallel and cached per page; tables stitched across pages
+            if isinstance(path, FileSource):
+                # The extraction processes open the PDF by path
+                with path.as_path() as pdf_path:
+                    return load_pdf(pdf_path, workers=self.config.get('pdf_workers'), cache=self.cache)
+            return load_pdf(str(path), workers=self.config.get('pdf_workers'), cache=self.cache)
+        raise ValueError(f"Unsupported file type: .{ext}")
+    
+    def _kept_columns(self) -> List[str]:
+        """Unmapped columns a pruned read keeps: extra_columns and any join key column"""
+        keys = self.config.get('key_columns') or []
+        if isinstance(keys, str):
+            keys = [keys]
+        return list(self.config.get('extra_columns') or []) + list(keys) + DEFAULT_KEY_COLUMNS
     
     def normalize_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Normalize column names to standard format"""
-        df = df.copy()
-        column_mapping = {}
-        
-        for col in df.columns:
-            col_lower = str(col).lower().strip()
-            for standard_name, variations in self.FIELD_MAPPINGS.items():
-                if col_lower in variations:
-                    column_mapping[col] = standard_name
-                    break
-        
-        if column_mapping:
-            df = df.rename(columns=column_mapping)
+        # rename() returns a new frame, so the caller's columns are never touched
+        return df.rename(columns=self.header_resolver.resolve(df.columns))
+    
+    def normalize_values(self, df: pd.DataFrame,
+                         date_formats: Optional[Dict[str, Dict[str, str]]] = None) -> pd.DataFrame:
+        """
+        Normalize values of a frame whose columns are already normalized
+        
+        Amounts read as text ("$1,234.56", "(12.00)") and pay dates in any
+        detected format are parsed first; cells that do not parse are left
+        missing and counted per column in df.attrs['coercion_failures']. Numeric monetary columns then become
+        exact int64 cents. Modifies df in place.
+        
+        Args:
+            df: Frame with normalized column names
+            date_formats: Date formats detected on earlier chunks of the same
+                file, so a streamed file parses its dates consistently
+                (default: detected from this frame alone)
+        """
+        failures = coerce_numeric_columns(df, NUMERIC_FIELDS + list(self.config.get('money_fields') or []))
+        failures.update(coerce_date_columns(df, formats=date_formats))
+        if failures:
+            df.attrs['coercion_failures'] = failures
+        return convert_money_columns(df, self.config.get('money_fields'))
+    
+    def _normalize(self, df: pd.DataFrame,
+                   date_formats: Optional[Dict[str, Dict[str, str]]] = None) -> pd.DataFrame:
+        return self.normalize_values(self.normalize_columns(df), date_formats)
+    
+    def _load_normalized(self, filepath: str, verbose: bool = False) -> pd.DataFrame:
+        """Load and normalize a file, reusing the cached result for identical content"""
+        def load():
+            with self._stage('load'):
+                df = self.load_file(filepath)
+            with self._stage('normalize'):
+                return self._normalize(df)
+        
+        if self.cache is None:
+            return load()
+        if not isinstance(filepath, FileSource) and not Path(filepath).exists():
+            raise FileNotFoundError(f"File not found: {filepath}")
+        start = time.perf_counter()
+        df, cached = self.cache.load(filepath, load, self._cache_namespace())
+        if cached:
+            # Reading the cached frame replaces both parsing and normalizing
+            self._add_stage_time('load', time.perf_counter() - start)
+            if verbose:
+                print(f"  Using cached parse of {source_name(filepath)}")
         return df
     
-    def compare_files(self, file1: str, file2: str, verbose: bool = True) -> Dict[str, Any]:
+    @contextmanager
+    def _stage(self, name: str):
+        """Add the time spent in the block to stage_timings[name]"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_stage_time(name, time.perf_counter() - start)
+    
+    def _add_stage_time(self, name: str, seconds: float):
+        self.stage_timings[name] = self.stage_timings.get(name, 0.0) + seconds
+    
+    def _report_stages(self):
+        """Pass the stage timings of the finished comparison to the STAGE_HOOKS"""
+        for hook in STAGE_HOOKS:
+            hook(dict(self.stage_timings))
+    
+    def _cache_namespace(self) -> str:
+        # Everything that changes the normalized frame for the same file content
+        return json.dumps(['universal', self.FIELD_MAPPINGS, self.config.get('money_fields'),
+                           self.config.get('prune_columns', False), self._kept_columns(),
+                           self.config.get('csv_engine'), self.config.get('fuzzy_headers', True)],
+                          sort_keys=True, default=str)
+    
+    def compare_files(self, file1: str, file2: str, verbose: bool = True,
+                      workers: Optional[int] = None) -> Dict[str, Any]:
         """
         Compare two payroll files
         
         Args:
-            file1: Path to first file
-            file2: Path to second file
+            file1: Path to first file, or a FileSource (bytes or an open file)
+            file2: Path to second file, or a FileSource
             verbose: Print progress messages
+            workers: Worker processes for the comparison (default: config 'workers' or 1)
             
         Returns:
             Dictionary with comparison results
@@ -110,60 +239,136 @@ class UniversalPayrollAuditor:
             print("PAYROLL AUDIT COMPARISON")
             print(f"{'='*80}\n")
         
-        # Load files
-        if verbose:
-            print("Loading files...")
         self.file1_path = file1
         self.file2_path = file2
-        self.file1_data = self.load_file(file1)
-        self.file2_data = self.load_file(file2)
+        self.stage_timings = {}
+        
+        if self.config.get('streaming') and self._is_csv(file1) and self._is_csv(file2):
+            return self._compare_files_streaming(file1, file2, verbose)
         
-        # Normalize columns
+        # Load and normalize files
+        if verbose:
+            print("Loading files...")
+        self.file1_data = self._load_normalized(file1, verbose)
+        self.file2_data = self._load_normalized(file2, verbose)
         if verbose:
-            print("Normalizing column names...")
-        self.file1_data = self.normalize_columns(self.file1_data)
-        self.file2_data = self.normalize_columns(self.file2_data)
+            for path, df in ((file1, self.file1_data), (file2, self.file2_data)):
+                for col, count in df.attrs.get('coercion_failures', {}).items():
+                    print(f"  ⚠ {source_name(path)}: {count} unparseable value(s) in '{col}'")
         
         # Perform comparison
         if verbose:
             print("Performing comparison...")
         
+        with self._stage('compare'):
+            results = {
+                'metadata': self._compare_metadata(),
+                'structure': self._compare_structure(),
+                'data': self._compare_data(workers),
+                'summary': {}
+            }
+        
+        with self._stage('summarize'):
+            results['summary'] = self._generate_summary(results)
+        self.comparison_results = results
+        self._report_stages()
+        
+        if verbose:
+            print(f"\n✓ Comparison complete!")
+            print(f"  Match rate: {results['summary']['match_rate']:.2f}%")
+            print(f"  Differences: {results['summary']['rows_with_differences']}")
+        
+        return results
+    
+    def _compare_files_streaming(self, file1: str, file2: str, verbose: bool) -> Dict[str, Any]:
+        """Compare two CSV files out-of-core, partition by partition"""
+        budget = self.config.get('memory_budget_mb', DEFAULT_MEMORY_BUDGET_MB)
+        if verbose:
+            print(f"Streaming comparison (memory budget {budget} MB)...")
+        
+        # Nothing is kept in memory between partitions
+        self.file1_data = None
+        self.file2_data = None
+        
+        # Each file's later chunks reuse the date formats detected on its earlier ones
+        formats1, formats2 = {}, {}
+        normalize = (lambda df: self._normalize(df, formats1),
+                     lambda df: self._normalize(df, formats2))
+        
+        with self._stage('compare'):
+            streamed = compare_csv_streaming(
+                file1,
+                file2,
+                normalize,
+                self._compare_alignment,
+                key_columns=self.config.get('key_columns'),
+                memory_budget_mb=budget,
+                spill_dir=self.config.get('spill_dir'),
+                limit=self._max_differences()
+            )
+            streamed['data']['differences'] = self._keep_differences(streamed['data']['differences'])
+        
+        cols1 = streamed['file1']['columns']
+        cols2 = streamed['file2']['columns']
         results = {
-            'metadata': self._compare_metadata(),
-            'structure': self._compare_structure(),
-            'data': self._compare_data(),
+            'metadata': {
+                'file1': {
+                    'name': Path(file1).name,
+                    'rows': streamed['file1']['rows'],
+                    'columns': len(cols1)
+                },
+                'file2': {
+                    'name': Path(file2).name,
+                    'rows': streamed['file2']['rows'],
+                    'columns': len(cols2)
+                },
+                'streaming': streamed['plan']
+            },
+            'structure': self._compare_structure(cols1, cols2),
+            'data': streamed['data'],
             'summary': {}
         }
         
-        results['summary'] = self._generate_summary(results)
+        with self._stage('summarize'):
+            results['summary'] = self._generate_summary(results)
         self.comparison_results = results
+        self._report_stages()
         
         if verbose:
             print(f"\n✓ Comparison complete!")
+            print(f"  Partitions: {streamed['plan']['partitions']}")
             print(f"  Match rate: {results['summary']['match_rate']:.2f}%")
             print(f"  Differences: {results['summary']['rows_with_differences']}")
         
         return results
     
+    @staticmethod
+    def _is_csv(filepath) -> bool:
+        # Streaming re-reads partitions from disk, so in-memory sources never stream
+        return not isinstance(filepath, FileSource) and source_format(filepath) == 'csv'
+    
     def _compare_metadata(self) -> Dict[str, Any]:
         """Compare file metadata"""
         return {
             'file1': {
-                'name': Path(self.file1_path).name,
+                'name': source_name(self.file1_path),
                 'rows': len(self.file1_data),
-                'columns': len(self.file1_data.columns)
+                'columns': len(self.file1_data.columns),
+                'coercion_failures': self.file1_data.attrs.get('coercion_failures', {})
             },
             'file2': {
-                'name': Path(self.file2_path).name,
+                'name': source_name(self.file2_path),
                 'rows': len(self.file2_data),
-                'columns': len(self.file2_data.columns)
+                'columns': len(self.file2_data.columns),
+                'coercion_failures': self.file2_data.attrs.get('coercion_failures', {})
             }
         }
     
-    def _compare_structure(self) -> Dict[str, Any]:
+    def _compare_structure(self, columns1: Optional[List[str]] = None,
+                           columns2: Optional[List[str]] = None) -> Dict[str, Any]:
         """Compare file structure"""
-        cols1 = set(self.file1_data.columns)
-        cols2 = set(self.file2_data.columns)
+        cols1 = set(self.file1_data.columns if columns1 is None else columns1)
+        cols2 = set(self.file2_data.columns if columns2 is None else columns2)
         
         return {
             'file1_columns': list(cols1),
@@ -173,58 +378,135 @@ class UniversalPayrollAuditor:
             'only_in_file2': list(cols2 - cols1)
         }
     
-    def _compare_data(self) -> Dict[str, Any]:
-        """Compare data line-by-line"""
+    def _compare_data(self, workers: Optional[int] = None) -> Dict[str, Any]:
+        """Compare data line-by-line (workers: processes for this call, default config 'workers' or 1)"""
         common_cols = list(set(self.file1_data.columns) & set(self.file2_data.columns))
         
         if not common_cols:
             return {'error': 'No common columns found for comparison'}
         
-        # Find identifier column
-        id_col = None
-        for col in ['employee', 'employee_id', 'id']:
-            if col in common_cols:
-                id_col = col
-                break
-        
-        differences = []
-        matched_rows = 0
+        # Find identifier column(s); duplicates are paired by occurrence number
+        key_columns = resolve_key_columns(common_cols, self.config.get('key_columns'))
+        compare_cols = [col for col in common_cols if col not in key_columns]
+        
+        workers = workers if workers is not None else self.config.get('workers', 1)
+        if workers > 1 and self.config.get('engine', DEFAULT_ENGINE) == 'vectorized':
+            # Shard by key hash across processes; merged output matches a serial run
+            comparison = compare_parallel(
+                self.file1_data,
+                self.file2_data,
+                compare_cols,
+                key_columns,
+                workers,
+                tolerance=self.config.get('numeric_tolerance', 0.01),
+                limit=self._max_differences(),
+                money_columns=self._money_columns(compare_cols),
+                rank_by=self.config.get('rank_by', DEFAULT_RANKING),
+                field_priority=self.config.get('field_priority'),
+                fingerprint=self.config.get('fingerprint', True)
+            )
+        else:
+            alignment = align_frames(self.file1_data, self.file2_data, key_columns)
+            comparison = self._compare_alignment(alignment, compare_cols)
+        comparison.pop('_order', None)
         
-        if id_col:
-            df1_indexed = self.file1_data.set_index(id_col)
-            df2_indexed = self.file2_data.set_index(id_col)
-            common_ids = set(df1_indexed.index) & set(df2_indexed.index)
-            
-            for emp_id in common_ids:
-                row_diffs = self._compare_rows(
-                    df1_indexed.loc[emp_id], 
-                    df2_indexed.loc[emp_id], 
-                    common_cols, 
-                    emp_id
-                )
-                if row_diffs:
-                    differences.append(row_diffs)
-                else:
-                    matched_rows += 1
+        return {
+            'identifier_column': ', '.join(key_columns) or None,
+            'key_columns': key_columns,
+            **comparison,
+            'differences': self._keep_differences(comparison['differences'])
+        }
+    
+    def _unmatched_rows(self) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, List[str]]]:
+        """Rows found in only one of the loaded files (money in dollars) and the key columns"""
+        if self.file1_data is None or self.file2_data is None:
+            return None  # streamed: partitions are not kept
+        common_cols = list(set(self.file1_data.columns) & set(self.file2_data.columns))
+        keys = resolve_key_columns(common_cols, self.config.get('key_columns'))
+        alignment = align_frames(self.file1_data, self.file2_data, keys)
+        money = self._money_columns(common_cols)
+        return (dollar_view(alignment.only_file1, money),
+                dollar_view(alignment.only_file2, money), keys)
+    
+    def _keep_differences(self, table: DifferenceTable) -> List[Dict[str, Any]]:
+        """Keep the full table for export; only the shown entries become dictionaries"""
+        self.difference_table = table
+        return table.records(DISPLAY_DIFFERENCES)
+    
+    def _max_differences(self) -> int:
+        return max(self.config.get('max_differences', DISPLAY_DIFFERENCES), DISPLAY_DIFFERENCES)
+    
+    def _compare_alignment(self, alignment: Alignment, columns: List[str]) -> Dict[str, Any]:
+        """Compare aligned rows with the configured engine"""
+        engine = self.config.get('engine', DEFAULT_ENGINE)
+        if engine not in ENGINES:
+            raise ValueError(f"Unsupported engine: {engine}")
+        
+        if engine == 'vectorized':
+            comparison = compare_aligned(
+                alignment,
+                columns,
+                tolerance=self.config.get('numeric_tolerance', 0.01),
+                limit=self._max_differences(),
+                money_columns=self._money_columns(columns),
+                rank_by=self.config.get('rank_by', DEFAULT_RANKING),
+                field_priority=self.config.get('field_priority'),
+                fingerprint=self.config.get('fingerprint', True)
+            )
         else:
-            max_rows = min(len(self.file1_data), len(self.file2_data))
-            for idx in range(max_rows):
+            comparison = self._compare_data_rowwise(alignment, columns, self._max_differences())
+        
+        return {**comparison, **alignment.report()}
+    
+    def _money_columns(self, columns: List[str]) -> List[str]:
+        return money_columns(columns, self.config.get('money_fields'))
+    
+    def _compare_data_rowwise(self, alignment: Alignment, columns: List[str],
+                              limit: int = 100) -> Dict[str, Any]:
+        """
+        Compare aligned data one row at a time (original engine)
+        
+        Keeps the limit top-ranked differences in a bounded heap while
+        streaming through the rows.
+        """
+        rank_by = self.config.get('rank_by', DEFAULT_RANKING)
+        if rank_by not in RANKINGS:
+            raise ValueError(f"Unsupported ranking: {rank_by}")
+        field_priority = self.config.get('field_priority')
+        field_stats = {}
+        date_shifts = {}
+        counts = {'total_differences': 0, 'matched_rows': 0}
+        money = set(self._money_columns(columns))
+        
+        # The original engine works on float dollars
+        left = dollar_view(alignment.left, money)
+        right = dollar_view(alignment.right, money)
+        
+        def ranked_differences():
+            for pos in range(len(alignment)):
                 row_diffs = self._compare_rows(
-                    self.file1_data.iloc[idx],
-                    self.file2_data.iloc[idx],
-                    common_cols,
-                    f"Row {idx}"
+                    left.iloc[pos],
+                    right.iloc[pos],
+                    columns,
+                    alignment.label(pos)
                 )
                 if row_diffs:
-                    differences.append(row_diffs)
+                    counts['total_differences'] += 1
+                    accumulate_row(field_stats, row_diffs['fields'], money)
+                    accumulate_day_shifts(date_shifts, row_diffs['fields'])
+                    row = int(alignment.rows1[pos])
+                    yield rank_key(row_diffs['fields'], row, rank_by, field_priority), row_diffs
                 else:
-                    matched_rows += 1
+                    counts['matched_rows'] += 1
+        
+        kept = heapq.nsmallest(limit, ranked_differences(), key=lambda pair: pair[0])
         
         return {
-            'identifier_column': id_col,
-            'total_differences': len(differences),
-            'matched_rows': matched_rows,
-            'differences': differences[:100]
+            **counts,
+            'differences': DifferenceTable.from_records([diff for _, diff in kept]),
+            '_order': [key for key, _ in kept],
+            '_field_stats': field_stats,
+            '_date_shifts': date_shifts
         }
     
     def _compare_rows(self, row1: pd.Series, row2: pd.Series, 
@@ -243,7 +525,15 @@ class UniversalPayrollAuditor:
                 continue
             
             try:
-                if isinstance(val1, (int, float)) and isinstance(val2, (int, float)):
+                if isinstance(val1, pd.Timestamp) and isinstance(val2, pd.Timestamp):
+                    if val1 != val2:
+                        days = (val2 - val1) / pd.Timedelta(days=1)
+                        diffs[col] = {
+                            'file1': val1,
+                            'file2': val2,
+                            'days': int(days) if days.is_integer() else days
+                        }
+                elif isinstance(val1, (int, float)) and isinstance(val2, (int, float)):
                     if abs(float(val1) - float(val2)) > tolerance:
                         diffs[col] = {
                             'file1': val1,
@@ -262,24 +552,9 @@ class UniversalPayrollAuditor:
     def _generate_summary(self, results: Dict[str, Any]) -> Dict[str, Any]:
         """Generate summary statistics"""
         data_results = results['data']
-        field_stats = {}
         
-        if 'differences' in data_results:
-            for diff in data_results['differences']:
-                for field, values in diff.get('fields', {}).items():
-                    if field not in field_stats:
-                        field_stats[field] = {'count': 0, 'numeric_diffs': []}
-                    
-                    field_stats[field]['count'] += 1
-                    if 'difference' in values:
-                        field_stats[field]['numeric_diffs'].append(values['difference'])
-        
-        for field, stats in field_stats.items():
-            if stats['numeric_diffs']:
-                stats['avg_difference'] = np.mean(stats['numeric_diffs'])
-                stats['max_difference'] = max(stats['numeric_diffs'])
-                stats['min_difference'] = min(stats['numeric_diffs'])
-                stats['total_difference'] = sum(stats['numeric_diffs'])
+        # Accumulated during comparison over every difference, not just the kept ones
+        field_stats = summarize_field_stats(data_results.pop('_field_stats', {}))
         
         total_rows = data_results.get('matched_rows', 0) + data_results.get('total_differences', 0)
         matched = data_results.get('matched_rows', 0)
@@ -289,7 +564,10 @@ class UniversalPayrollAuditor:
             'rows_with_differences': data_results.get('total_differences', 0),
             'rows_matched': matched,
             'match_rate': (matched / max(1, total_rows)) * 100,
-            'field_statistics': field_stats
+            'field_statistics': field_stats,
+            'date_shifts': summarize_day_shifts(data_results.pop('_date_shifts', {})),
+            'unmatched_in_file1': data_results.get('unmatched_in_file1', 0),
+            'unmatched_in_file2': data_results.get('unmatched_in_file2', 0)
         }
     
     def generate_report(self, output_file: Optional[str] = None, 
@@ -298,17 +576,28 @@ class UniversalPayrollAuditor:
         Generate report in specified format
         
         Args:
-            output_file: Optional file path to save report
-            format: 'json', 'text', or 'html'
+            output_file: Optional file path to save report (required for parquet/arrow)
+            format: 'json', 'ndjson', 'text', 'html', 'parquet' or 'arrow'
             
         Returns:
-            Report as string
+            Report as string (use write_report to stream large reports);
+            the output path for the binary parquet/arrow formats
         """
         if not self.comparison_results:
             return json.dumps({'error': 'No comparison results available'})
         
+        if format in COLUMNAR_FORMATS:
+            if not output_file:
+                raise ValueError(f"The {format} format needs an output file")
+            self.write_report(output_file, format)
+            return output_file
+        
         if format == 'json':
             report = json.dumps(self.comparison_results, indent=2, default=str)
+        elif format == 'ndjson':
+            buffer = io.BytesIO()
+            self.write_report(buffer, 'ndjson')
+            report = buffer.getvalue().decode()
         elif format == 'text':
             report = self._generate_text_report()
         elif format == 'html':
@@ -322,6 +611,52 @@ class UniversalPayrollAuditor:
         
         return report
     
+    def write_report(self, destination, format: str = 'json', **options) -> int:
+        """
+        Stream the report with every kept difference to a file or socket
+        
+        Differences are serialized batch by batch from the difference table,
+        so memory stays flat however many are kept (config 'max_differences').
+        'parquet' and 'arrow' write one typed row per differing cell plus the
+        cells of the rows found in only one file (needs pyarrow). 'html' writes
+        the page shell first and the differences as JSON segments behind it,
+        shown in a virtualized table filterable by field and employee. 'xlsx'
+        streams summary, field statistics, differences and unmatched records
+        into a write-only Excel workbook.
+        
+        Args:
+            destination: Path, file object or connected socket (a path for parquet/arrow/xlsx)
+            format: 'json' (one document), 'ndjson' (one difference per line),
+                'parquet', 'arrow' (Arrow IPC file), 'html' or 'xlsx'
+            **options: Excel options (differences_sheet, highlight, file1, file2)
+            
+        Returns:
+            Number of differences (differing cells for parquet/arrow) written
+        """
+        if not self.comparison_results:
+            raise ValueError("No comparison results available")
+        if format == 'xlsx':
+            table = self._difference_table() or DifferenceTable()
+            write_excel_report(self.comparison_results, destination, table, self._unmatched(),
+                               **options)
+            return len(table)
+        if format == 'html':
+            return write_html_report(self.comparison_results, destination, self._difference_table())
+        if format in COLUMNAR_FORMATS:
+            return write_columnar(self._difference_table() or DifferenceTable(), destination,
+                                  format, self._unmatched())
+        return write_report(self.comparison_results, destination, format, self._difference_table())
+    
+    def _unmatched(self) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, List[str]]]:
+        if isinstance(self.comparison_results, AuditResult):
+            return self.comparison_results.unmatched_rows()
+        return self._unmatched_rows()
+    
+    def _difference_table(self) -> Optional[DifferenceTable]:
+        if isinstance(self.comparison_results, AuditResult):
+            return self.comparison_results.difference_table()
+        return self.difference_table
+    
     def _generate_text_report(self) -> str:
         """Generate text report"""
         lines = ["=" * 80, "PAYROLL AUDIT REPORT", "=" * 80]
@@ -339,58 +674,108 @@ class UniversalPayrollAuditor:
         return "\n".join(lines)
     
     def _generate_html_report(self) -> str:
-        """Generate HTML report"""
-        summary = self.comparison_results['summary']
-        return f"""<!DOCTYPE html>
-<html>
-<head>
-    <title>Payroll Audit Report</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; }}
-        .summary {{ background: #f0f0f0; padding: 20px; border-radius: 5px; }}
-        .stat {{ display: inline-block; margin: 10px 20px; }}
-        .stat-value {{ font-size: 24px; font-weight: bold; color: #1976d2; }}
-    </style>
-</head>
-<body>
-    <h1>Payroll Audit Report</h1>
-    <div class="summary">
-        <div class="stat">
-            <div class="stat-value">{summary['total_rows_compared']}</div>
-            <div>Total Rows</div>
-        </div>
-        <div class="stat">
-            <div class="stat-value">{summary['match_rate']:.1f}%</div>
-            <div>Match Rate</div>
-        </div>
-        <div class="stat">
-            <div class="stat-value">{summary['rows_with_differences']}</div>
-            <div>Differences</div>
-        </div>
-    </div>
-</body>
-</html>"""
+        """Generate HTML report (virtualized table of every kept difference)"""
+        buffer = io.BytesIO()
+        self.write_report(buffer, 'html')
+        return buffer.getvalue().decode()
 
     # API-style methods for integration
-    def audit(self, file1: str, file2: str, config: Optional[Dict] = None) -> Dict:
+    def audit(self, file1: str, file2: str, config: Optional[Dict] = None,
+              workers: Optional[int] = None, lazy: bool = False) -> Dict:
         """
         Simple API-style method for integration
         
+        With lazy=True nothing is read until a section is accessed: the result
+        is an AuditResult that loads, compares and summarizes on first access
+        and remembers every section it computed.
+        
         Usage:
             auditor = UniversalPayrollAuditor()
             result = auditor.audit('file1.csv', 'file2.csv')
+            result = auditor.audit('big1.csv', 'big2.csv', workers=8)
+            rate = auditor.audit('file1.csv', 'file2.csv', lazy=True)['summary']['match_rate']
+            result = auditor.audit(FileSource(upload1.stream, 'jan.csv'), FileSource(data2, 'feb.xlsx'))
         """
         if config:
             self.config.update(config)
-        return self.compare_files(file1, file2, verbose=False)
+        if lazy:
+            return self._lazy_audit(file1, file2, workers)
+        return self.compare_files(file1, file2, verbose=False, workers=workers)
+    
+    def _lazy_audit(self, file1: str, file2: str, workers: Optional[int] = None) -> AuditResult:
+        """AuditResult whose sections are computed on first access"""
+        # Own copy, so a later audit on this instance cannot change the result
+        worker = copy.copy(self)
+        worker.config = dict(self.config)
+        worker.file1_path = file1
+        worker.file2_path = file2
+        # Shared, so this auditor's stage_timings fill in as sections are computed
+        timings = self.stage_timings = worker.stage_timings = {}
+        memo: Dict[str, Any] = {}
+        
+        def once(name, compute):
+            def section():
+                if name not in memo:
+                    memo[name] = compute()
+                return memo[name]
+            return section
+        
+        if self.config.get('streaming') and self._is_csv(file1) and self._is_csv(file2):
+            # Partitions are compared in one pass; every section comes from it
+            def stream():
+                streamed = worker.compare_files(file1, file2, verbose=False)
+                timings.update(worker.stage_timings)
+                return streamed
+            streamed = once('streamed', stream)
+            sections = {name: (lambda name=name: streamed()[name])
+                        for name in ('metadata', 'structure', 'data', 'summary')}
+            unmatched = None
+        else:
+            def load():
+                worker.file1_data = worker._load_normalized(file1)
+                worker.file2_data = worker._load_normalized(file2)
+            loaded = once('loaded', load)
+            
+            def compare():
+                loaded()
+                with worker._stage('compare'):
+                    data = worker._compare_data(workers)
+                # Summarize right away: it consumes the statistics accumulated in data
+                with worker._stage('summarize'):
+                    return data, worker._generate_summary({'data': data})
+            compared = once('compared', compare)
+            
+            unmatched = once('unmatched', lambda: (loaded(), worker._unmatched_rows())[1])
+            
+            sections = {
+                'metadata': lambda: (loaded(), worker._compare_metadata())[1],
+                'structure': lambda: (loaded(), worker._compare_structure())[1],
+                'data': lambda: compared()[0],
+                'summary': lambda: compared()[1]
+            }
+        
+        def differences() -> DifferenceTable:
+            sections['data']()
+            return worker.difference_table
+        
+        result = AuditResult(sections, differences, unmatched)
+        self.comparison_results = result
+        return result
     
     def get_summary(self) -> Dict:
         """Get summary of last comparison"""
         return self.comparison_results.get('summary', {})
     
     def get_differences(self, limit: int = 100) -> List[Dict]:
-        """Get list of differences"""
+        """Get list of differences (up to config 'max_differences' are kept)"""
+        table = self._difference_table()
+        if table is not None:
+            return table.records(limit)
         return self.comparison_results.get('data', {}).get('differences', [])[:limit]
+    
+    def get_differences_frame(self) -> pd.DataFrame:
+        """Every kept difference as one row per differing cell (for exports)"""
+        return (self._difference_table() or DifferenceTable()).to_frame()
 
 
 # CLI Interface
@@ -402,24 +787,62 @@ def main():
     parser.add_argument('file1', help='First file to compare')
     parser.add_argument('file2', help='Second file to compare')
     parser.add_argument('-o', '--output', help='Output file path')
-    parser.add_argument('-f', '--format', choices=['text', 'html', 'json'], 
+    parser.add_argument('-f', '--format', choices=['text', 'html', 'json', 'ndjson', 'parquet', 'arrow', 'xlsx'], 
                        default='json', help='Report format')
     parser.add_argument('-t', '--tolerance', type=float, default=0.01,
                        help='Numeric comparison tolerance')
+    parser.add_argument('--engine', choices=list(ENGINES), default=DEFAULT_ENGINE,
+                       help='Comparison engine (default: vectorized)')
+    parser.add_argument('-k', '--key', action='append', dest='key_columns',
+                       help='Key column to match rows on (repeat for a composite key)')
+    parser.add_argument('--streaming', action='store_true',
+                       help='Compare CSV files out-of-core via on-disk partitions')
+    parser.add_argument('--memory-budget', type=float, default=DEFAULT_MEMORY_BUDGET_MB,
+                       help='Approximate memory budget in MB for --streaming')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                       help='Worker processes for the comparison (default: 1)')
+    parser.add_argument('--rank-by', choices=list(RANKINGS), default=DEFAULT_RANKING,
+                       help='Which differences to report first (default: file order)')
+    parser.add_argument('--field-priority', nargs='+',
+                       help='Fields in priority order for --rank-by field_priority')
+    parser.add_argument('--max-differences', type=int, default=DISPLAY_DIFFERENCES,
+                       help='Ranked differences kept for -f json/ndjson files (default: 100)')
+    parser.add_argument('--mapped-only', action='store_true',
+                       help='Parse and compare only columns recognized by the field mappings')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always re-parse input files instead of using the parsed-file cache')
     
     args = parser.parse_args()
+    if args.format in COLUMNAR_FORMATS + ('xlsx',) and not args.output:
+        parser.error(f"-f {args.format} needs an output file (-o)")
     
     try:
-        config = {'numeric_tolerance': args.tolerance}
+        config = {
+            'numeric_tolerance': args.tolerance,
+            'engine': args.engine,
+            'key_columns': args.key_columns,
+            'streaming': args.streaming,
+            'memory_budget_mb': args.memory_budget,
+            'workers': args.workers,
+            'rank_by': args.rank_by,
+            'field_priority': args.field_priority,
+            'max_differences': args.max_differences,
+            'cache': not args.no_cache,
+            'prune_columns': args.mapped_only
+        }
         auditor = UniversalPayrollAuditor(config)
         results = auditor.compare_files(args.file1, args.file2)
         
-        report = auditor.generate_report(args.output, args.format)
-        
-        if not args.output:
-            print("\n" + report)
+        if args.output and args.format != 'text':
+            # Streamed with every kept difference, not just the shown ones
+            written = auditor.write_report(args.output, args.format)
+            print(f"\n✓ Report saved to: {args.output} ({written} differences)")
         else:
-            print(f"\n✓ Report saved to: {args.output}")
+            report = auditor.generate_report(args.output, args.format)
+            if not args.output:
+                print("\n" + report)
+            else:
+                print(f"\n✓ Report saved to: {args.output}")
         
         print(f"\n{'='*80}")
         print("AUDIT COMPLETE")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Value Normalizers
+Column-at-a-time conversions applied after column names are normalized
+"""
+
+from fnmatch import fnmatch
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Monetary fields held as exact integer cents once loaded
+MONEY_FIELDS = [
+    'federal_tax', 'social_security', 'medicare', 'state_tax', 'local_tax', 'pfml', 'tips_*'
+]
+
+# Fields that hold amounts or hours, coerced to numbers when they were read as text
+NUMERIC_FIELDS = [
+    'hours', 'overtime', 'pto', 'sick', 'tips_*', 'federal_tax', 'social_security',
+    'medicare', 'state_tax', 'local_tax', 'pfml'
+]
+
+# Date fields, parsed with per-layout format detection
+DATE_FIELDS = ['pay_date']
+
+# Formats tried on every date layout, in order of preference
+# (US month-first before day-first; day-first wins where it parses more values)
+DATE_FORMATS = [
+    '%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%d/%m/%Y', '%d/%m/%y', '%Y/%m/%d', '%m-%d-%Y',
+    '%d.%m.%Y', '%Y%m%d', '%b %d, %Y', '%B %d, %Y', '%d-%b-%Y', '%d %b %Y', '%d %B %Y',
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S'
+]
+
+# Values per layout used to pick a format
+DATE_SAMPLE_SIZE = 500
+
+CENTS = 100
+
+# Text that means "no value" in exported amount columns
+_MISSING_TEXT = r'(?i)^(?:|n/?a|null|none|nan)$'
+# Accounting exports print zero as a dash
+_ZERO_TEXT = r'^[-–—]$'
+# Currency symbols and codes, thousands separators and whitespace
+_AMOUNT_NOISE = r'[$€£¥,\s]|(?i:usd|eur|gbp)'
+
+
+def money_columns(columns: Iterable[str], patterns: Optional[List[str]] = None) -> List[str]:
+    """Columns matching the monetary field names (shell-style patterns allowed)"""
+    patterns = MONEY_FIELDS if patterns is None else patterns
+    return [col for col in columns
+            if isinstance(col, str) and any(fnmatch(col, pattern) for pattern in patterns)]
+
+
+def to_cents(series: pd.Series) -> Optional[pd.Series]:
+    """
+    Convert a numeric dollar column to nullable int64 cents
+
+    Returns None for non-numeric columns, which are left for later coercion.
+    """
+    if not pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        return None
+    dollars = series.to_numpy(dtype='float64', na_value=np.nan)
+    missing = np.isnan(dollars)
+    cents = np.rint(np.where(missing, 0.0, dollars) * CENTS).astype(np.int64)
+    return pd.Series(pd.arrays.IntegerArray(cents, missing), index=series.index, name=series.name)
+
+
+def coerce_numeric(series: pd.Series) -> Tuple[Optional[pd.Series], int]:
+    """
+    Parse a text column of amounts such as "$1,234.56", "(12.00)", "12.00-" or " 40 "
+
+    Works a column at a time with the str accessor, on the distinct values only
+    (amount columns repeat a lot). Blank and N/A cells become missing; a lone
+    dash is zero.
+
+    Returns:
+        (float64 series, number of non-blank cells that could not be parsed),
+        or (None, 0) when the column is not text
+    """
+    if not (pd.api.types.is_string_dtype(series.dtype) or series.dtype == object):
+        return None, 0
+    codes, uniques = pd.factorize(series.astype('string').str.strip())
+    text = pd.Series(uniques, dtype='string')
+    missing = text.str.match(_MISSING_TEXT).to_numpy(dtype=bool)
+
+    cleaned = (text.str.replace(_AMOUNT_NOISE, '', regex=True)
+                   .str.replace('\u2212', '-', regex=False)
+                   .mask(text.str.match(_ZERO_TEXT), '0'))
+    # Parenthesized and trailing-minus negatives: "(12.00)", "$(12.00)", "12.00-"
+    negative = (cleaned.str.match(r'^\(.*\)$') | cleaned.str.match(r'^[^-].*\d-$')).to_numpy(dtype=bool)
+    cleaned = cleaned.str.replace(r'^\((.*)\)$', r'\1', regex=True).str.replace(r'-$', '', regex=True)
+    numbers = pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    numbers[missing] = np.nan
+    numbers[negative] = -np.abs(numbers[negative])
+
+    # Missing source cells have code -1
+    values = np.where(codes >= 0, numbers[codes], np.nan)
+    failed = np.isnan(numbers) & ~missing
+    failures = int(np.count_nonzero(failed[codes[codes >= 0]]))
+    return pd.Series(values, index=series.index, name=series.name), failures
+
+
+def coerce_numeric_columns(df: pd.DataFrame,
+                           patterns: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Replace text amount columns with float64 columns (in place)
+
+    Args:
+        df: Frame with normalized column names
+        patterns: Field names to coerce (default: NUMERIC_FIELDS)
+
+    Returns:
+        Column -> cells that could not be parsed (left missing), for columns with failures
+    """
+    failures = {}
+    for col in money_columns(df.columns.unique(), NUMERIC_FIELDS if patterns is None else patterns):
+        if isinstance(df[col], pd.DataFrame):
+            continue
+        numbers, failed = coerce_numeric(df[col])
+        if numbers is None:
+            continue
+        df[col] = numbers
+        if failed:
+            failures[col] = failed
+    return failures
+
+
+def parse_dates(series: pd.Series,
+                formats: Optional[Dict[str, str]] = None) -> Tuple[Optional[pd.Series], int]:
+    """
+    Parse a text date column without per-element dateutil fallback
+
+    Distinct values are grouped by layout (digits as 9, words as a) and
+    every layout is parsed with the formats of DATE_FORMATS that parse the
+    most of a sample of its values. So "01/15/2026" and "2026-01-15" in one
+    column both parse, and the result depends on the column's values only.
+
+    Args:
+        series: Column to parse
+        formats: Layout -> format detected on earlier parts of the same column
+            (e.g. the previous chunks of a streamed file). A column it parses
+            completely is parsed with one vectorized to_datetime call per
+            format; formats detected here are added to it. Keep one per
+            column of one read, never share it across files or processes.
+
+    Returns:
+        (datetime64 series, number of non-blank cells that could not be parsed),
+        or (None, 0) when the column is not text
+    """
+    if not (pd.api.types.is_string_dtype(series.dtype) or series.dtype == object):
+        return None, 0
+    codes, uniques = pd.factorize(series.astype('string').str.strip())
+    text = pd.Series(uniques, dtype='string')
+    missing = text.str.match(_MISSING_TEXT).to_numpy(dtype=bool)
+
+    parsed = None
+    for fmt in dict.fromkeys((formats or {}).values()):
+        attempt = pd.to_datetime(text[~missing], format=fmt, errors='coerce')
+        if attempt.notna().all():
+            parsed = attempt.reindex(text.index)
+            break
+    if parsed is None:
+        present = text[~missing]
+        layouts = present.str.replace(r'\d', '9', regex=True).str.replace(r'[A-Za-z]+', 'a', regex=True)
+        parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+        for layout, members in present.groupby(layouts):
+            parsed.loc[members.index] = _parse_layout(layout, members, formats)
+    values = parsed.to_numpy(dtype='datetime64[ns]', copy=True)
+    values[missing] = np.datetime64('NaT')
+
+    failed = np.isnat(values) & ~missing
+    failures = int(np.count_nonzero(failed[codes[codes >= 0]]))
+    dates = np.where(codes >= 0, values[codes], np.datetime64('NaT'))
+    return pd.Series(dates, index=series.index, name=series.name), failures
+
+
+def _parse_layout(layout: str, values: pd.Series,
+                  formats: Optional[Dict[str, str]] = None) -> pd.Series:
+    """Parse values sharing one layout, trying the format detected earlier in the column first"""
+    cached = formats.get(layout) if formats is not None else None
+    if cached:
+        parsed = pd.to_datetime(values, format=cached, errors='coerce')
+        if parsed.notna().all():
+            return parsed
+
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    remaining = values
+    candidates = list(DATE_FORMATS)
+    while len(remaining) and candidates:
+        # The format that parses the most of a sample of what is left (earlier formats win ties)
+        sample = remaining.iloc[:DATE_SAMPLE_SIZE]
+        fmt = max(candidates, key=lambda fmt: pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum())
+        best = pd.to_datetime(remaining, format=fmt, errors='coerce')
+        if not best.notna().any():
+            break
+        parsed.loc[best.index[best.notna()]] = best[best.notna()]
+        if formats is not None:
+            formats.setdefault(layout, fmt)
+        candidates.remove(fmt)
+        remaining = remaining[best.isna()]
+    return parsed
+
+
+def coerce_date_columns(df: pd.DataFrame, patterns: Optional[List[str]] = None,
+                        formats: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, int]:
+    """
+    Replace text date columns with datetime64 columns (in place)
+
+    Args:
+        df: Frame with normalized column names
+        patterns: Field names to parse (default: DATE_FIELDS)
+        formats: Column -> detected formats carried over from earlier chunks
+            of the same file (see parse_dates); filled in as columns parse
+
+    Returns:
+        Column -> cells that could not be parsed (left missing), for columns with failures
+    """
+    failures = {}
+    for col in money_columns(df.columns.unique(), DATE_FIELDS if patterns is None else patterns):
+        if isinstance(df[col], pd.DataFrame):
+            continue
+        dates, failed = parse_dates(df[col], formats.setdefault(col, {}) if formats is not None else None)
+        if dates is None:
+            continue
+        df[col] = dates
+        if failed:
+            failures[col] = failed
+    return failures
+
+
+def from_cents(value):
+    """Dollar value for reports from an integer cent value"""
+    if value is None or value is pd.NA:
+        return value
+    return int(value) / CENTS
+
+
+def dollar_view(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Copy of df with integer cent columns turned back into float dollars"""
+    cents = [col for col in columns
+             if col in df.columns and pd.api.types.is_integer_dtype(df[col].dtype)]
+    if not cents:
+        return df
+    df = df.copy()
+    for col in cents:
+        df[col] = df[col].to_numpy(dtype='float64', na_value=np.nan) / CENTS
+    return df
+
+
+def convert_money_columns(df: pd.DataFrame, patterns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Replace numeric monetary columns with int64 cents (in place, returns df)"""
+    for col in money_columns(df.columns.unique(), patterns):
+        if isinstance(df[col], pd.DataFrame):
+            continue  # two source columns mapped to the same name
+        cents = to_cents(df[col])
+        if cents is not None:
+            df[col] = cents
+    return df